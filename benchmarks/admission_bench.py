@@ -0,0 +1,79 @@
+"""
+Goodput of the user request path under overload, with and without admission control. A
+simulated dispatcher serves one request at a time in SERVICE_TIME seconds (turning one away
+costs REJECT_TIME) while users arrive at a multiple of its capacity, each giving up
+USER_REQUEST_TIMEOUT seconds after its first attempt and retrying when told busy, as
+UserThread does. Time is simulated, so this runs in seconds and needs no services. Reports
+per load the requests answered with a taxi before their deadline per second (goodput), those
+answered after it (wasted work) and the median response time of the good ones.
+
+Usage: python -m benchmarks.admission_bench [seconds] [service_ms]
+"""
+
+import heapq
+import random
+import sys
+from src.config import USER_REQUEST_TIMEOUT
+from src.utils.admission import AdmissionControl, tag_time
+from src.utils.metrics import Metrics
+from src.utils.tracing import split_tags
+
+REJECT_TIME = 0.0002
+LOADS = (0.5, 0.9, 1.2, 2.0, 4.0)
+
+
+def simulate(load, duration, service_time, admission, seed=1):
+    rng = random.Random(seed)
+    rate = load / service_time
+    arrivals = []  # (time, user, first attempt)
+    now = 0.0
+    user = 0
+    while now < duration:
+        now += rng.expovariate(rate)
+        arrivals.append((now, user, now))
+        user += 1
+    heapq.heapify(arrivals)
+
+    metrics = Metrics()
+    control = AdmissionControl(metrics) if admission else None
+    server_free = 0.0
+    good, late, response_times = 0, 0, []
+    while arrivals:
+        sent, user, first = heapq.heappop(arrivals)
+        deadline = first + USER_REQUEST_TIMEOUT
+        # The socket serves requests in arrival order; this one starts once the previous is answered
+        now = max(server_free, sent)
+        tags = {"sent": f"{sent:.6f}", "deadline": f"{deadline:.6f}"}
+        rejection = control.admit(tags, now) if control else None
+        if rejection:
+            server_free = now + REJECT_TIME
+            if rejection.startswith("busy"):
+                retry_after = tag_time(split_tags(rejection.split())[1], "retry_after")
+                if server_free + retry_after < deadline:
+                    heapq.heappush(arrivals, (server_free + retry_after, user, first))
+            continue
+        server_free = now + service_time
+        if server_free <= deadline:
+            good += 1
+            response_times.append(server_free - first)
+        else:
+            late += 1
+    response_times.sort()
+    median = response_times[len(response_times) // 2] if response_times else 0.0
+    elapsed = max(server_free, duration)
+    return good / elapsed, late / elapsed, median
+
+
+def main():
+    duration = float(sys.argv[1]) if len(sys.argv) > 1 else 300.0
+    service_time = (float(sys.argv[2]) if len(sys.argv) > 2 else 20.0) / 1000
+    print(f"capacity {1 / service_time:.0f} requests/s, deadline {USER_REQUEST_TIMEOUT} s, {duration:.0f} s simulated")
+    print(f"{'load':>5} {'admission':<10} {'goodput/s':>10} {'late/s':>8} {'median s':>9}")
+    for load in LOADS:
+        for admission in (False, True):
+            goodput, late, median = simulate(load, duration, service_time, admission)
+            print(f"{load:>5.1f} {'on' if admission else 'off':<10} {goodput:>10.1f} {late:>8.1f} {median:>9.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,107 @@
+"""
+Simulates a fleet in virtual time and compares the legacy "report every move" policy
+against dead-reckoned reporting: how many position updates reach the dispatcher, and how
+far the dispatcher's estimates (and therefore its matches) are from the true positions.
+
+Usage: python -m benchmarks.dead_reckoning_bench [taxis] [ticks] [N] [M] [seed]
+"""
+
+import random
+import sys
+from src.config import TAXI_MOVE_INTERVAL, VALID_SPEEDS, DEAD_RECKONING_THRESHOLD
+from src.models.taxi_model import Taxi
+from src.utils.dead_reckoning import PositionReporter, DeadReckoningTracker
+
+
+def nearest(positions, user_x, user_y):
+    return min(positions, key=lambda item: (abs(item[1] - user_x) + abs(item[2] - user_y), item[0]))
+
+
+def run(num_taxis=2000, ticks=120, N=100, M=100, seed=7, users_per_tick=20, threshold=DEAD_RECKONING_THRESHOLD):
+    rng = random.Random(seed)
+    taxis = []
+    reporters = {}
+    tracker = DeadReckoningTracker(N, M)
+
+    for taxi_id in range(num_taxis):
+        taxi = Taxi(taxi_id, N, M, rng.randrange(N), rng.randrange(M), rng.choice(VALID_SPEEDS), "available", True)
+        taxis.append(taxi)
+        reporters[taxi_id] = PositionReporter(N, M, threshold)
+        tracker.record(taxi_id, taxi.pos_x, taxi.pos_y, "NONE", taxi.speed, received_at=0)
+
+    legacy_updates = 0
+    adaptive_updates = 0
+    position_errors = []
+    match_distance_penalty = []
+    same_match = 0
+    total_matches = 0
+
+    for tick in range(1, ticks + 1):
+        now = tick * TAXI_MOVE_INTERVAL
+        for taxi in taxis:
+            if taxi.stopped:
+                continue
+            reporter = reporters[taxi.taxi_id]
+            reporter.tick(TAXI_MOVE_INTERVAL)
+            cells = taxi.cells_for_tick()
+            if cells == 0:
+                continue
+            direction = taxi.choose_direction(rng)
+            if direction is None:
+                taxi.stopped = True
+            else:
+                taxi.move(direction, cells)
+            legacy_updates += 1
+            if reporter.should_report(taxi):
+                adaptive_updates += 1
+                reporter.mark_reported(taxi)
+                tracker.record(taxi.taxi_id, taxi.pos_x, taxi.pos_y, reporter.reported_heading(taxi), taxi.speed, received_at=now)
+
+        truth = [(taxi.taxi_id, taxi.pos_x, taxi.pos_y) for taxi in taxis]
+        estimated = []
+        for taxi in taxis:
+            est_x, est_y = tracker.estimate(taxi.taxi_id, now)
+            estimated.append((taxi.taxi_id, est_x, est_y))
+            position_errors.append(abs(est_x - taxi.pos_x) + abs(est_y - taxi.pos_y))
+
+        true_by_id = {taxi_id: (x, y) for taxi_id, x, y in truth}
+        for _ in range(users_per_tick):
+            user_x, user_y = rng.randrange(M + 1), rng.randrange(N + 1)
+            best_true = nearest(truth, user_x, user_y)
+            best_est = nearest(estimated, user_x, user_y)
+            true_distance = abs(best_true[1] - user_x) + abs(best_true[2] - user_y)
+            chosen_x, chosen_y = true_by_id[best_est[0]]
+            chosen_distance = abs(chosen_x - user_x) + abs(chosen_y - user_y)
+            match_distance_penalty.append(chosen_distance - true_distance)
+            same_match += best_true[0] == best_est[0]
+            total_matches += 1
+
+    return {
+        "taxis": num_taxis,
+        "ticks": ticks,
+        "legacy_updates": legacy_updates,
+        "adaptive_updates": adaptive_updates,
+        "reduction": legacy_updates / adaptive_updates if adaptive_updates else float("inf"),
+        "mean_position_error": sum(position_errors) / len(position_errors),
+        "max_position_error": max(position_errors),
+        "same_match_rate": same_match / total_matches,
+        "mean_match_penalty": sum(match_distance_penalty) / len(match_distance_penalty),
+        "max_match_penalty": max(match_distance_penalty),
+        "threshold": threshold,
+    }
+
+
+def main():
+    args = [int(arg) for arg in sys.argv[1:]]
+    results = run(*args)
+    print(f"Taxis: {results['taxis']}  Ticks: {results['ticks']}  Threshold: {results['threshold']} cell(s)")
+    print(f"Position updates (every move):   {results['legacy_updates']}")
+    print(f"Position updates (dead reckoning): {results['adaptive_updates']}")
+    print(f"Reduction: {results['reduction']:.1f}x")
+    print(f"Estimate error (cells): mean {results['mean_position_error']:.3f}, max {results['max_position_error']}")
+    print(f"Same taxi matched: {results['same_match_rate'] * 100:.1f}%")
+    print(f"Extra pickup distance (cells): mean {results['mean_match_penalty']:.3f}, max {results['max_match_penalty']}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,88 @@
+"""
+Dispatcher start-up against a database that already holds a large fleet: the whole taxis table
+fetched at once (get_all_taxis) against the chunked, unbuffered stream (iter_taxis) loaded into
+the state store and position tracker the way DispatcherService.preload_fleet does. Reports the
+time and the Python heap peak (tracemalloc) for growing fleets, which should both grow linearly.
+Needs the database from src/config.py; it inserts taxis from BENCH_ID_BASE up and deletes them
+afterwards, so the table should otherwise be small.
+
+Usage: python -m benchmarks.fleet_preload_bench [taxis]
+"""
+
+import sys
+import tempfile
+import time
+import tracemalloc
+from src.config import DB_USER, DB_PASSWORD, DB_HOST, DB_NAME, MAX_N, MAX_M
+from src.models.taxi_model import TAXI_STATUS_AVAILABLE
+from src.utils.db_handler import DatabaseHandler
+from src.utils.dead_reckoning import DeadReckoningTracker
+from src.utils.state_store import StateStore
+
+BENCH_ID_BASE = 900000000
+
+
+def insert_fleet(db, first, count):
+    cursor = db.get_cursor()
+    query = """
+    INSERT INTO taxis (taxi_id, pos_x, pos_y, speed, status, connected, initial_pos_x, initial_pos_y)
+    VALUES (%s, %s, %s, %s, %s, %s, %s, %s)
+    """
+    for start in range(first, first + count, 10000):
+        rows = [
+            (BENCH_ID_BASE + index, index % MAX_N, index // MAX_N % MAX_M, 2, TAXI_STATUS_AVAILABLE, True, 0, 0)
+            for index in range(start, min(start + 10000, first + count))
+        ]
+        cursor.executemany(query, rows)
+        db.get_connection().commit()
+
+
+def load_all(db):
+    tracker = DeadReckoningTracker(MAX_N, MAX_M)
+    for taxi_id, pos_x, pos_y, speed, status, connected in db.get_all_taxis():
+        tracker.record(taxi_id, pos_x, pos_y, "NONE", speed)
+
+
+def load_streamed(db):
+    tracker = DeadReckoningTracker(MAX_N, MAX_M)
+    with tempfile.TemporaryDirectory() as directory:
+        store = StateStore(directory, capacity=1024)
+        store.restore()
+        for chunk in db.iter_taxis():
+            for taxi_id, pos_x, pos_y, speed, status, connected in chunk:
+                store.taxi_connected(taxi_id, pos_x, pos_y, speed, status)
+                tracker.record(taxi_id, pos_x, pos_y, "NONE", speed)
+        store.close()
+
+
+def measure(load, db):
+    tracemalloc.start()
+    started = time.perf_counter()
+    load(db)
+    elapsed = time.perf_counter() - started
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return elapsed, peak / 2**20
+
+
+def main():
+    total = int(sys.argv[1]) if len(sys.argv) > 1 else 200000
+    db = DatabaseHandler(host=DB_HOST, user=DB_USER, password=DB_PASSWORD, database=DB_NAME)
+    inserted = 0
+    try:
+        print(f"{'taxis':>8} {'loader':<26} {'seconds':>8} {'peak MiB':>9}")
+        for size in (total // 4, total // 2, total):
+            insert_fleet(db, inserted, size - inserted)
+            inserted = size
+            for name, load in (("get_all_taxis", load_all), ("iter_taxis + state store", load_streamed)):
+                elapsed, peak = measure(load, db)
+                print(f"{size:>8} {name:<26} {elapsed:>8.2f} {peak:>9.1f}")
+    finally:
+        cursor = db.get_cursor()
+        cursor.execute("DELETE FROM taxis WHERE taxi_id >= %s", (BENCH_ID_BASE,))
+        db.get_connection().commit()
+        db.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,86 @@
+"""
+Nearest-taxi query throughput against the shared-memory fleet table, for an increasing
+number of matcher processes. Queries are issued by concurrent REQ clients through the
+dispatcher's FLEET_QUERY_PORT, exactly as DispatcherService does in multi-process mode.
+
+Usage: python -m benchmarks.fleet_table_bench [taxis] [seconds] [clients] [max_matchers]
+"""
+
+import os
+import random
+import sys
+import time
+import zmq
+from threading import Thread
+from src.config import FLEET_QUERY_PORT
+from src.models.taxi_model import TAXI_STATUS_AVAILABLE, TAXI_STATUS_UNAVAILABLE
+from src.services.fleet_table_service import FleetTableService
+
+N = 1000
+M = 1000
+
+
+def populate(table, num_taxis, rng):
+    now = time.time()
+    for taxi_id in range(num_taxis):
+        status = TAXI_STATUS_AVAILABLE if rng.random() < 0.7 else TAXI_STATUS_UNAVAILABLE
+        table.register(taxi_id, taxi_id, rng.randrange(M), rng.randrange(N), rng.choice([1, 2, 4]), status, True, now)
+
+
+def client(context, deadline, counts, index):
+    rng = random.Random(index)
+    requester = context.socket(zmq.REQ)
+    requester.connect(f"tcp://127.0.0.1:{FLEET_QUERY_PORT}")
+    done = 0
+    while time.time() < deadline:
+        requester.send_string(f"nearest {rng.randrange(M)} {rng.randrange(N)}")
+        requester.recv_string()
+        done += 1
+    counts[index] = done
+    requester.close(linger=0)
+
+
+def measure(num_taxis, seconds, clients, matchers):
+    service = FleetTableService(N, M, matchers, capacity=num_taxis)
+    populate(service.table, num_taxis, random.Random(1))
+    service.start()
+    context = zmq.Context()
+    try:
+        # Warm up until every matcher has attached and answered
+        warmup = context.socket(zmq.REQ)
+        warmup.connect(f"tcp://127.0.0.1:{FLEET_QUERY_PORT}")
+        for _ in range(matchers * 2):
+            warmup.send_string("nearest 0 0")
+            warmup.recv_string()
+        warmup.close(linger=0)
+
+        counts = [0] * clients
+        deadline = time.time() + seconds
+        threads = [Thread(target=client, args=(context, deadline, counts, index)) for index in range(clients)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return sum(counts) / seconds
+    finally:
+        context.term()
+        service.stop()
+
+
+def main():
+    args = [int(arg) for arg in sys.argv[1:]]
+    num_taxis = args[0] if len(args) > 0 else 100000
+    seconds = args[1] if len(args) > 1 else 5
+    clients = args[2] if len(args) > 2 else 8
+    max_matchers = args[3] if len(args) > 3 else os.cpu_count()
+
+    print(f"Fleet: {num_taxis} taxis  Clients: {clients}  CPUs: {os.cpu_count()}")
+    matchers = 1
+    while matchers <= max_matchers:
+        rate = measure(num_taxis, seconds, clients, matchers)
+        print(f"{matchers} matcher process(es): {rate:,.0f} queries/s")
+        matchers *= 2
+
+
+if __name__ == "__main__":
+    main()
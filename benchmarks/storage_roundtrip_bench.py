@@ -0,0 +1,131 @@
+"""
+MySQL round trips and latency per dispatcher event, before and after the compound storage
+operations: a reconnecting taxi's connect_request and an assigned user request.
+Round trips are counted on the client: connections opened, statements, commits and the
+liveness pings `DatabaseHandler.connect` makes. Needs the database from src/config.py;
+it works on taxi and user ids from BENCH_ID_BASE up and deletes them afterwards.
+
+Usage: python -m benchmarks.storage_roundtrip_bench [events]
+"""
+
+import sys
+import time
+from collections import Counter
+from src.config import DB_USER, DB_PASSWORD, DB_HOST, DB_NAME
+from src.utils.db_handler import DatabaseHandler
+
+BENCH_ID_BASE = 900000000
+
+
+class CountingProxy:
+    # Counts the calls named in `counted` on the wrapped connection or cursor
+    def __init__(self, target, counts, counted):
+        self._target = target
+        self._counts = counts
+        self._counted = counted
+
+    def __getattr__(self, name):
+        attribute = getattr(self._target, name)
+        if name not in self._counted:
+            return attribute
+
+        def counted(*args, **kwargs):
+            self._counts[self._counted[name]] += 1
+            return attribute(*args, **kwargs)
+        return counted
+
+
+class CountingDatabaseHandler(DatabaseHandler):
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.counts = Counter()
+
+    def connect(self):
+        connection = getattr(self.local_storage, "connection", None)
+        super().connect()
+        if self.local_storage.connection is not connection:
+            self.counts["connections"] += 1
+            self.local_storage.connection = CountingProxy(
+                self.local_storage.connection, self.counts,
+                {"commit": "commits", "rollback": "commits", "is_connected": "pings"},
+            )
+            self.local_storage.cursor = CountingProxy(self.local_storage.cursor, self.counts, {"execute": "statements"})
+
+
+def legacy_connect(db, taxi_id):
+    if not db.taxi_exists(taxi_id):
+        db.add_taxi(taxi_id, 1, 1, 2, "available")
+    else:
+        db.update_taxi_position(taxi_id, 1, 1)
+        db.set_taxi_status(taxi_id, "available")
+        db.update_taxi_connected_status(taxi_id, connected=True)
+    db.record_heartbeat(taxi_id)
+
+
+def compound_connect(db, taxi_id):
+    db.upsert_taxi_on_connect(taxi_id, 1, 1, 2, "available")
+
+
+def legacy_request(db, user_id, taxi_id):
+    db.add_user_request(user_id, 1, 1, waiting_time=30)
+    db.get_available_taxis()
+    db.assign_taxi_to_user(user_id, taxi_id)
+
+
+def compound_request(db, user_id, taxi_id):
+    db.get_available_taxis()
+    db.reserve_and_assign(user_id, 1, 1, taxi_id)
+
+
+def measure(db, events, event, reset):
+    totals = Counter()
+    elapsed = 0.0
+    for index in range(events):
+        reset(index)
+        before = Counter(db.counts)
+        started = time.perf_counter()
+        event(index)
+        elapsed += time.perf_counter() - started
+        totals.update(db.counts - before)
+    per_event = {key: totals[key] / events for key in ("connections", "pings", "statements", "commits")}
+    return per_event, elapsed / events * 1000
+
+
+def main():
+    events = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    db = CountingDatabaseHandler(host=DB_HOST, user=DB_USER, password=DB_PASSWORD, database=DB_NAME)
+    taxi_ids = [BENCH_ID_BASE + index for index in range(events)]
+    user_ids = [BENCH_ID_BASE + index for index in range(events)]
+    for taxi_id in taxi_ids:
+        db.add_taxi(taxi_id, 0, 0, 2, "available")
+
+    def make_available(index):
+        db.set_taxi_status(taxi_ids[index], "available")
+        db.update_taxi_connected_status(taxi_ids[index], True)
+
+    scenarios = [
+        ("connect_request, legacy", lambda index: legacy_connect(db, taxi_ids[index]), lambda index: None),
+        ("connect_request, upsert_taxi_on_connect", lambda index: compound_connect(db, taxi_ids[index]), lambda index: None),
+        ("user_request, legacy", lambda index: legacy_request(db, user_ids[index], taxi_ids[index]), make_available),
+        ("user_request, reserve_and_assign", lambda index: compound_request(db, user_ids[index], taxi_ids[index]), make_available),
+    ]
+    try:
+        print(f"{'event':<42} {'conns':>6} {'pings':>6} {'stmts':>6} {'commits':>8} {'round trips':>12} {'ms/event':>9}")
+        for name, event, reset in scenarios:
+            per_event, latency = measure(db, events, event, reset)
+            round_trips = sum(per_event.values())
+            print(
+                f"{name:<42} {per_event['connections']:>6.1f} {per_event['pings']:>6.1f} {per_event['statements']:>6.1f} "
+                f"{per_event['commits']:>8.1f} {round_trips:>12.1f} {latency:>9.2f}"
+            )
+        print("Each new connection also costs the TCP and authentication handshakes.")
+    finally:
+        cursor = db.get_cursor()
+        for table, column in (("assignments", "user_id"), ("users", "user_id"), ("heartbeat", "taxi_id"), ("taxis", "taxi_id")):
+            cursor.execute(f"DELETE FROM {table} WHERE {column} >= %s", (BENCH_ID_BASE,))
+        db.get_connection().commit()
+        db.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,93 @@
+"""
+Memory held by an in-memory fleet of taxis: the previous dict-backed Taxi (own Grid per
+instance, redundant N/M and initial position, free-form status string) against the
+`__slots__` Taxi, and against the array-backed fleet table record indexed through SlotMap.
+
+Usage: python -m benchmarks.taxi_memory_bench [taxis]
+"""
+
+import gc
+import random
+import sys
+import tracemalloc
+import numpy as np
+from src.models.grid_model import Grid
+from src.models.taxi_model import Taxi
+from src.utils.fleet_table import FLEET_RECORD
+from src.utils.slot_map import SlotMap
+
+N = 1000
+M = 1000
+
+
+class LegacyTaxi():
+    # The Taxi layout before __slots__, kept here only as the baseline
+    def __init__(self, taxi_id, N, M, pos_x, pos_y, speed, status, connected=False):
+        self.taxi_id = taxi_id
+        self.initial_pos_x = pos_x
+        self.initial_pos_y = pos_y
+        self.pos_x = pos_x
+        self.pos_y = pos_y
+        self.speed = speed
+        self.grid = Grid(N, M)
+        self.N = N
+        self.M = M
+        self.status = status
+        self.connected = connected
+        self.stopped = False
+        self.move_counter = 0
+        self.was_off_borders = False
+        self.heading = None
+
+
+def fleet_args(num_taxis):
+    rng = random.Random(1)
+    # Sparse ids, like real taxi ids, so the slot map has something to do
+    ids = rng.sample(range(10 * num_taxis), num_taxis)
+    return [(taxi_id, rng.randrange(M), rng.randrange(N), rng.choice([1, 2, 4])) for taxi_id in ids]
+
+
+def measure(build):
+    gc.collect()
+    tracemalloc.start()
+    fleet = build()
+    current, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del fleet
+    return current
+
+
+def build_objects(cls, args):
+    # Status strings come off the wire, so each taxi carries its own copy
+    return {
+        taxi_id: cls(taxi_id, N, M, pos_x, pos_y, speed, "".join(["avail", "able"]), True)
+        for taxi_id, pos_x, pos_y, speed in args
+    }
+
+
+def build_array(args):
+    slots = SlotMap()
+    records = np.zeros(len(args), dtype=FLEET_RECORD)
+    for taxi_id, pos_x, pos_y, speed in args:
+        slot = slots.slot_for(taxi_id)
+        records[slot] = (0, 1, 0, 1, speed, 0, taxi_id, pos_x, pos_y, 0.0, 0.0)
+    return slots, records
+
+
+def main():
+    num_taxis = int(sys.argv[1]) if len(sys.argv) > 1 else 100000
+    args = fleet_args(num_taxis)
+
+    results = [
+        ("dict Taxi (before)", measure(lambda: build_objects(LegacyTaxi, args))),
+        ("__slots__ Taxi (after)", measure(lambda: build_objects(Taxi, args))),
+        ("SlotMap + fleet records", measure(lambda: build_array(args))),
+    ]
+    baseline = results[0][1]
+    print(f"Fleet: {num_taxis} taxis on a {N}x{M} grid")
+    for label, size in results:
+        print(f"{label:<26} {size / 2**20:8.1f} MiB  {size / num_taxis:6.0f} B/taxi  {baseline / size:4.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,3 +1,5 @@
+import os
+
 # ZeroMQ Configuration
 DISPATCHER_IP = "192.168.1.12"
 PUB_PORT = 5555
@@ -9,6 +11,7 @@ HEARTBEAT_PORT = 5560
 HEARTBEAT_2_PORT = 5570
 HEARTBEAT_3_PORT = 5590
 USER_REQ_PORT = 5561
+GATEWAY_PULL_PORT = 5571  # Batched position updates and heartbeats from fleet gateways
 
 # Backup Dispatcher Configuration
 BACKUP_DISPATCHER_IP = "192.168.1.8"
@@ -22,9 +25,55 @@ BACKUP_USER_REQ_PORT = 5568
 
 BACKUP_ACTIVATION_PORT = 5569
 
+# Geographic Sharding Configuration
+# The grid is split into SHARD_GRID = (columns, rows) rectangular regions, each served by its
+# own dispatcher (`python -m src.shard`); `python -m src.shard_router` then owns USER_REQ_PORT
+SHARD_GRID = (1, 1)
+SHARD_PORT_STRIDE = 100  # Shard i uses every base port + (i + 1) * SHARD_PORT_STRIDE
+SHARD_HOSTS = []  # Host per shard id; shards without an entry run on DISPATCHER_IP
+SHARD_QUERY_TIMEOUT = 2000  # Milliseconds the router waits for a shard
+
+# Fleet Gateway Configuration
+# Taxis connect to a gateway on the dispatcher's usual ports when TAXI_GATEWAY_IP is set
+TAXI_GATEWAY_IP = None
+GATEWAY_BATCH_WINDOW = 0.05  # Seconds to aggregate updates before forwarding a batch
+GATEWAY_MAX_BATCH = 1000  # Forward early once this many updates are pending
+
 # Default speed values
 VALID_SPEEDS = [1, 2, 4]
 
+# Taxi movement
+TAXI_MOVE_INTERVAL = 5  # Seconds between movement ticks
+TAXI_TURN_PROBABILITY = 0.2  # Chance of picking a new direction on a tick while the heading is still open
+TAXI_REPLY_TIMEOUT = 1.0  # Seconds a taxi waits for the dispatcher to answer a connect request or liveness probe
+TAXI_CONNECT_RETRY_AFTER = 2.0  # Seconds a taxi told connect_retry waits before asking the same dispatcher again
+
+# Heartbeats: taxis send one every HEARTBEAT_INTERVAL and are disconnected after HEARTBEAT_TIMEOUT of silence
+HEARTBEAT_INTERVAL = 5
+HEARTBEAT_TIMEOUT = 10
+
+# Heartbeat history: last-seen times stay in memory; every HEARTBEAT_ROLLUP_INTERVAL seconds each
+# taxi's beats become one heartbeat_rollup row. Every HEARTBEAT_COMPACTION_INTERVAL, rollups older
+# than HEARTBEAT_COMPACT_AFTER are merged into HEARTBEAT_COMPACTED_BUCKET rows and those older
+# than HEARTBEAT_RETENTION are deleted
+HEARTBEAT_ROLLUP_INTERVAL = 60
+HEARTBEAT_COMPACTION_INTERVAL = 3600
+HEARTBEAT_COMPACT_AFTER = 24 * 3600
+HEARTBEAT_COMPACTED_BUCKET = 3600
+HEARTBEAT_RETENTION = 30 * 24 * 3600
+
+# Simulated time: every service sleeps and timestamps through src.utils.clock. A scale of 100
+# runs the whole distributed system 100x faster; all processes must use the same scale.
+CLOCK_SCALE = float(os.environ.get("CLOCK_SCALE", "1"))
+CLOCK_EPOCH = 1700000000  # Shared origin of scaled time, so processes agree on "now"
+
+# Seconds a dispatched taxi stays busy with its user before it is available again
+SERVICE_DURATION = 30
+
+# Dead reckoning: taxis only report when they drift further than this (in cells, Manhattan)
+# from the position the dispatcher predicts, or when they turn, stop or change status
+DEAD_RECKONING_THRESHOLD = 1
+
 # Grid configuration
 MAX_N = 1000
 MAX_M = 1000
@@ -34,4 +83,82 @@ DB_USER = "root"
 DB_PASSWORD = "123456789"
 DB_HOST = "192.168.1.13"
 DB_PORT = "3306"
-DB_NAME = "taxi_dispatch"
\ No newline at end of file
+DB_NAME = "taxi_dispatch"
+
+# Group commit: dispatcher storage writes are committed together, in one transaction per
+# GROUP_COMMIT_WINDOW seconds or GROUP_COMMIT_MAX_OPS writes, whichever comes first
+GROUP_COMMIT_WINDOW = 0.005
+GROUP_COMMIT_MAX_OPS = 500
+TAXI_CACHE_SIZE = 100000  # Taxi rows kept by the dispatcher's read-through cache (LRU)
+FLEET_PRELOAD_CHUNK = 5000  # Taxis per chunk when a fresh dispatcher streams the fleet from MySQL
+
+# Storage backpressure: socket loops never wait on MySQL for longer than an operation's timeout.
+# Reads run on a bounded pool; the group-commit queue is bounded too, and once it is full position
+# updates are coalesced per taxi, heartbeat writes are skipped and other writes wait their timeout
+STORAGE_READ_WORKERS = 4
+STORAGE_READ_QUEUE_SIZE = 32  # Reads waiting for a worker before further reads are refused
+STORAGE_WRITE_QUEUE_SIZE = 20000  # Writes waiting for the group-commit writer
+STORAGE_TIMEOUTS = {  # Seconds a caller waits for the operation
+    "taxi_exists": 0.5,
+    "get_available_taxis": 1.0,
+    "upsert_taxi_on_connect": TAXI_REPLY_TIMEOUT / 2,  # Leaves time for connect_retry to reach the waiting taxi
+    "reserve_and_assign": 2.0,
+}
+STORAGE_DEFAULT_TIMEOUT = 2.0
+
+# Admission control on the user request path: users stamp requests with the time they give up
+# (USER_REQUEST_TIMEOUT after sending); the dispatcher drops requests past it and, while the
+# queueing delay stays above ADMISSION_TARGET_DELAY for ADMISSION_INTERVAL seconds, answers busy.
+# These are wall-clock seconds on both sides (src.utils.admission.request_time), unaffected by CLOCK_SCALE
+USER_REQUEST_TIMEOUT = 30
+USER_FAILOVER_AFTER = 15  # Seconds of that deadline spent on the main dispatcher before trying the backup
+ADMISSION_TARGET_DELAY = 1.0
+ADMISSION_INTERVAL = 2.0
+ADMISSION_RETRY_AFTER = 2.0  # Least seconds a shed user waits before trying again
+USER_PENDING_LIMIT = 10000  # Requests held for earliest-deadline-first serving; the rest wait on the socket
+
+# Request dedup: the outcome of each user request, by the request=<id> tag, so retries and
+# failovers get the original answer; assignments are also rebuilt from MySQL on start-up
+REQUEST_DEDUP_SIZE = 100000
+REQUEST_DEDUP_TTL = 300  # Seconds an outcome is kept; longer than a user retries
+
+# Local control channels (stats, profiling); bound to 127.0.0.1 only
+STATS_PORT = 5575
+BACKUP_STATS_PORT = 5576
+CONTROL_TIMEOUT = 5000  # Milliseconds the control client waits for a reply
+TAXI_CONTROL_PORT = 0  # 0 picks a free port per taxi process and prints it
+PROFILE_DIR = "profiles"  # Profiler and tracemalloc dumps
+PROFILE_SAMPLE_INTERVAL = 5  # Milliseconds between stack samples
+
+# Logging: messages are queued to one writer thread per process instead of printed inline
+LOG_LEVEL = os.environ.get("LOG_LEVEL", "INFO")  # INFO, SUCCESS, WARNING or ERROR; lower levels are dropped
+LOG_QUEUE_SIZE = 10000  # Messages waiting for the writer; beyond this they are dropped and counted
+LOG_RATE_LIMIT = 20  # Messages per second allowed from any one call site
+LOG_RATE_BURST = 50  # Messages a call site may log at once before the rate limit applies
+LOG_SUPPRESSION_REPORT = 5  # Seconds between summaries of rate-limited and dropped messages
+LOG_JSON_PATH = os.environ.get("LOG_JSON_PATH")  # Headless: JSON lines to this file ("-" for stdout) instead of the console
+
+# Fleet snapshots: dispatchers stream the fleet table here for `python -m src.dashboard`
+DASHBOARD_PORT = 5577
+BACKUP_DASHBOARD_PORT = 5578
+SNAPSHOT_INTERVAL = 1.0  # Seconds between snapshots (and local table refreshes)
+FLEET_KEYFRAME_INTERVAL = 10  # Every n-th snapshot is a full keyframe, the rest carry only changed taxis
+DISPATCHER_HEADLESS = os.environ.get("DISPATCHER_HEADLESS", "0") == "1"  # Skip the local live table
+DASHBOARD_PAGE_SIZE = 40  # Taxis per dashboard page
+
+# Dispatcher state on local disk: a snapshot every STATE_SNAPSHOT_INTERVAL seconds plus a
+# journal of the changes since, so a restarted dispatcher is serving again without MySQL scans
+STATE_DIR = "state"
+STATE_SNAPSHOT_INTERVAL = 30
+STATE_RECONCILE_MARGIN = 5  # Seconds before the local state's last write from which MySQL changes are re-read on restart
+
+# Request tracing: spans from users, dispatchers and taxis are appended to JSON-lines files here
+TRACE_ENABLED = True
+TRACE_DIR = "traces"
+
+# Shared-memory fleet table (multi-process dispatch)
+FLEET_TABLE_CAPACITY = 200000  # Maximum number of taxi slots
+FLEET_CONTROL_PORT = 5572  # Dispatcher -> ingest process control messages (local only)
+FLEET_QUERY_PORT = 5573  # Nearest-taxi queries answered by the matcher processes
+FLEET_MATCHER_BACKEND_PORT = 5574  # Matcher processes connect here (local only)
+FLEET_QUERY_TIMEOUT = 1000  # Milliseconds before the dispatcher answers a query itself
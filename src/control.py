@@ -0,0 +1,27 @@
+import sys
+import zmq
+from src.config import CONTROL_TIMEOUT
+
+def main():
+    if len(sys.argv) < 3:
+        print("Usage: python control.py <port> <command> [args...]")
+        print("Commands: help, stats [text], reset_stats, log [level LEVEL], profile start|stop|status, memory start|snapshot|stop, heartbeats [taxi_id], cache")
+        sys.exit(1)
+
+    port = int(sys.argv[1])
+    context = zmq.Context()
+    requester = context.socket(zmq.REQ)
+    requester.connect(f"tcp://127.0.0.1:{port}")
+    try:
+        requester.send_string(" ".join(sys.argv[2:]))
+        if requester.poll(CONTROL_TIMEOUT):
+            print(requester.recv_string())
+        else:
+            print(f"No reply from control channel on port {port}")
+            sys.exit(1)
+    finally:
+        requester.close(linger=0)
+        context.term()
+
+if __name__ == "__main__":
+    main()
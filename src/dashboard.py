@@ -0,0 +1,25 @@
+import sys
+from src.services.dashboard_service import DashboardService, SORT_COLUMNS, STATUS_FILTERS
+from src.config import DISPATCHER_IP, DASHBOARD_PORT, DASHBOARD_PAGE_SIZE
+
+def main():
+    if len(sys.argv) > 6:
+        print("Usage: python dashboard.py [host] [port] [page_size] [sort] [filter]")
+        print(f"Sort columns: {', '.join(SORT_COLUMNS)}; filters: {', '.join(STATUS_FILTERS)}")
+        sys.exit(1)
+
+    host = sys.argv[1] if len(sys.argv) > 1 else DISPATCHER_IP
+    port = int(sys.argv[2]) if len(sys.argv) > 2 else DASHBOARD_PORT
+    page_size = int(sys.argv[3]) if len(sys.argv) > 3 else DASHBOARD_PAGE_SIZE
+    sort = sys.argv[4] if len(sys.argv) > 4 else "id"
+    status_filter = sys.argv[5] if len(sys.argv) > 5 else "all"
+
+    try:
+        dashboard = DashboardService(host, port, page_size, sort, status_filter)
+    except ValueError as e:
+        print(e)
+        sys.exit(1)
+    dashboard.run()
+
+if __name__ == "__main__":
+    main()
@@ -3,14 +3,15 @@ from src.services.dispatcher_service import DispatcherService
 from src.config import MAX_N, MAX_M
 
 def main():
-    if len(sys.argv) != 3:
-        print("Usage: python dispatcher.py <N> <M>")
+    if len(sys.argv) not in (3, 4):
+        print("Usage: python dispatcher.py <N> <M> [fleet_workers]")
         sys.exit(1)
 
     N = int(sys.argv[1])
     M = int(sys.argv[2])
+    fleet_workers = int(sys.argv[3]) if len(sys.argv) == 4 else 0
 
-    dispatcher = DispatcherService(N, M)
+    dispatcher = DispatcherService(N, M, fleet_workers)
     dispatcher.run()
 
 if __name__ == "__main__":
@@ -0,0 +1,16 @@
+import sys
+from src.services.gateway_service import GatewayService
+from src.config import DISPATCHER_IP
+
+def main():
+    if len(sys.argv) > 2:
+        print("Usage: python gateway.py [dispatcher_ip]")
+        sys.exit(1)
+
+    dispatcher_ip = sys.argv[1] if len(sys.argv) == 2 else DISPATCHER_IP
+
+    gateway = GatewayService(dispatcher_ip)
+    gateway.run()
+
+if __name__ == "__main__":
+    main()
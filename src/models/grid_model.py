@@ -1,7 +1,19 @@
 class Grid:
+    __slots__ = ("rows", "cols")
+
+    _shared = {}
+
     def __init__(self, rows, cols):
         self.rows = rows
         self.cols = cols
 
+    @classmethod
+    def shared(cls, rows, cols):
+        # Grids are immutable in practice, so every taxi on the same map can share one
+        grid = cls._shared.get((rows, cols))
+        if grid is None:
+            grid = cls._shared[(rows, cols)] = cls(rows, cols)
+        return grid
+
     def is_within_bounds(self, x, y):
         return 0 <= x < self.rows and 0 <= y < self.cols
@@ -0,0 +1,58 @@
+from src.config import DISPATCHER_IP, SHARD_PORT_STRIDE, SHARD_HOSTS
+
+class Shard:
+    def __init__(self, shard_id, x_min, x_max, y_min, y_max, host):
+        self.shard_id = shard_id
+        # Inclusive bounds, taxis live on x in [0, M] and y in [0, N]
+        self.x_min = x_min
+        self.x_max = x_max
+        self.y_min = y_min
+        self.y_max = y_max
+        self.host = host
+        # Shards never use the base ports, those stay with the router and unsharded dispatchers
+        self.port_offset = (shard_id + 1) * SHARD_PORT_STRIDE
+
+    def contains(self, x, y):
+        return self.x_min <= x <= self.x_max and self.y_min <= y <= self.y_max
+
+    def distance_to(self, x, y):
+        # Manhattan distance from (x, y) to the closest cell of this region
+        dx = max(self.x_min - x, 0, x - self.x_max)
+        dy = max(self.y_min - y, 0, y - self.y_max)
+        return dx + dy
+
+    def port(self, base_port):
+        return base_port + self.port_offset
+
+
+class ShardMap:
+    def __init__(self, N, M, shards_x, shards_y, hosts=SHARD_HOSTS):
+        self.N = N
+        self.M = M
+        self.shards = []
+        x_bounds = self.split(M + 1, shards_x)
+        y_bounds = self.split(N + 1, shards_y)
+        for row, (y_min, y_max) in enumerate(y_bounds):
+            for col, (x_min, x_max) in enumerate(x_bounds):
+                shard_id = row * len(x_bounds) + col
+                host = hosts[shard_id] if shard_id < len(hosts) else DISPATCHER_IP
+                self.shards.append(Shard(shard_id, x_min, x_max, y_min, y_max, host))
+        self.shards_x = shards_x
+        self.shards_y = shards_y
+        self.x_bounds = x_bounds
+        self.y_bounds = y_bounds
+
+    @staticmethod
+    def split(size, parts):
+        width = -(-size // parts)  # ceiling division
+        return [(start, min(start + width, size) - 1) for start in range(0, size, width)]
+
+    def owner(self, x, y):
+        col = min(max(x, 0) // (self.x_bounds[0][1] + 1), len(self.x_bounds) - 1)
+        row = min(max(y, 0) // (self.y_bounds[0][1] + 1), len(self.y_bounds) - 1)
+        return self.shards[row * len(self.x_bounds) + col]
+
+    def neighbours_by_distance(self, x, y, exclude=None):
+        # Other shards that could hold a closer taxi, nearest region first
+        others = [shard for shard in self.shards if shard is not exclude]
+        return sorted(others, key=lambda shard: (shard.distance_to(x, y), shard.shard_id))
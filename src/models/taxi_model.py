@@ -1,21 +1,78 @@
+import random
 from src.models.grid_model import Grid
+from src.config import TAXI_TURN_PROBABILITY
+
+DIRECTIONS = ["NORTH", "SOUTH", "EAST", "WEST"]
+
+# Integer status codes for array-backed fleet storage
+TAXI_STATUS_AVAILABLE = 0
+TAXI_STATUS_UNAVAILABLE = 1
+TAXI_STATUS_CODES = {"available": TAXI_STATUS_AVAILABLE, "unavailable": TAXI_STATUS_UNAVAILABLE}
+TAXI_STATUS_NAMES = {code: name for name, code in TAXI_STATUS_CODES.items()}
+
+def encode_status(status):
+    # Anything that is not explicitly available must never be matched
+    return TAXI_STATUS_CODES.get(str(status).lower(), TAXI_STATUS_UNAVAILABLE)
+
+def decode_status(code):
+    return TAXI_STATUS_NAMES.get(int(code), "unavailable")
 
 class Taxi():
+    # No per-instance dict: a 100k-taxi fleet is mostly these fields
+    __slots__ = (
+        "taxi_id", "pos_x", "pos_y", "speed", "grid", "status_code",
+        "connected", "stopped", "move_counter", "was_off_borders", "heading",
+    )
+    verbose = True  # Print border events; simulated fleets turn this off
+
     def __init__(self, taxi_id, N, M, pos_x, pos_y, speed, status, connected=False):
         self.taxi_id = taxi_id
-        self.initial_pos_x = pos_x
-        self.initial_pos_y = pos_y
         self.pos_x = pos_x
         self.pos_y = pos_y
         self.speed = speed
-        self.grid = Grid(N, M)
-        self.N = N  # Grid rows (Y-axis)
-        self.M = M  # Grid columns (X-axis)
-        self.status = status
+        self.grid = Grid.shared(N, M)
+        self.status_code = encode_status(status)
         self.connected = connected
         self.stopped = False
         self.move_counter = 0
         self.was_off_borders = False  # Tracks if the taxi has moved off all borders
+        self.heading = None  # Last direction moved, kept until blocked or the taxi turns
+
+    @property
+    def N(self):
+        return self.grid.rows  # Grid rows (Y-axis)
+
+    @property
+    def M(self):
+        return self.grid.cols  # Grid columns (X-axis)
+
+    @property
+    def status(self):
+        return decode_status(self.status_code)
+
+    @status.setter
+    def status(self, status):
+        self.status_code = encode_status(status)
+
+    def cells_for_tick(self):
+        # Speed 4 covers two cells per tick, speed 2 one cell, speed 1 one cell every other tick
+        self.move_counter += 1
+        if self.speed == 4:
+            return 2
+        elif self.speed == 2:
+            return 1
+        elif self.speed == 1:
+            return 1 if self.move_counter % 2 == 0 else 0
+        return 0
+
+    def choose_direction(self, rng=random):
+        valid_directions = [direction for direction in DIRECTIONS if self.can_move(direction)]
+        if not valid_directions:
+            return None
+        # Keep driving straight most of the time so the dispatcher can dead-reckon the taxi
+        if self.heading in valid_directions and rng.random() >= TAXI_TURN_PROBABILITY:
+            return self.heading
+        return rng.choice(valid_directions)
 
     def move(self, direction, cells_to_move):
         if self.stopped:
@@ -48,6 +105,7 @@ class Taxi():
         # Update position
         self.pos_x = new_pos_x
         self.pos_y = new_pos_y
+        self.heading = direction
 
         # Check if the taxi is currently on any border
         on_border = (
@@ -64,13 +122,15 @@ class Taxi():
         if on_border:
             if self.was_off_borders:
                 self.stopped = True
-                print(f"Taxi {self.taxi_id} has stopped moving at ({self.pos_x}, {self.pos_y}).")
+                if self.verbose:
+                    print(f"Taxi {self.taxi_id} has stopped moving at ({self.pos_x}, {self.pos_y}).")
                 return  # Exit the move function
             # If still on borders and hasn't moved off yet, continue moving
         else:
             if not self.was_off_borders:
                 self.was_off_borders = True
-                print(f"Taxi {self.taxi_id} has moved off the borders.")
+                if self.verbose:
+                    print(f"Taxi {self.taxi_id} has moved off the borders.")
 
     def can_move(self, direction):
         if direction == "NORTH":
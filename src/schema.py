@@ -0,0 +1,34 @@
+import sys
+from src.config import DB_USER, DB_PASSWORD, DB_HOST, DB_NAME
+from src.utils.db_handler import DatabaseHandler
+from src.utils.schema import migrate, check_query_plans
+
+def main():
+    if len(sys.argv) != 2 or sys.argv[1] not in ("migrate", "check"):
+        print("Usage: python schema.py migrate|check")
+        sys.exit(1)
+
+    db_handler = DatabaseHandler(host=DB_HOST, user=DB_USER, password=DB_PASSWORD, database=DB_NAME)
+    try:
+        if sys.argv[1] == "migrate":
+            steps, failures = migrate(db_handler)
+            for step in steps:
+                print(step)
+            for failure in failures:
+                print(f"FAIL  {failure}")
+            if not steps and not failures:
+                print("Schema is up to date")
+            if failures:
+                sys.exit(1)
+            return
+
+        results = check_query_plans(db_handler)
+        for name, ok, detail in results:
+            print(f"{'ok' if ok else 'FAIL':<5} {name:<28} {detail}")
+        if not all(ok for _, ok, _ in results):
+            sys.exit(1)
+    finally:
+        db_handler.close()
+
+if __name__ == "__main__":
+    main()
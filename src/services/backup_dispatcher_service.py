@@ -1,4 +1,5 @@
 import zmq
+import json
 import threading
 import time
 from threading import Thread, Event, Lock
@@ -9,18 +10,32 @@ from src.utils.rich_utils import RichConsoleUtils
 from src.utils.validation_utils import validate_grid
 from src.utils.zmq_utils import ZMQUtils
 from src.utils.db_handler import DatabaseHandler
+from src.utils.dead_reckoning import DeadReckoningTracker
+from src.utils.matching import nearest_taxi
 from src.services.database_service import DatabaseService
-from src.config import DB_USER, DB_PASSWORD, DB_HOST, DB_PORT, DB_NAME
+from src.config import DB_USER, DB_PASSWORD, DB_HOST, DB_PORT, DB_NAME, GATEWAY_PULL_PORT, SERVICE_DURATION, HEARTBEAT_INTERVAL, BACKUP_STATS_PORT, BACKUP_DASHBOARD_PORT, DISPATCHER_HEADLESS, USER_REQUEST_TIMEOUT, REQUEST_DEDUP_TTL
+from src.utils.clock import default_clock
+from src.utils.metrics import Metrics, InstrumentedCalls
+from src.utils.tracing import Tracer, split_tags, trace_tags
+from src.services.control_service import ControlService
+from src.utils.profiling import Profiler
+from src.utils.group_commit import GroupCommitWriter
+from src.utils.heartbeat_history import HeartbeatHistory
+from src.utils.schema import migrate
+from src.utils.taxi_cache import CachedTaxiReads
+from src.utils.storage_executor import StorageExecutor, StorageUnavailable, StorageTimeout
+from src.utils.admission import AdmissionControl, request_time
+from src.utils.pending_requests import PendingRequests
+from src.utils.request_outcomes import RequestOutcomes
+from src.services.snapshot_service import SnapshotPublisher
 
 class BackupDispatcherService:
-    def __init__(self, N, M):
+    def __init__(self, N, M, clock=None, headless=DISPATCHER_HEADLESS):
         self.console_utils = RichConsoleUtils()
+        self.clock = clock or default_clock()
         self.system = System(N, M)  # Ensure System class is defined
         self.zmq_utils = ZMQUtils(BACKUP_DISPATCHER_IP, PUB_PORT, SUB_PORT, REP_PORT, PULL_PORT, HEARTBEAT_PORT, HEARTBEAT_2_PORT)
 
-        columns = ["Taxi ID", "Position X", "Position Y", "Speed", "Status", "Connected"]
-        self.table = self.console_utils.create_table("Taxi Positions", columns)
-
         self.stop_event = Event()
         self.heartbeat_lock = Lock()
         self.heartbeat_timestamps = {}
@@ -29,11 +44,40 @@ class BackupDispatcherService:
         self.activation_socket = self.zmq_utils.context.socket(zmq.PULL)
         self.activation_socket.bind(f"tcp://*:{BACKUP_ACTIVATION_PORT}")
 
-        self.user_req_socket = self.zmq_utils.bind_rep_user_request_socket(BACKUP_USER_REQ_PORT)
+        self.user_req_socket = self.zmq_utils.bind_router_user_request_socket(BACKUP_USER_REQ_PORT)
 
         self.assignment_lock = Lock()
-
-        self.db_handler = DatabaseHandler(host=DB_HOST, user=DB_USER, password=DB_PASSWORD, database=DB_NAME)
+        self.position_tracker = DeadReckoningTracker(N, M, self.clock)
+
+        # Every storage call that reaches MySQL is timed as storage.<method>; taxi lookups are cached
+        self.metrics = Metrics()
+        self.tracer = Tracer("backup_dispatcher")
+        self.db_handler = CachedTaxiReads(InstrumentedCalls(
+            DatabaseHandler(host=DB_HOST, user=DB_USER, password=DB_PASSWORD, database=DB_NAME), self.metrics, "storage"
+        ), self.metrics)
+        # Writes from every handler thread are committed in groups by one StorageWriter thread
+        self.storage_writer = GroupCommitWriter(self.db_handler, self.metrics)
+        # Reads that may block on MySQL run on a bounded pool with per-operation timeouts
+        self.storage = StorageExecutor(self.db_handler, self.metrics)
+        # User requests past their deadline, or stuck behind a standing queue, are turned away unserved
+        self.admission = AdmissionControl(self.metrics)
+        # Requests waiting to be served, earliest deadline first
+        self.pending_requests = PendingRequests()
+        # Final replies by request id, so retries and failovers are answered without a second match
+        self.request_outcomes = RequestOutcomes(self.metrics)
+        # Heartbeats are kept in memory and written as periodic per-taxi rollups
+        self.heartbeat_history = HeartbeatHistory(self.storage_writer, self.clock)
+        self.control_service = ControlService(BACKUP_STATS_PORT)
+        self.control_service.register("stats", lambda args: self.metrics.render() if args == ["text"] else json.dumps(self.metrics.snapshot()))
+        self.control_service.register("reset_stats", lambda args: (self.metrics.reset(), "ok")[1])
+        self.profiler = Profiler("backup_dispatcher")
+        self.profiler.register(self.control_service)
+        self.control_service.register("heartbeats", self.heartbeat_history.status)
+        self.control_service.register("cache", self.db_handler.stats)
+        self.control_service.register("admission", lambda args: f"{self.admission.status(args)}, {len(self.pending_requests)} pending, {len(self.request_outcomes)} outcomes remembered")
+        self.snapshot_publisher = SnapshotPublisher(
+            "backup_dispatcher", BACKUP_DASHBOARD_PORT, lambda: self.db_handler.get_all_taxis(), headless=headless
+        )
 
         self.main_dispatcher_offline = False
         self.heartbeat_2_port = HEARTBEAT_2_PORT
@@ -46,6 +90,8 @@ class BackupDispatcherService:
                 try:
                     if responder.poll(100):
                         message = responder.recv_string()
+                        self.metrics.inc("taxi_requests")
+                        watch = self.metrics.stopwatch("taxi_request")
                         if message.startswith("connect_request"):
                             parts = message.split()
                             if len(parts) < 6:
@@ -63,49 +109,34 @@ class BackupDispatcherService:
                                 self.console_utils.print(f"Invalid data types in connect_request message: {message}", 3)
                                 responder.send_string("invalid_request")
                                 continue
+                            watch.lap("parse")
 
-                            # if taxi_id not in self.system.taxis:
-                            if not self.db_handler.taxi_exists(taxi_id):
-                                # Register new taxi in-memory
-                                taxi = Taxi(taxi_id, self.system.grid.rows, self.system.grid.cols, pos_x, pos_y, speed, status, True)
-                                taxi.initial_pos_x = pos_x
-                                taxi.initial_pos_y = pos_y
-                                # self.system.register_taxi(taxi)
-                                
-                                # Add taxi to the database
-                                self.db_handler.add_taxi(
-                                    taxi_id=taxi_id,
-                                    pos_x=pos_x,
-                                    pos_y=pos_y,
-                                    speed=speed,
-                                    status=status
-                                )
-                                
-                                responder.send_string(f"connect_ack {taxi_id}")
+                            # One transaction registers or refreshes the taxi
+                            try:
+                                created = self.storage_writer.write("upsert_taxi_on_connect", taxi_id, pos_x, pos_y, speed, status)
+                            except StorageUnavailable:
+                                # Not acknowledged, so the taxi retries; a commit that lands later is harmless
+                                self.metrics.inc("connect_requests.degraded")
+                                responder.send_string(f"connect_retry {taxi_id}")
+                                continue
+                            watch.lap("storage")
+
+                            responder.send_string(f"connect_ack {taxi_id}")
+                            watch.lap("reply")
+                            if created:
                                 self.console_utils.print(f"Taxi {taxi_id} connected at ({pos_x}, {pos_y}) with speed {speed}.")
-                            else:
-                                # Update existing taxi in-memory
-                                # taxi = self.system.taxis[taxi_id]
-                                # taxi.pos_x = pos_x
-                                # taxi.pos_y = pos_y
-                                # taxi.speed = speed
-                                # taxi.status = status
-                                # taxi.connected = True  # Mark as connected upon reconnection
-                                
-                                # Update taxi in the database
-                                self.db_handler.update_taxi_position(taxi_id, pos_x, pos_y)
-                                self.db_handler.set_taxi_status(taxi_id, status)
-                                self.db_handler.update_taxi_connected_status(taxi_id, connected=True)
-                                
-                                responder.send_string(f"connect_ack {taxi_id}")
-                                # self.console_utils.print(f"Taxi {taxi_id} reconnected and updated.")
+
+                            self.position_tracker.record(taxi_id, pos_x, pos_y, "NONE", speed)
 
                             # Update Heartbeat Timestamp
-                            with self.heartbeat_lock:
-                                self.heartbeat_timestamps[taxi_id] = time.time()
-                                self.db_handler.record_heartbeat(taxi_id)
+                            now = self.clock.time()
+                            self.heartbeat_history.seen(taxi_id, now)
+                            with self.metrics.acquire(self.heartbeat_lock, "heartbeat"):
+                                self.heartbeat_timestamps[taxi_id] = now
 
                             self.refresh_table()
+                            watch.lap("display")
+                            watch.finish()
 
                 except zmq.Again:
                     pass
@@ -126,57 +157,14 @@ class BackupDispatcherService:
         try:
             while not self.stop_event.is_set():
                 try:
-                    if responder.poll(100):
-                        message = responder.recv_string()
-                        if message.startswith("user_request"):
-                            parts = message.split()
-                            if len(parts) != 4:
-                                self.console_utils.print(f"Invalid user_request message: {message}", 3)
-                                responder.send_string("invalid_request")
-                                continue
-                            _, user_id, user_x, user_y = parts
-                            try:
-                                user_id = int(user_id)
-                                user_x = int(user_x)
-                                user_y = int(user_y)
-                            except ValueError:
-                                self.console_utils.print(f"Invalid data types in user_request message: {message}", 3)
-                                responder.send_string("invalid_request")
-                                continue
-
-                            self.console_utils.print(f"Received ride request from User {user_id} at ({user_x}, {user_y})", 2)
-                            self.db_handler.add_user_request(user_id, user_x, user_y, waiting_time=30)
-                            assigned_taxi = self.find_nearest_available_taxi(user_x, user_y)
-
-                            if assigned_taxi:
-                                with self.assignment_lock:
-                                    if assigned_taxi['connected'] and assigned_taxi['status'].lower() == "available":
-                                        self.db_handler.assign_taxi_to_user(user_id, assigned_taxi['taxi_id'])
-
-                                        assigned_taxi['connected'] = True
-                                        assigned_taxi['status'] = "unavailable"
-
-                                        self.console_utils.print(f"Assigned Taxi {assigned_taxi['taxi_id']} to User {user_id}", 2)
-                                        responder.send_string(f"assign_taxi {assigned_taxi['taxi_id']}")
-
-                                        self.zmq_utils.publish_assignment(f"assign {assigned_taxi['taxi_id']} {user_id}")
-
-                                        service_thread = Thread(
-                                            target=self.simulate_service,
-                                            args=(assigned_taxi['taxi_id'], user_id, 30),
-                                            daemon=True,
-                                        )
-                                        service_thread.start()
-                                    else:
-                                        self.console_utils.print(
-                                            f"Taxi {assigned_taxi['taxi_id']} became unavailable during assignment.", 3
-                                        )
-                                        responder.send_string("no_taxi_available")
-                            else:
-                                self.console_utils.print(f"No available taxis for User {user_id}", 3)
-                                responder.send_string("no_taxi_available")
-
-                            self.refresh_table()
+                    # Take in everything waiting on the socket, then serve the request closest to its deadline
+                    timeout = 0 if self.pending_requests else 100
+                    while not self.pending_requests.full() and responder.poll(timeout):
+                        self.receive_user_request(responder)
+                        timeout = 0
+                    request = self.pending_requests.pop()
+                    if request:
+                        self.serve_user_request(responder, *request)
                 except zmq.Again:
                     pass
                 except zmq.ZMQError as e:
@@ -190,21 +178,170 @@ class BackupDispatcherService:
             if responder:
                 responder.close()
 
+    def reply_user(self, responder, envelope, reply):
+        # ROUTER replies go back through the envelope (requester identity and delimiter) they came with
+        responder.send_multipart(envelope + [reply.encode()])
+
+    def answer_user(self, responder, envelope, tags, reply):
+        # A final reply, remembered so repeats of the request get it again
+        self.request_outcomes.record(tags.get("request"), reply, request_time())
+        self.reply_user(responder, envelope, reply)
+
+    def receive_user_request(self, responder):
+        frames = responder.recv_multipart()
+        envelope, message = frames[:-1], frames[-1].decode()
+        self.metrics.inc("user_requests")
+        watch = self.metrics.stopwatch("user_request")
+        if not message.startswith("user_request"):
+            self.console_utils.print(f"Unknown user request message: {message}", 3)
+            self.reply_user(responder, envelope, "invalid_request")
+            return
+        # Requests carry trace=<id> sent=<time> deadline=<time> after the positional fields
+        parts, tags = split_tags(message.split())
+        if len(parts) != 4:
+            self.console_utils.print(f"Invalid user_request message: {message}", 3)
+            self.reply_user(responder, envelope, "invalid_request")
+            return
+        _, user_id, user_x, user_y = parts
+        try:
+            user_id = int(user_id)
+            user_x = int(user_x)
+            user_y = int(user_y)
+        except ValueError:
+            self.console_utils.print(f"Invalid data types in user_request message: {message}", 3)
+            self.reply_user(responder, envelope, "invalid_request")
+            return
+
+        watch.lap("parse")
+        trace_id = tags.get("trace")
+        if trace_id:
+            watch.trace(trace_id, self.tracer)
+            self.tracer.span_since(trace_id, "user_request.queue", tags.get("sent"), until=watch.wall_start)
+        # A repeat of a request already answered costs this lookup and nothing else; the
+        # stopwatch's wall_start is request_time() when the request came off the socket
+        outcome = self.request_outcomes.get(tags.get("request"), watch.wall_start)
+        if outcome:
+            self.reply_user(responder, envelope, outcome)
+            return
+        self.pending_requests.push((envelope, user_id, user_x, user_y, tags, watch), tags, watch.wall_start)
+
+    def serve_user_request(self, responder, envelope, user_id, user_x, user_y, tags, watch):
+        watch.lap("pending")
+        trace_id = tags.get("trace")
+        outcome = self.request_outcomes.get(tags.get("request"), request_time())
+        if outcome:
+            # The same request was pending twice
+            self.reply_user(responder, envelope, outcome)
+            return
+        rejection = self.admission.admit(tags, request_time())
+        if rejection:
+            self.reply_user(responder, envelope, rejection)
+            return
+
+        self.console_utils.print(f"Received ride request from User {user_id} at ({user_x}, {user_y})", 2)
+        try:
+            assigned_taxi = self.find_nearest_available_taxi(user_x, user_y)
+        except StorageUnavailable:
+            # MySQL is too slow to match against right now: answer instead of stalling the socket
+            self.metrics.inc("user_requests.degraded")
+            assigned_taxi = None
+        watch.lap("match")
+
+        if assigned_taxi:
+            with self.metrics.acquire(self.assignment_lock, "assignment"):
+                # The request, the reservation and the assignment commit together; the
+                # reservation fails if the taxi was taken since it was matched
+                if (
+                    assigned_taxi['connected']
+                    and assigned_taxi['status'].lower() == "available"
+                    and self.reserve_taxi(
+                        user_id, user_x, user_y, assigned_taxi['taxi_id'], self.admission.tolerance(tags), tags.get("request")
+                    )
+                ):
+                    watch.lap("storage")
+
+                    assigned_taxi['connected'] = True
+                    assigned_taxi['status'] = "unavailable"
+
+                    self.console_utils.print(f"Assigned Taxi {assigned_taxi['taxi_id']} to User {user_id}", 2)
+                    self.answer_user(responder, envelope, tags, f"assign_taxi {assigned_taxi['taxi_id']}")
+                    watch.lap("reply")
+                    self.metrics.inc("user_requests.assigned")
+                    self.admission.served(tags, request_time())
+
+                    self.zmq_utils.publish_assignment(
+                        f"assign {assigned_taxi['taxi_id']} {user_id}{trace_tags(trace_id, time.time())}"
+                    )
+                    watch.lap("publish")
+
+                    service_thread = Thread(
+                        target=self.simulate_service,
+                        args=(assigned_taxi['taxi_id'], user_id, SERVICE_DURATION),
+                        daemon=True,
+                    )
+                    service_thread.start()
+                else:
+                    self.console_utils.print(
+                        f"Taxi {assigned_taxi['taxi_id']} became unavailable during assignment.", 3
+                    )
+                    self.storage_writer.submit("add_user_request", user_id, user_x, user_y, self.admission.tolerance(tags))
+                    watch.lap("storage")
+                    self.answer_user(responder, envelope, tags, "no_taxi_available")
+                    watch.lap("reply")
+        else:
+            self.console_utils.print(f"No available taxis for User {user_id}", 3)
+            self.storage_writer.submit("add_user_request", user_id, user_x, user_y, self.admission.tolerance(tags))
+            watch.lap("storage")
+            self.answer_user(responder, envelope, tags, "no_taxi_available")
+            watch.lap("reply")
+            self.metrics.inc("user_requests.unserved")
+
+        self.refresh_table()
+        watch.lap("display")
+        watch.finish()
+
+    def taxi_known(self, taxi_id):
+        # Known taxis answer from the cache; a miss asks MySQL through the bounded executor, None if it cannot
+        if self.db_handler.knows(taxi_id):
+            return True
+        try:
+            return self.storage.call("taxi_exists", taxi_id)
+        except StorageUnavailable:
+            return None
+
+    def reserve_taxi(self, user_id, user_x, user_y, taxi_id, waiting_time=USER_REQUEST_TIMEOUT, request_id=None):
+        # reserve_and_assign within its timeout; a reservation that commits after we gave up is released
+        try:
+            return self.storage_writer.write("reserve_and_assign", user_id, user_x, user_y, taxi_id, waiting_time, request_id)
+        except StorageTimeout as e:
+            e.future.add_done_callback(lambda future: self.release_late_reservation(future, taxi_id, user_id, request_id))
+        except StorageUnavailable:
+            pass
+        self.metrics.inc("user_requests.degraded")
+        return False
+
+    def release_late_reservation(self, future, taxi_id, user_id, request_id):
+        # Runs on the writer thread, which must not wait for room in its own queue. Frees the taxi and
+        # deletes the assignment together, or a retry of the request would be answered with this taxi
+        if future.exception() is None and future.result():
+            Thread(target=self.storage_writer.submit, args=("release_reservation", taxi_id, user_id, request_id), daemon=True).start()
+
     def find_nearest_available_taxi(self, user_x, user_y):
-        with self.assignment_lock:
-            available_taxis = self.db_handler.get_available_taxis()
+        with self.metrics.acquire(self.assignment_lock, "assignment"):
+            available_taxis = self.storage.call("get_available_taxis")
             if not available_taxis:
                 return None
-            # Calculate Manhattan distance and sort
-            available_taxis.sort(
-                key=lambda taxi: (abs(taxi['pos_x'] - user_x) + abs(taxi['pos_y'] - user_y), taxi['taxi_id'])
-            )
-            nearest_taxi = available_taxis[0]  # Get the closest taxi
-            return nearest_taxi
+            # Match against dead-reckoned positions; taxis only report when they drift from them
+            now = self.clock.time()
+            for taxi in available_taxis:
+                estimate = self.position_tracker.estimate(taxi['taxi_id'], now)
+                if estimate is not None:
+                    taxi['pos_x'], taxi['pos_y'] = estimate
+            return nearest_taxi(available_taxis, user_x, user_y)
 
     def simulate_service(self, taxi_id, user_id, duration):
         self.console_utils.print(f"Taxi {taxi_id} is servicing User {user_id} for {duration} seconds.", 2)
-        time.sleep(duration)
+        self.clock.sleep(duration)
         # After service completion, mark the taxi as available and reset position
         taxi = self.db_handler.get_taxi_by_id(taxi_id)
         if taxi:
@@ -212,17 +349,60 @@ class BackupDispatcherService:
             taxi['connected'] = True
             taxi['pos_x'] = taxi['initial_pos_x']
             taxi['pos_y'] = taxi['initial_pos_y']
-            with self.heartbeat_lock:
-                self.heartbeat_timestamps[taxi_id] = time.time()
+            with self.metrics.acquire(self.heartbeat_lock, "heartbeat"):
+                self.heartbeat_timestamps[taxi_id] = self.clock.time()
             self.refresh_table()
             self.console_utils.print(
                 f"Taxi {taxi_id} has completed service for User {user_id} and is now available at ({taxi['pos_x']}, {taxi['pos_y']}).", 2
             )
-            self.db_handler.mark_taxi_available(taxi_id)
-            self.db_handler.update_taxi_position(taxi_id, taxi['pos_x'], taxi['pos_y'])
+            self.position_tracker.record(taxi_id, taxi['pos_x'], taxi['pos_y'], "NONE", taxi['speed'])
+            self.storage_writer.submit("set_taxi_status", taxi_id, "available")
+            self.storage_writer.submit("update_taxi_position", taxi_id, taxi['pos_x'], taxi['pos_y'])
         else:
             self.console_utils.print(f"Taxi {taxi_id} not found during service simulation.", 3)
 
+    def process_position_update(self, message):
+        self.metrics.inc("position_updates")
+        watch = self.metrics.stopwatch("position_update")
+        parts = message.split()
+        if len(parts) < 5:
+            self.console_utils.print(f"Invalid position update message: {message}", 3)
+            return False
+        taxi_id, pos_x, pos_y, speed = parts[:4]
+        # Taxis append their heading so the dispatcher can dead-reckon between reports
+        heading = parts[5] if len(parts) > 5 else "NONE"
+        try:
+            taxi_id = int(taxi_id)
+            pos_x = int(pos_x)
+            pos_y = int(pos_y)
+            speed = int(speed)
+        except ValueError:
+            self.console_utils.print(f"Invalid data types in position update message: {message}", 3)
+            return False
+        watch.lap("parse")
+
+        # if taxi_id in self.system.taxis:
+        known = self.taxi_known(taxi_id)
+        if known:
+            # Update in-memory position
+            # self.system.update_taxi_position(taxi_id, pos_x, pos_y)
+
+            self.position_tracker.record(taxi_id, pos_x, pos_y, heading, speed)
+
+            # Update position in the database
+            self.storage_writer.submit("update_taxi_position", taxi_id, pos_x, pos_y)
+
+            # A position update counts as a heartbeat
+            self.heartbeat_history.seen(taxi_id)
+            watch.lap("storage")
+            watch.finish()
+        elif known is None:
+            # Unknown taxi and MySQL too slow to ask: drop the update, the next one will do
+            self.metrics.inc("position_updates.degraded")
+        else:
+            self.console_utils.print(f"Taxi {taxi_id} not found, cannot update position", 3)
+        return True
+
     def receive_position_updates(self):
         puller = self.zmq_utils.bind_pull_socket()
         try:
@@ -230,33 +410,9 @@ class BackupDispatcherService:
                 try:
                     message = puller.recv_string(zmq.NOBLOCK)
                     if message:
-                        parts = message.split()
-                        if len(parts) < 5:
-                            self.console_utils.print(f"Invalid position update message: {message}", 3)
-                            continue
-                        taxi_id, pos_x, pos_y, _, _ = parts
-                        try:
-                            taxi_id = int(taxi_id)
-                            pos_x = int(pos_x)
-                            pos_y = int(pos_y)
-                        except ValueError:
-                            self.console_utils.print(f"Invalid data types in position update message: {message}", 3)
-                            continue
-
-                        # if taxi_id in self.system.taxis:
-                        if self.db_handler.taxi_exists(taxi_id):
-                            # Update in-memory position
-                            # self.system.update_taxi_position(taxi_id, pos_x, pos_y)
-                            
-                            # Update position in the database
-                            self.db_handler.update_taxi_position(taxi_id, pos_x, pos_y)
-                            
-                            # Optionally, record a heartbeat for the taxi
-                            self.db_handler.record_heartbeat(taxi_id)
-                        else:
-                            self.console_utils.print(f"Taxi {taxi_id} not found, cannot update position", 3)
-
-                        self.refresh_table()
+                        self.metrics.sample_backlog("positions", puller)
+                        if self.process_position_update(message):
+                            self.refresh_table()
                 except zmq.Again:
                     pass
                 except zmq.ZMQError as e:
@@ -268,57 +424,70 @@ class BackupDispatcherService:
             if puller:
                 puller.close()
 
-    def refresh_table(self):
-        taxi_data = []
-        taxis = self.db_handler.get_all_taxis()
-        # for taxi_id, taxi in self.system.taxis.items():
-        for taxi in taxis:
-            taxi_id = taxi[0]
-            pos_x = taxi[1]
-            pos_y = taxi[2]
-            speed = taxi[3]
-            status = taxi[4]
-            connected = taxi[5]
-
-            if isinstance(status, str):
-                status_lower = status.lower()
-                if status_lower == "available":
-                    status_str = "[light_green]Available[/light_green]"
-                elif status_lower == "unavailable":
-                    status_str = "[red]Unavailable[/red]"
-                else:
-                    status_str = f"[yellow]{status}[/yellow]"
-            else:
-                status_str = f"[yellow]{status}[/yellow]"
+    def receive_gateway_batches(self):
+        # Fleet gateways forward position updates and heartbeats as one multipart message per window
+        puller = self.zmq_utils.bind_pull_gateway_socket(GATEWAY_PULL_PORT)
+        try:
+            while not self.stop_event.is_set():
+                try:
+                    if not puller.poll(100):
+                        continue
+                    frames = puller.recv_multipart()
+                    self.metrics.sample_backlog("gateway", puller)
+                    self.metrics.inc("gateway_batches")
+                    kind = frames[0].decode()
+                    if kind == "positions":
+                        for frame in frames[1:]:
+                            self.process_position_update(frame.decode())
+                    elif kind == "heartbeats":
+                        for frame in frames[1:]:
+                            self.process_heartbeat(frame.decode())
+                    else:
+                        self.console_utils.print(f"Invalid gateway batch type: {kind}", 3)
+                        continue
+                    self.refresh_table()
+                except zmq.ZMQError as e:
+                    if not self.zmq_utils.context.closed:
+                        self.console_utils.print(f"Error while receiving gateway batches: {e}", 3)
+                except Exception as e:
+                    self.console_utils.print(f"Unexpected error in receive_gateway_batches: {e}", 3)
+        finally:
+            if puller:
+                puller.close()
 
-            if isinstance(connected, bool):
-                if connected == 1:
-                    connected_str = "[light_green]True[/light_green]"
-                else:
-                    connected_str = "[red]False[/red]"
+    def refresh_table(self):
+        # Handlers only flag the change; the snapshot publisher reads and renders once per interval
+        self.snapshot_publisher.mark_dirty()
+    
+    def process_heartbeat(self, message):
+        self.metrics.inc("heartbeats")
+        watch = self.metrics.stopwatch("heartbeat")
+        parts = message.split()
+        if len(parts) != 2 or parts[0] != "heartbeat":
+            self.console_utils.print(f"Invalid heartbeat message: {message}", 3)
+            return False
+        _, taxi_id = parts
+        try:
+            taxi_id = int(taxi_id)
+        except ValueError:
+            self.console_utils.print(f"Invalid taxi_id in heartbeat message: {message}", 3)
+            return False
+
+        now = self.clock.time()
+        self.heartbeat_history.seen(taxi_id, now)
+        known = self.taxi_known(taxi_id)
+        with self.metrics.acquire(self.heartbeat_lock, "heartbeat"):
+            self.heartbeat_timestamps[taxi_id] = now
+            if known is not False:
+                # Repeated by every heartbeat, so it is the first write skipped when storage falls behind
+                self.storage_writer.offer("update_taxi_connected_status", taxi_id, True)
+                # self.console_utils.print(f"Received heartbeat from Taxi {taxi_id}", show_level=False)
             else:
-                connected_str = f"[yellow]{connected}[/yellow]"
-
-            # Optional: Commented out to reduce console clutter
-            # self.console_utils.print(f"Styled Status: {status_str}, Styled Connected: {connected_str}", show_level=False)
-
-            taxi_data.append([
-                str(taxi_id),
-                str(pos_x),
-                str(pos_y),
-                str(speed),
-                status_str,
-                connected_str,
-            ])
-
-        table = self.console_utils.generate_table(
-            "Taxi Positions",
-            ["Taxi ID", "Position X", "Position Y", "Speed", "Status", "Connected"],
-            taxi_data
-        )
+                self.console_utils.print(f"Heartbeat from unknown Taxi {taxi_id}", 3)
+        watch.lap("storage")
+        watch.finish()
+        return True
 
-        self.live.update(table)
-    
     def receive_heartbeat(self):
         try:
             heartbeat_puller = self.zmq_utils.bind_pull_heartbeat_socket()
@@ -326,25 +495,9 @@ class BackupDispatcherService:
                 try:
                     message = heartbeat_puller.recv_string(zmq.NOBLOCK)
                     if message:
-                        parts = message.split()
-                        if len(parts) != 2 or parts[0] != "heartbeat":
-                            self.console_utils.print(f"Invalid heartbeat message: {message}", 3)
-                            continue
-                        _, taxi_id = parts
-                        try:
-                            taxi_id = int(taxi_id)
-                        except ValueError:
-                            self.console_utils.print(f"Invalid taxi_id in heartbeat message: {message}", 3)
-                            continue
-                            
-                        with self.heartbeat_lock:
-                            self.heartbeat_timestamps[taxi_id] = time.time()
-                            if self.db_handler.taxi_exists(taxi_id):
-                                self.db_handler.update_taxi_connected_status(taxi_id, True)
-                                # self.console_utils.print(f"Received heartbeat from Taxi {taxi_id}", show_level=False)
-                            else:
-                                self.console_utils.print(f"Heartbeat from unknown Taxi {taxi_id}", 3)
-                        self.refresh_table()
+                        self.metrics.sample_backlog("heartbeats", heartbeat_puller)
+                        if self.process_heartbeat(message):
+                            self.refresh_table()
                 except zmq.Again:
                     pass
                 except zmq.ZMQError as e:
@@ -395,22 +548,21 @@ class BackupDispatcherService:
             activation_puller.close()
 
     def monitor_heartbeats(self):
-        HEARTBEAT_INTERVAL = 5
-        TIMEOUT = 15
+        TIMEOUT = 15  # More lenient than the main dispatcher while taxis fail over
 
         while not self.stop_event.is_set():
-            current_time = time.time()
-            with self.heartbeat_lock:
+            current_time = self.clock.time()
+            with self.metrics.acquire(self.heartbeat_lock, "heartbeat"):
                 for taxi_id, last_hb in list(self.heartbeat_timestamps.items()):
                     if current_time - last_hb > TIMEOUT:
                         # if taxi_id in self.system.taxis:
-                        if self.db_handler.taxi_exists(taxi_id):
+                        if self.taxi_known(taxi_id) is not False:
                             # self.system.taxis[taxi_id].connected = False
-                            self.db_handler.update_taxi_connected_status(taxi_id, connected=False)
+                            self.storage_writer.submit("update_taxi_connected_status", taxi_id, False)
                             # self.console_utils.print(f"Taxi {taxi_id} disconnected due to missed heartbeats.", 3)
                             self.refresh_table()
                         del self.heartbeat_timestamps[taxi_id]
-            time.sleep(HEARTBEAT_INTERVAL)
+            self.clock.sleep(HEARTBEAT_INTERVAL)
     
     def activate(self):
         self.console_utils.print("Backup dispatcher active... Waiting for heartbeat signal from heartbeat server.")
@@ -426,51 +578,92 @@ class BackupDispatcherService:
             except zmq.ZMQError as e:
                 self.console_utils.print(f"Backup activation error: {e}", 3)
 
+    def restore_request_outcomes(self):
+        # Assignments made within the dedup TTL, here or by the other dispatcher, so their retries are not served twice
+        now = time.time()
+        try:
+            restored = self.request_outcomes.restore(self.db_handler.get_recent_assignments(now - REQUEST_DEDUP_TTL), now)
+        except Exception as e:
+            self.console_utils.print(f"Error restoring recent request outcomes: {e}", 3)
+            return
+        self.console_utils.print(f"Restored the outcomes of {restored} recent requests.", 2)
+
+    def prepare_schema(self):
+        # Creates or migrates the tables and their indexes; nothing to do on an up-to-date database
+        try:
+            steps, failures = migrate(self.db_handler)
+            for step in steps:
+                self.console_utils.print(f"Schema: {step}.", 2)
+            for failure in failures:
+                self.console_utils.print(f"Schema: {failure}.", 3)
+        except Exception as e:
+            self.console_utils.print(f"Error preparing the database schema: {e}", 3)
+
     def run(self):
         if not validate_grid(self.system.grid.rows, self.system.grid.cols, self.console_utils):
             self.console_utils.print(f"Dispatcher failed to start due to invalid parameters.", 3)
             return
+        self.prepare_schema()
         try:
             activate_thread = Thread(target=self.activate, name="ActivationHandler")
             activate_thread.daemon = False
             activate_thread.start()
         finally:
             activate_thread.join()
+        # Users failing over retry requests the main dispatcher may already have assigned
+        self.restore_request_outcomes()
 
         while self.main_dispatcher_offline:
             try:
-                with self.console_utils.start_live_display(self.table) as live:
-                    self.live = live
-
-                    taxi_thread = Thread(target=self.handle_taxi_requests, name="ConnectionHandler")
-                    updates_thread = Thread(target=self.receive_position_updates, name="PositionUpdater")
-                    heartbeat_thread = Thread(target=self.receive_heartbeat, name="HeartbeatReceiver")
-                    monitor_thread = Thread(target=self.monitor_heartbeats, name="HeartbeatMonitor")
-                    user_thread = Thread(target=self.handle_user_requests, name="UserRequestHandler")
-                    receive_heartbeat_from_heartbeat_server_thread = Thread(target=self.receive_heartbeat_from_heartbeat_server, name="HeartbeatServerReceiver")
-
-                    taxi_thread.daemon = False
-                    updates_thread.daemon = False
-                    heartbeat_thread.daemon = False
-                    monitor_thread.daemon = False
-                    user_thread.daemon = False
-                    receive_heartbeat_from_heartbeat_server_thread.daemon = False
-
-                    taxi_thread.start()
-                    updates_thread.start()
-                    heartbeat_thread.start()
-                    monitor_thread.start()
-                    user_thread.start()
-                    receive_heartbeat_from_heartbeat_server_thread.start()
-
-                    while not self.stop_event.is_set():
-                        taxi_thread.join(timeout=1)
-                        updates_thread.join(timeout=1)
-                        heartbeat_thread.join(timeout=1)
-                        monitor_thread.join(timeout=1)
-                        user_thread.join(timeout=1)
-                        activate_thread.join(timeout=1)
-                        receive_heartbeat_from_heartbeat_server_thread.join(timeout=1)
+                taxi_thread = Thread(target=self.handle_taxi_requests, name="ConnectionHandler")
+                updates_thread = Thread(target=self.receive_position_updates, name="PositionUpdater")
+                gateway_thread = Thread(target=self.receive_gateway_batches, name="GatewayBatchReceiver")
+                heartbeat_thread = Thread(target=self.receive_heartbeat, name="HeartbeatReceiver")
+                monitor_thread = Thread(target=self.monitor_heartbeats, name="HeartbeatMonitor")
+                user_thread = Thread(target=self.handle_user_requests, name="UserRequestHandler")
+                receive_heartbeat_from_heartbeat_server_thread = Thread(target=self.receive_heartbeat_from_heartbeat_server, name="HeartbeatServerReceiver")
+                control_thread = Thread(target=self.control_service.serve, args=(self.stop_event,), name="ControlChannel")
+                snapshot_thread = Thread(target=self.snapshot_publisher.serve, args=(self.stop_event,), name="SnapshotPublisher")
+                history_thread = Thread(target=self.heartbeat_history.serve, args=(self.stop_event,), name="HeartbeatHistory")
+                storage_thread = Thread(target=self.storage_writer.serve, args=(self.stop_event,), name="StorageWriter")
+
+                taxi_thread.daemon = False
+                updates_thread.daemon = False
+                gateway_thread.daemon = False
+                heartbeat_thread.daemon = False
+                monitor_thread.daemon = False
+                user_thread.daemon = False
+                receive_heartbeat_from_heartbeat_server_thread.daemon = False
+                control_thread.daemon = False
+                snapshot_thread.daemon = False
+                history_thread.daemon = False
+                storage_thread.daemon = False
+
+                taxi_thread.start()
+                updates_thread.start()
+                gateway_thread.start()
+                heartbeat_thread.start()
+                monitor_thread.start()
+                user_thread.start()
+                receive_heartbeat_from_heartbeat_server_thread.start()
+                control_thread.start()
+                snapshot_thread.start()
+                history_thread.start()
+                storage_thread.start()
+
+                while not self.stop_event.is_set():
+                    taxi_thread.join(timeout=1)
+                    updates_thread.join(timeout=1)
+                    gateway_thread.join(timeout=1)
+                    heartbeat_thread.join(timeout=1)
+                    monitor_thread.join(timeout=1)
+                    user_thread.join(timeout=1)
+                    activate_thread.join(timeout=1)
+                    receive_heartbeat_from_heartbeat_server_thread.join(timeout=1)
+                    control_thread.join(timeout=1)
+                    snapshot_thread.join(timeout=1)
+                    history_thread.join(timeout=1)
+                    storage_thread.join(timeout=1)
 
             except KeyboardInterrupt:
                 self.console_utils.print("Backup Dispatcher process interrupted by user.", 2)
@@ -480,11 +673,18 @@ class BackupDispatcherService:
                 self.console_utils.print("Cleaning up backup dispatcher resources...", 2)
                 taxi_thread.join()
                 updates_thread.join()
+                gateway_thread.join()
                 heartbeat_thread.join()
                 monitor_thread.join()
                 user_thread.join()
                 activate_thread.join()
                 receive_heartbeat_from_heartbeat_server_thread.join()
+                control_thread.join()
+                snapshot_thread.join()
+                history_thread.join()
+                storage_thread.join()
                 self.zmq_utils.close()
+                self.storage.shutdown()
                 self.db_handler.close()
+                self.tracer.close()
                 self.console_utils.print("Backup Dispatcher process ended and resources cleaned up.", 4)
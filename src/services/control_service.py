@@ -0,0 +1,53 @@
+import zmq
+from src.utils.rich_utils import RichConsoleUtils
+
+
+class ControlService:
+    """
+    Local REP control channel for a running process. Commands are plain strings,
+    `<command> [args...]`; each registered handler gets the argument list and returns the reply.
+    Bound to 127.0.0.1 only: it is an operator tool, not part of the taxi or user protocol.
+    """
+    def __init__(self, port, context=None):
+        self.port = port
+        self.context = context or zmq.Context.instance()
+        self.console_utils = RichConsoleUtils()
+        self.handlers = {
+            "help": lambda args: " ".join(sorted(self.handlers)),
+            "log": self.console_utils.writer.handle_log,
+        }
+
+    def register(self, command, handler):
+        self.handlers[command] = handler
+
+    def dispatch(self, message):
+        parts = message.split()
+        if not parts or parts[0] not in self.handlers:
+            return "unknown_command"
+        try:
+            return self.handlers[parts[0]](parts[1:])
+        except Exception as e:
+            return f"error {e}"
+
+    def serve(self, stop_event):
+        responder = self.context.socket(zmq.REP)
+        try:
+            if self.port:
+                responder.bind(f"tcp://127.0.0.1:{self.port}")
+            else:
+                # Port 0: many processes per machine (taxis), so take any free port and announce it
+                self.port = responder.bind_to_random_port("tcp://127.0.0.1")
+                self.console_utils.print(f"Control channel listening on port {self.port}.", 2)
+        except zmq.ZMQError as e:
+            self.console_utils.print(f"Control channel unavailable on port {self.port}: {e}", 3)
+            responder.close(linger=0)
+            return
+        try:
+            while not stop_event.is_set():
+                if responder.poll(100):
+                    responder.send_string(self.dispatch(responder.recv_string()))
+        except zmq.ZMQError as e:
+            if not stop_event.is_set():
+                self.console_utils.print(f"Error in control channel: {e}", 3)
+        finally:
+            responder.close(linger=0)
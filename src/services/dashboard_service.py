@@ -0,0 +1,132 @@
+import sys
+import time
+import zmq
+from threading import Thread, Event
+from src.config import DASHBOARD_PAGE_SIZE
+from src.services.snapshot_service import SNAPSHOT_TOPIC
+from src.utils.fleet_stream import FleetStreamReceiver
+from src.utils.rich_utils import RichConsoleUtils, FLEET_COLUMNS
+
+# Sort keys by column index of a snapshot row
+SORT_COLUMNS = {"id": 0, "x": 1, "y": 2, "speed": 3, "status": 4, "connected": 5}
+STATUS_FILTERS = ("all", "available", "unavailable", "connected", "disconnected")
+
+
+class DashboardService:
+    """
+    Renders the fleet stream a dispatcher publishes, one page at a time, so a fleet of any
+    size costs the dispatcher nothing to watch. Any number of dashboards can subscribe.
+    While it runs, lines on stdin change the view: `n`, `p`, `page <n>`, `sort <column>`,
+    `filter <status>` and `q`.
+    """
+    def __init__(self, host, port, page_size=DASHBOARD_PAGE_SIZE, sort="id", status_filter="all"):
+        self.host = host
+        self.port = port
+        self.page_size = page_size
+        self.page = 0
+        self.set_sort(sort)
+        self.set_filter(status_filter)
+        self.console_utils = RichConsoleUtils()
+        self.stop_event = Event()
+        self.source = f"{host}:{port}"
+        self.receiver = FleetStreamReceiver()
+        self.rows = []
+        self.last_received = None
+
+    def set_sort(self, sort):
+        if sort not in SORT_COLUMNS:
+            raise ValueError(f"Unknown sort column {sort}, expected one of {', '.join(SORT_COLUMNS)}")
+        self.sort = sort
+
+    def set_filter(self, status_filter):
+        if status_filter not in STATUS_FILTERS:
+            raise ValueError(f"Unknown filter {status_filter}, expected one of {', '.join(STATUS_FILTERS)}")
+        self.status_filter = status_filter
+
+    def matches(self, row):
+        if self.status_filter == "all":
+            return True
+        if self.status_filter == "connected":
+            return row[5]
+        if self.status_filter == "disconnected":
+            return not row[5]
+        return row[4].lower() == self.status_filter
+
+    def view(self, rows):
+        """Filtered, sorted rows of the current page, with the number of matches and of pages."""
+        selected = [row for row in rows if self.matches(row)]
+        column = SORT_COLUMNS[self.sort]
+        selected.sort(key=lambda row: (row[column], row[0]))
+        pages = max(1, -(-len(selected) // self.page_size))
+        self.page = min(self.page, pages - 1)
+        start = self.page * self.page_size
+        return selected[start:start + self.page_size], len(selected), pages
+
+    def render(self):
+        if self.last_received is None:
+            return self.console_utils.generate_fleet_table([], caption=f"Waiting for the fleet stream from {self.source}...")
+        rows = self.rows
+        page_rows, matching, pages = self.view(rows)
+        available = sum(1 for row in rows if row[4].lower() == "available")
+        connected = sum(1 for row in rows if row[5])
+        age = time.time() - self.last_received
+        sync = "" if self.receiver.synced else ", waiting for keyframe"
+        caption = (
+            f"{self.source} #{self.receiver.seq} ({age:.0f}s ago{sync}, {self.receiver.gaps} resyncs) | {len(rows)} taxis, "
+            f"{available} available, {connected} connected | filter {self.status_filter}: {matching} | "
+            f"sort {self.sort} | page {self.page + 1}/{pages}"
+        )
+        return self.console_utils.generate_fleet_table(page_rows, caption=caption)
+
+    def handle_command(self, line):
+        parts = line.split()
+        if not parts:
+            return
+        command, args = parts[0], parts[1:]
+        try:
+            if command == "n":
+                self.page += 1  # Clamped to the last page by view()
+            elif command == "p":
+                self.page = max(0, self.page - 1)
+            elif command == "page" and args:
+                self.page = max(0, int(args[0]) - 1)
+            elif command == "sort" and args:
+                self.set_sort(args[0])
+            elif command == "filter" and args:
+                self.set_filter(args[0])
+                self.page = 0
+            elif command == "q":
+                self.stop_event.set()
+        except ValueError as e:
+            self.console_utils.print(str(e), 3)
+
+    def read_commands(self):
+        for line in sys.stdin:
+            self.handle_command(line)
+            if self.stop_event.is_set():
+                return
+
+    def run(self):
+        context = zmq.Context()
+        subscriber = context.socket(zmq.SUB)
+        subscriber.setsockopt(zmq.SUBSCRIBE, SNAPSHOT_TOPIC)
+        subscriber.connect(f"tcp://{self.host}:{self.port}")
+        Thread(target=self.read_commands, name="DashboardCommands", daemon=True).start()
+        table = self.console_utils.create_table("Taxi Positions", FLEET_COLUMNS)
+        try:
+            with self.console_utils.start_live_display(table, refresh_per_second=4) as live:
+                while not self.stop_event.is_set():
+                    if subscriber.poll(250):
+                        # Apply everything queued, then rebuild the rows once
+                        changed = False
+                        while subscriber.poll(0):
+                            changed |= self.receiver.apply(subscriber.recv_multipart(copy=False)[1:])
+                        self.last_received = time.time()
+                        if changed:
+                            self.rows = self.receiver.rows()
+                    live.update(self.render())
+        except KeyboardInterrupt:
+            pass
+        finally:
+            subscriber.close(linger=0)
+            context.term()
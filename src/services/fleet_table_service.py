@@ -0,0 +1,322 @@
+import zmq
+import multiprocessing
+from threading import Thread, Lock, Event
+from src.config import (
+    PULL_PORT,
+    HEARTBEAT_PORT,
+    GATEWAY_PULL_PORT,
+    FLEET_TABLE_CAPACITY,
+    FLEET_CONTROL_PORT,
+    FLEET_QUERY_PORT,
+    FLEET_MATCHER_BACKEND_PORT,
+    FLEET_QUERY_TIMEOUT,
+    DB_USER,
+    DB_PASSWORD,
+    DB_HOST,
+    DB_NAME,
+)
+from src.models.taxi_model import encode_status
+from src.utils.fleet_table import SharedFleetTable, HEADING_CODES
+from src.utils.slot_map import SlotMap
+from src.utils.clock import default_clock
+from src.utils.rich_utils import RichConsoleUtils
+from src.utils.db_handler import DatabaseHandler
+from src.utils.group_commit import GroupCommitWriter
+from src.utils.heartbeat_history import HeartbeatHistory
+from src.utils.metrics import Metrics
+
+
+class FleetIngestWorker:
+    """
+    The only writer of the fleet table. Owns the taxi-facing PULL sockets (position updates,
+    heartbeats and gateway batches) plus a local control socket the dispatcher uses to register
+    taxis and change their status, and keeps MySQL in step like the dispatcher threads it replaces:
+    its writes are committed in groups by its own StorageWriter thread, and the taxis it hears
+    from are rolled up into heartbeat_rollup rows by its own HeartbeatHistory.
+    """
+    def __init__(self, table_name):
+        self.table = SharedFleetTable.attach(table_name)
+        self.clock = default_clock()
+        self.console_utils = RichConsoleUtils()
+        self.db_handler = DatabaseHandler(host=DB_HOST, user=DB_USER, password=DB_PASSWORD, database=DB_NAME)
+        self.metrics = Metrics()
+        self.storage_writer = GroupCommitWriter(self.db_handler, self.metrics)
+        self.heartbeat_history = HeartbeatHistory(self.storage_writer, self.clock)
+        self.slots = SlotMap()
+
+    def handle_position(self, message):
+        parts = message.split()
+        if len(parts) < 5:
+            self.console_utils.print(f"Invalid position update message: {message}", 3)
+            return
+        try:
+            taxi_id, pos_x, pos_y, speed = (int(part) for part in parts[:4])
+        except ValueError:
+            self.console_utils.print(f"Invalid data types in position update message: {message}", 3)
+            return
+        heading = HEADING_CODES.get(parts[5] if len(parts) > 5 else "NONE", 0)
+        slot = self.slots.get(taxi_id)
+        if slot is None:
+            self.console_utils.print(f"Taxi {taxi_id} not found, cannot update position", 3)
+            return
+        now = self.clock.time()
+        self.table.write(slot, pos_x=pos_x, pos_y=pos_y, speed=speed, heading=heading, updated_at=now, last_heartbeat=now)
+        self.storage_writer.submit("update_taxi_position", taxi_id, pos_x, pos_y)
+        self.heartbeat_history.seen(taxi_id, now)
+
+    def handle_heartbeat(self, message):
+        parts = message.split()
+        if len(parts) != 2 or parts[0] != "heartbeat":
+            self.console_utils.print(f"Invalid heartbeat message: {message}", 3)
+            return
+        try:
+            taxi_id = int(parts[1])
+        except ValueError:
+            self.console_utils.print(f"Invalid taxi_id in heartbeat message: {message}", 3)
+            return
+        slot = self.slots.get(taxi_id)
+        if slot is None:
+            self.console_utils.print(f"Heartbeat from unknown Taxi {taxi_id}", 3)
+            return
+        now = self.clock.time()
+        self.table.write(slot, connected=1, last_heartbeat=now)
+        self.heartbeat_history.seen(taxi_id, now)
+        self.storage_writer.offer("update_taxi_connected_status", taxi_id, True)
+
+    def handle_control(self, message):
+        parts = message.split()
+        command = parts[0]
+        if command == "register":
+            taxi_id, pos_x, pos_y, speed, status = int(parts[1]), int(parts[2]), int(parts[3]), int(parts[4]), int(parts[5])
+            self.table.register(self.slots.slot_for(taxi_id), taxi_id, pos_x, pos_y, speed, status, True, self.clock.time())
+        elif command == "status":
+            taxi_id, status = int(parts[1]), int(parts[2])
+            if taxi_id in self.slots:
+                self.table.write(self.slots.get(taxi_id), status=status)
+        elif command == "position":
+            taxi_id, pos_x, pos_y = int(parts[1]), int(parts[2]), int(parts[3])
+            if taxi_id in self.slots:
+                self.table.write(self.slots.get(taxi_id), pos_x=pos_x, pos_y=pos_y, heading=0, updated_at=self.clock.time())
+        elif command == "connected":
+            taxi_id, connected = int(parts[1]), int(parts[2])
+            if taxi_id in self.slots:
+                self.table.write(self.slots.get(taxi_id), connected=connected)
+        elif command == "release":
+            slot = self.slots.release(int(parts[1]))
+            if slot is not None:
+                self.table.release(slot)
+        else:
+            self.console_utils.print(f"Invalid fleet control message: {message}", 3)
+
+    def run(self, stop_event):
+        context = zmq.Context()
+        position_puller = context.socket(zmq.PULL)
+        position_puller.bind(f"tcp://*:{PULL_PORT}")
+        heartbeat_puller = context.socket(zmq.PULL)
+        heartbeat_puller.bind(f"tcp://*:{HEARTBEAT_PORT}")
+        gateway_puller = context.socket(zmq.PULL)
+        gateway_puller.bind(f"tcp://*:{GATEWAY_PULL_PORT}")
+        control_puller = context.socket(zmq.PULL)
+        control_puller.bind(f"tcp://127.0.0.1:{FLEET_CONTROL_PORT}")
+
+        poller = zmq.Poller()
+        for socket in (position_puller, heartbeat_puller, gateway_puller, control_puller):
+            poller.register(socket, zmq.POLLIN)
+
+        # Stopped after the socket loop, however it ends, so the writes it queued are drained
+        storage_stop = Event()
+        storage_thread = Thread(target=self.storage_writer.serve, args=(storage_stop,), name="StorageWriter")
+        storage_thread.start()
+        # Compaction is left to the dispatcher's own history; merging rollups of the same window is safe
+        history_thread = Thread(target=self.heartbeat_history.serve, args=(storage_stop, False), name="HeartbeatHistory")
+        history_thread.start()
+        try:
+            while not stop_event.is_set():
+                socks = dict(poller.poll(100))
+                try:
+                    # Control first so a taxi is registered before its first position lands
+                    if control_puller in socks:
+                        self.handle_control(control_puller.recv_string())
+                    if position_puller in socks:
+                        self.handle_position(position_puller.recv_string())
+                    if heartbeat_puller in socks:
+                        self.handle_heartbeat(heartbeat_puller.recv_string())
+                    if gateway_puller in socks:
+                        frames = gateway_puller.recv_multipart()
+                        handler = self.handle_position if frames[0] == b"positions" else self.handle_heartbeat
+                        for frame in frames[1:]:
+                            handler(frame.decode())
+                except Exception as e:
+                    self.console_utils.print(f"Unexpected error in fleet ingest: {e}", 3)
+        finally:
+            for socket in (position_puller, heartbeat_puller, gateway_puller, control_puller):
+                socket.close(linger=0)
+            context.term()
+            storage_stop.set()
+            history_thread.join()  # Its last window is flushed before the writer drains
+            storage_thread.join()
+            self.db_handler.close()
+            self.table.close()
+
+
+class FleetMatcherWorker:
+    """Answers `nearest <x> <y>` queries straight from the shared fleet table."""
+    def __init__(self, table_name):
+        self.table = SharedFleetTable.attach(table_name)
+        self.clock = default_clock()
+
+    def answer(self, message):
+        parts = message.split()
+        if len(parts) != 3 or parts[0] != "nearest":
+            return "invalid_request"
+        try:
+            user_x, user_y = int(parts[1]), int(parts[2])
+        except ValueError:
+            return "invalid_request"
+        nearest = self.table.find_nearest_available(user_x, user_y, now=self.clock.time())
+        if nearest is None:
+            return "none"
+        taxi_id, pos_x, pos_y, distance = nearest
+        return f"nearest {taxi_id} {pos_x} {pos_y} {distance}"
+
+    def run(self, stop_event):
+        context = zmq.Context()
+        responder = context.socket(zmq.REP)
+        responder.connect(f"tcp://127.0.0.1:{FLEET_MATCHER_BACKEND_PORT}")
+        try:
+            while not stop_event.is_set():
+                if responder.poll(100):
+                    responder.send_string(self.answer(responder.recv_string()))
+        finally:
+            responder.close(linger=0)
+            context.term()
+            self.table.close()
+
+
+def run_ingest_worker(table_name, stop_event):
+    FleetIngestWorker(table_name).run(stop_event)
+
+
+def run_matcher_worker(table_name, stop_event):
+    FleetMatcherWorker(table_name).run(stop_event)
+
+
+class FleetTableService:
+    """
+    Multi-process dispatch: the fleet lives in a shared-memory table written by one ingest
+    process and read by `matcher_count` matcher processes, each on its own core.
+    The dispatcher process only registers taxis, changes their status and asks for matches.
+    """
+    def __init__(self, N, M, matcher_count, capacity=FLEET_TABLE_CAPACITY, clock=None):
+        self.console_utils = RichConsoleUtils()
+        # Worker processes build their own clock from CLOCK_SCALE; pass only a config-derived clock here
+        self.clock = clock or default_clock()
+        self.table = SharedFleetTable.create(capacity, N, M)
+        self.matcher_count = matcher_count
+        self.mp_context = multiprocessing.get_context("spawn")
+        self.stop_event = self.mp_context.Event()
+        self.processes = []
+
+        self.context = zmq.Context()
+        self.control_lock = Lock()
+        self.query_lock = Lock()
+        self.control_pusher = None
+        self.query_requester = None
+        self.device_thread = None
+
+    def start(self):
+        self.processes.append(self.mp_context.Process(
+            target=run_ingest_worker, args=(self.table.name, self.stop_event), name="FleetIngest", daemon=True
+        ))
+        for index in range(self.matcher_count):
+            self.processes.append(self.mp_context.Process(
+                target=run_matcher_worker, args=(self.table.name, self.stop_event), name=f"FleetMatcher-{index}", daemon=True
+            ))
+        for process in self.processes:
+            process.start()
+
+        self.device_thread = Thread(target=self.route_queries, name="FleetQueryRouter", daemon=True)
+        self.device_thread.start()
+
+        self.control_pusher = self.context.socket(zmq.PUSH)
+        self.control_pusher.connect(f"tcp://127.0.0.1:{FLEET_CONTROL_PORT}")
+        self.connect_query_requester()
+        self.console_utils.print(
+            f"Fleet table ready: {self.table.capacity} slots, 1 ingest and {self.matcher_count} matcher process(es).", 2
+        )
+
+    def connect_query_requester(self):
+        if self.query_requester is not None:
+            self.query_requester.close(linger=0)
+        self.query_requester = self.context.socket(zmq.REQ)
+        self.query_requester.connect(f"tcp://127.0.0.1:{FLEET_QUERY_PORT}")
+
+    def route_queries(self):
+        frontend = self.context.socket(zmq.ROUTER)
+        frontend.bind(f"tcp://*:{FLEET_QUERY_PORT}")
+        backend = self.context.socket(zmq.DEALER)
+        backend.bind(f"tcp://127.0.0.1:{FLEET_MATCHER_BACKEND_PORT}")
+        poller = zmq.Poller()
+        poller.register(frontend, zmq.POLLIN)
+        poller.register(backend, zmq.POLLIN)
+        try:
+            while not self.stop_event.is_set():
+                socks = dict(poller.poll(100))
+                if frontend in socks:
+                    backend.send_multipart(frontend.recv_multipart())
+                if backend in socks:
+                    frontend.send_multipart(backend.recv_multipart())
+        except zmq.ZMQError as e:
+            if not self.stop_event.is_set():
+                self.console_utils.print(f"Error in fleet query router: {e}", 3)
+        finally:
+            frontend.close(linger=0)
+            backend.close(linger=0)
+
+    def send_control(self, message):
+        with self.control_lock:
+            self.control_pusher.send_string(message)
+
+    def register_taxi(self, taxi_id, pos_x, pos_y, speed, status):
+        self.send_control(f"register {taxi_id} {pos_x} {pos_y} {speed} {encode_status(status)}")
+
+    def set_status(self, taxi_id, status):
+        self.send_control(f"status {taxi_id} {encode_status(status)}")
+
+    def set_position(self, taxi_id, pos_x, pos_y):
+        self.send_control(f"position {taxi_id} {pos_x} {pos_y}")
+
+    def set_connected(self, taxi_id, connected):
+        self.send_control(f"connected {taxi_id} {int(connected)}")
+
+    def release_taxi(self, taxi_id):
+        self.send_control(f"release {taxi_id}")
+
+    def find_nearest(self, user_x, user_y):
+        with self.query_lock:
+            self.query_requester.send_string(f"nearest {user_x} {user_y}")
+            if self.query_requester.poll(FLEET_QUERY_TIMEOUT):
+                reply = self.query_requester.recv_string()
+                if reply == "none":
+                    return None
+                _, taxi_id, pos_x, pos_y, distance = reply.split()
+                return int(taxi_id), int(pos_x), int(pos_y), int(distance)
+            # Matchers are busy or gone: reset the REQ socket and read the table ourselves
+            self.connect_query_requester()
+        return self.table.find_nearest_available(user_x, user_y, now=self.clock.time())
+
+    def stale_taxis(self, timeout):
+        return self.table.stale_taxis(self.clock.time(), timeout)
+
+    def stop(self):
+        self.stop_event.set()
+        for process in self.processes:
+            process.join(timeout=5)
+        if self.device_thread:
+            self.device_thread.join()
+        if self.control_pusher:
+            self.control_pusher.close(linger=0)
+        if self.query_requester:
+            self.query_requester.close(linger=0)
+        self.context.term()
+        self.table.close()
@@ -0,0 +1,162 @@
+import zmq
+import time
+from threading import Thread, Event
+from src.config import PUB_PORT, REP_PORT, PULL_PORT, HEARTBEAT_PORT, GATEWAY_PULL_PORT, GATEWAY_BATCH_WINDOW, GATEWAY_MAX_BATCH
+from src.utils.rich_utils import RichConsoleUtils
+
+class UpdateBatcher:
+    """
+    The gateway's aggregation window: the latest position update per taxi and one copy of each
+    heartbeat, flushed as multipart batches once the window has passed or `max_batch` updates are
+    pending. Windows are measured on time.monotonic, so wall-clock jumps neither stall nor burst them.
+    """
+    def __init__(self, batch_window=GATEWAY_BATCH_WINDOW, max_batch=GATEWAY_MAX_BATCH, monotonic=time.monotonic):
+        self.batch_window = batch_window
+        self.max_batch = max_batch
+        self.monotonic = monotonic
+        # Latest update per taxi wins within a window; older ones carry no extra information
+        self.positions = {}
+        self.heartbeats = {}
+        self.window_start = monotonic()
+
+    def add_position(self, message):
+        self.positions[message.split(b" ", 1)[0]] = message
+
+    def add_heartbeat(self, message):
+        self.heartbeats[message] = message
+
+    def remaining(self):
+        # Seconds until the current window closes
+        return max(self.batch_window - (self.monotonic() - self.window_start), 0)
+
+    def take(self):
+        # The batches to send now, as multipart frames; [] while the window is open and not full
+        now = self.monotonic()
+        window_over = now - self.window_start >= self.batch_window
+        pending = len(self.positions) + len(self.heartbeats)
+        batches = []
+        if pending and (pending >= self.max_batch or window_over):
+            if self.positions:
+                batches.append([b"positions", *self.positions.values()])
+            if self.heartbeats:
+                batches.append([b"heartbeats", *self.heartbeats.values()])
+            self.positions.clear()
+            self.heartbeats.clear()
+        if window_over:
+            self.window_start = now
+        return batches
+
+
+class GatewayService:
+    """
+    Accepts taxi connections on the dispatcher's usual ports and forwards them upstream:
+    position updates and heartbeats are aggregated over a short window into multipart
+    batches, connect requests are proxied to the dispatcher's REP socket and assignments
+    are relayed back down from its PUB socket. Several gateways can feed one dispatcher.
+    """
+    def __init__(self, dispatcher_ip, batch_window=GATEWAY_BATCH_WINDOW, max_batch=GATEWAY_MAX_BATCH):
+        self.dispatcher_ip = dispatcher_ip
+        self.batch_window = batch_window
+        self.max_batch = max_batch
+        self.console_utils = RichConsoleUtils()
+        self.context = zmq.Context()
+        self.stop_event = Event()
+
+        self.messages_received = 0
+        self.batches_sent = 0
+
+    def forward_updates(self, position_endpoint=f"tcp://*:{PULL_PORT}", heartbeat_endpoint=f"tcp://*:{HEARTBEAT_PORT}", upstream_endpoint=None):
+        position_puller = self.context.socket(zmq.PULL)
+        position_puller.bind(position_endpoint)
+        heartbeat_puller = self.context.socket(zmq.PULL)
+        heartbeat_puller.bind(heartbeat_endpoint)
+        upstream = self.context.socket(zmq.PUSH)
+        upstream.connect(upstream_endpoint or f"tcp://{self.dispatcher_ip}:{GATEWAY_PULL_PORT}")
+
+        poller = zmq.Poller()
+        poller.register(position_puller, zmq.POLLIN)
+        poller.register(heartbeat_puller, zmq.POLLIN)
+
+        batcher = UpdateBatcher(self.batch_window, self.max_batch)
+        try:
+            while not self.stop_event.is_set():
+                socks = dict(poller.poll(int(batcher.remaining() * 1000)))
+
+                for puller, add in ((position_puller, batcher.add_position), (heartbeat_puller, batcher.add_heartbeat)):
+                    if puller not in socks:
+                        continue
+                    while True:
+                        try:
+                            message = puller.recv(zmq.NOBLOCK)
+                        except zmq.Again:
+                            break
+                        add(message)
+                        self.messages_received += 1
+
+                for batch in batcher.take():
+                    upstream.send_multipart(batch)
+                    self.batches_sent += 1
+        except zmq.ZMQError as e:
+            if not self.stop_event.is_set():
+                self.console_utils.print(f"Error while forwarding taxi updates: {e}", 3)
+        finally:
+            position_puller.close()
+            heartbeat_puller.close()
+            upstream.close(linger=0)
+
+    def relay(self, frontend, backend, name):
+        poller = zmq.Poller()
+        poller.register(frontend, zmq.POLLIN)
+        poller.register(backend, zmq.POLLIN)
+        try:
+            while not self.stop_event.is_set():
+                socks = dict(poller.poll(100))
+                if frontend in socks:
+                    backend.send_multipart(frontend.recv_multipart())
+                if backend in socks:
+                    frontend.send_multipart(backend.recv_multipart())
+        except zmq.ZMQError as e:
+            if not self.stop_event.is_set():
+                self.console_utils.print(f"Error in {name} relay: {e}", 3)
+        finally:
+            frontend.close(linger=0)
+            backend.close(linger=0)
+
+    def proxy_connect_requests(self):
+        frontend = self.context.socket(zmq.ROUTER)
+        frontend.bind(f"tcp://*:{REP_PORT}")
+        backend = self.context.socket(zmq.DEALER)
+        backend.connect(f"tcp://{self.dispatcher_ip}:{REP_PORT}")
+        self.relay(frontend, backend, "connect request")
+
+    def proxy_assignments(self):
+        frontend = self.context.socket(zmq.XPUB)
+        frontend.bind(f"tcp://*:{PUB_PORT}")
+        backend = self.context.socket(zmq.XSUB)
+        backend.connect(f"tcp://{self.dispatcher_ip}:{PUB_PORT}")
+        self.relay(frontend, backend, "assignment")
+
+    def run(self):
+        self.console_utils.print(f"Fleet gateway forwarding to dispatcher at {self.dispatcher_ip}.", 2)
+        threads = [
+            Thread(target=self.forward_updates, name="GatewayUpdateForwarder"),
+            Thread(target=self.proxy_connect_requests, name="GatewayConnectProxy"),
+            Thread(target=self.proxy_assignments, name="GatewayAssignmentProxy"),
+        ]
+        try:
+            for thread in threads:
+                thread.daemon = False
+                thread.start()
+            while not self.stop_event.is_set():
+                for thread in threads:
+                    thread.join(timeout=1)
+        except KeyboardInterrupt:
+            self.console_utils.print("Fleet gateway interrupted by user.", 2)
+            self.stop_event.set()
+        finally:
+            for thread in threads:
+                thread.join()
+            self.context.term()
+            self.console_utils.print(
+                f"Fleet gateway ended: {self.messages_received} taxi messages forwarded in {self.batches_sent} batches.", 4
+            )
@@ -1,16 +1,18 @@
 import zmq
-import time
 from src.config import (
     DISPATCHER_IP,
     BACKUP_DISPATCHER_IP,
     HEARTBEAT_3_PORT,
     BACKUP_ACTIVATION_PORT,
-    HEARTBEAT_2_PORT
+    HEARTBEAT_2_PORT,
+    HEARTBEAT_INTERVAL,
 )
 from src.utils.rich_utils import RichConsoleUtils
+from src.utils.clock import default_clock
 
 class HeartbeatService:
-    def __init__(self, dispatcher_ip, backup_dispatcher_ip, heartbeat_port, backup_activation_port):
+    def __init__(self, dispatcher_ip, backup_dispatcher_ip, heartbeat_port, backup_activation_port, clock=None):
+        self.clock = clock or default_clock()
         self.dispatcher_ip = dispatcher_ip
         self.backup_dispatcher_ip = backup_dispatcher_ip
         self.heartbeat_port = heartbeat_port
@@ -80,7 +82,7 @@ class HeartbeatService:
                         # Send activate signal via backup_activation_port
                         self.signal_backup("activate_backup")
                 finally:
-                    time.sleep(5)
+                    self.clock.sleep(HEARTBEAT_INTERVAL)
         finally:
             deactivate_socket.close()
 
@@ -0,0 +1,89 @@
+import zmq
+from threading import Event
+from src.config import USER_REQ_PORT, SHARD_QUERY_TIMEOUT
+from src.utils.rich_utils import RichConsoleUtils
+
+class ShardRouterService:
+    """
+    Owns the users' request port in sharded mode. Each request goes to the shard that owns the
+    user's cell; when that shard has no taxi closer than the user is to a neighbouring region,
+    the neighbours are asked for their nearest taxi and the request goes to the closest one.
+    """
+    def __init__(self, shard_map):
+        self.shard_map = shard_map
+        self.console_utils = RichConsoleUtils()
+        self.context = zmq.Context()
+        self.stop_event = Event()
+        self.requesters = {}
+
+    def requester_for(self, shard):
+        requester = self.requesters.get(shard.shard_id)
+        if requester is None:
+            requester = self.context.socket(zmq.REQ)
+            requester.connect(f"tcp://{shard.host}:{shard.port(USER_REQ_PORT)}")
+            self.requesters[shard.shard_id] = requester
+        return requester
+
+    def ask(self, shard, message):
+        requester = self.requester_for(shard)
+        requester.send_string(message)
+        if requester.poll(SHARD_QUERY_TIMEOUT):
+            return requester.recv_string()
+        # A REQ socket that missed its reply is stuck; drop it and treat the shard as silent
+        requester.close(linger=0)
+        del self.requesters[shard.shard_id]
+        self.console_utils.print(f"Shard {shard.shard_id} did not answer: {message}", 3)
+        return None
+
+    def candidate(self, shard, user_x, user_y):
+        reply = self.ask(shard, f"shard_query {user_x} {user_y}")
+        if reply is None or not reply.startswith("shard_candidate"):
+            return None
+        parts = reply.split()
+        if len(parts) != 3:
+            return None
+        return int(parts[2]), int(parts[1])  # (distance, taxi_id), ordered like the dispatcher's sort
+
+    def route(self, message):
+        parts = message.split()
+        if len(parts) < 4 or parts[0] != "user_request":
+            return "invalid_request"
+        try:
+            user_x = int(parts[2])
+            user_y = int(parts[3])
+        except ValueError:
+            return "invalid_request"
+
+        owner = self.shard_map.owner(user_x, user_y)
+        best = self.candidate(owner, user_x, user_y)
+        target = owner
+        # Only regions closer than the current best can hold a closer taxi
+        for shard in self.shard_map.neighbours_by_distance(user_x, user_y, exclude=owner):
+            if best is not None and shard.distance_to(user_x, user_y) >= best[0]:
+                break
+            candidate = self.candidate(shard, user_x, user_y)
+            if candidate is not None and (best is None or candidate < best):
+                best = candidate
+                target = shard
+
+        reply = self.ask(target, message)
+        return reply if reply is not None else "no_taxi_available"
+
+    def run(self):
+        responder = self.context.socket(zmq.REP)
+        responder.bind(f"tcp://*:{USER_REQ_PORT}")
+        self.console_utils.print(f"Shard router serving {len(self.shard_map.shards)} shard(s) on port {USER_REQ_PORT}.", 2)
+        try:
+            while not self.stop_event.is_set():
+                if responder.poll(100):
+                    message = responder.recv_string()
+                    responder.send_string(self.route(message))
+        except KeyboardInterrupt:
+            self.console_utils.print("Shard router interrupted by user.", 2)
+            self.stop_event.set()
+        finally:
+            responder.close(linger=0)
+            for requester in self.requesters.values():
+                requester.close(linger=0)
+            self.context.term()
+            self.console_utils.print("Shard router ended and resources cleaned up.", 4)
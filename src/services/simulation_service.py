@@ -0,0 +1,188 @@
+import heapq
+import math
+import random
+import time
+from src.config import TAXI_MOVE_INTERVAL, SERVICE_DURATION, VALID_SPEEDS
+from src.models.taxi_model import Taxi, TAXI_STATUS_AVAILABLE, TAXI_STATUS_UNAVAILABLE
+from src.models.user_model import User
+from src.utils.dead_reckoning import cells_per_second
+from src.utils.matching import match_key
+
+# Event kinds, in the order they are handled when they fall on the same instant
+SERVICE_END = 0
+TICK = 1
+ARRIVAL = 2
+
+
+class SimulatedTaxi(Taxi):
+    __slots__ = ("home_x", "home_y", "busy_time")
+    verbose = False
+
+    def __init__(self, taxi_id, N, M, pos_x, pos_y, speed):
+        super().__init__(taxi_id, N, M, pos_x, pos_y, speed, "available", True)
+        # The dispatcher puts a taxi back on its initial cell once a service ends
+        self.home_x = pos_x
+        self.home_y = pos_y
+        self.busy_time = 0.0
+
+    def return_home(self):
+        self.pos_x = self.home_x
+        self.pos_y = self.home_y
+        self.status_code = TAXI_STATUS_AVAILABLE
+        self.stopped = False
+        self.was_off_borders = False
+        self.heading = None
+        self.move_counter = 0
+
+
+def random_fleet(N, M, size, rng, speeds=VALID_SPEEDS):
+    return [
+        SimulatedTaxi(taxi_id, N, M, rng.randint(0, M), rng.randint(0, N), rng.choice(speeds))
+        for taxi_id in range(1, size + 1)
+    ]
+
+
+def poisson_demand(N, M, requests_per_hour, duration, rng):
+    # Exponential inter-arrival times; `waiting_time` is the arrival offset in seconds, like UserThread
+    users = []
+    if requests_per_hour <= 0:
+        return users
+    rate = requests_per_hour / 3600.0
+    arrival = rng.expovariate(rate)
+    while arrival < duration:
+        users.append(User(len(users) + 1, rng.randint(0, M), rng.randint(0, N), arrival))
+        arrival += rng.expovariate(rate)
+    return users
+
+
+def percentile(values, fraction):
+    # Nearest-rank percentile of an already sorted list
+    if not values:
+        return 0.0
+    rank = max(math.ceil(fraction * len(values)), 1)
+    return values[rank - 1]
+
+
+class SimulationResult:
+    def __init__(self, duration, fleet_size):
+        self.duration = duration
+        self.fleet_size = fleet_size
+        self.requests = 0
+        self.served = 0
+        self.wait_times = []
+        self.pickup_distances = []
+        self.busy_time = 0.0
+        self.events = 0
+        self.wall_time = 0.0
+
+    @property
+    def fill_rate(self):
+        return self.served / self.requests if self.requests else 0.0
+
+    @property
+    def utilization(self):
+        capacity = self.fleet_size * self.duration
+        return self.busy_time / capacity if capacity else 0.0
+
+    def summary(self):
+        waits = sorted(self.wait_times)
+        return {
+            "requests": self.requests,
+            "served": self.served,
+            "fill_rate": round(self.fill_rate, 4),
+            "wait_p50": round(percentile(waits, 0.50), 2),
+            "wait_p90": round(percentile(waits, 0.90), 2),
+            "wait_p99": round(percentile(waits, 0.99), 2),
+            "mean_pickup_distance": round(sum(self.pickup_distances) / len(self.pickup_distances), 2) if self.pickup_distances else 0.0,
+            "utilization": round(self.utilization, 4),
+        }
+
+
+class SimulationService:
+    """
+    Discrete-event simulation of the dispatcher, its fleet and its users in virtual time.
+
+    Everything runs in one process with no sockets or storage: taxis move with the `Taxi`
+    rules every TAXI_MOVE_INTERVAL, requests are matched with the dispatchers' nearest-taxi
+    rule, and served taxis are busy for `service_duration` before going back to their
+    initial cell, as `DispatcherService.simulate_service` does. All randomness comes from
+    one seeded generator, so a seed always reproduces the same run.
+
+    Wait time is the pickup time: the Manhattan distance to the user at the assigned taxi's speed.
+    """
+    def __init__(self, N, M, taxis, users, duration, seed=0, service_duration=SERVICE_DURATION, move_interval=TAXI_MOVE_INTERVAL):
+        self.N = N
+        self.M = M
+        self.taxis = sorted(taxis, key=lambda taxi: taxi.taxi_id)
+        self.users = users
+        self.duration = duration
+        self.rng = random.Random(seed)
+        self.service_duration = service_duration
+        self.move_interval = move_interval
+        self.now = 0.0
+        self.events = []
+        self.sequence = 0
+        self.result = SimulationResult(duration, len(self.taxis))
+
+    @classmethod
+    def generated(cls, N, M, fleet_size, requests_per_hour, duration, seed=0, speeds=VALID_SPEEDS, **kwargs):
+        # Fleet and demand are drawn from their own generator so they do not depend on movement
+        rng = random.Random(seed)
+        taxis = random_fleet(N, M, fleet_size, rng, speeds)
+        users = poisson_demand(N, M, requests_per_hour, duration, rng)
+        return cls(N, M, taxis, users, duration, seed=seed, **kwargs)
+
+    def schedule(self, at, kind, payload=None):
+        # The sequence number keeps same-time events in insertion order and payloads uncompared
+        heapq.heappush(self.events, (at, kind, self.sequence, payload))
+        self.sequence += 1
+
+    def run(self):
+        started = time.perf_counter()
+        for user in self.users:
+            if user.waiting_time < self.duration:
+                self.schedule(user.waiting_time, ARRIVAL, user)
+        self.schedule(self.move_interval, TICK)
+
+        while self.events and self.events[0][0] <= self.duration:
+            self.now, kind, _, payload = heapq.heappop(self.events)
+            self.result.events += 1
+            if kind == TICK:
+                self.move_fleet()
+                self.schedule(self.now + self.move_interval, TICK)
+            elif kind == ARRIVAL:
+                self.handle_request(payload)
+            elif kind == SERVICE_END:
+                payload.return_home()
+
+        self.result.busy_time = sum(taxi.busy_time for taxi in self.taxis)
+        self.result.wall_time = time.perf_counter() - started
+        return self.result
+
+    def move_fleet(self):
+        for taxi in self.taxis:
+            if taxi.status_code != TAXI_STATUS_AVAILABLE or taxi.stopped:
+                continue
+            cells_to_move = taxi.cells_for_tick()
+            if cells_to_move > 0:
+                direction = taxi.choose_direction(self.rng)
+                if direction is None:
+                    taxi.stopped = True
+                    continue
+                taxi.move(direction, cells_to_move)
+
+    def handle_request(self, user):
+        self.result.requests += 1
+        available = [taxi for taxi in self.taxis if taxi.status_code == TAXI_STATUS_AVAILABLE]
+        if not available:
+            return
+        taxi = min(available, key=lambda taxi: match_key(taxi.taxi_id, taxi.pos_x, taxi.pos_y, user.pos_x, user.pos_y))
+        distance = match_key(taxi.taxi_id, taxi.pos_x, taxi.pos_y, user.pos_x, user.pos_y)[0]
+        taxi.status_code = TAXI_STATUS_UNAVAILABLE
+        # Service past the end of the run only counts up to the horizon
+        taxi.busy_time += min(self.service_duration, self.duration - self.now)
+        self.schedule(self.now + self.service_duration, SERVICE_END, taxi)
+
+        self.result.served += 1
+        self.result.pickup_distances.append(distance)
+        self.result.wait_times.append(distance / cells_per_second(taxi.speed, self.move_interval))
@@ -0,0 +1,83 @@
+import time
+import numpy as np
+import zmq
+from threading import Lock
+from src.config import SNAPSHOT_INTERVAL, FLEET_KEYFRAME_INTERVAL
+from src.utils.fleet_stream import FleetStreamEncoder, records_from_rows, rows_from_records
+from src.utils.rich_utils import RichConsoleUtils, FLEET_COLUMNS
+
+SNAPSHOT_TOPIC = b"fleet"
+
+
+class SnapshotPublisher:
+    """
+    Streams the dispatcher's fleet table on a PUB socket every SNAPSHOT_INTERVAL as keyframes
+    and deltas (see FleetStreamEncoder), and renders it in a local live table unless headless.
+    Handler threads only mark the fleet as changed; the read, encoding and any rendering
+    happen here, at most once per interval. `fetch` returns storage rows or stream records.
+    Without `track_changes` (a fleet table written by another process) it reads every interval.
+    """
+    def __init__(self, source, port, fetch, headless=False, interval=SNAPSHOT_INTERVAL,
+                 keyframe_interval=FLEET_KEYFRAME_INTERVAL, track_changes=True, context=None):
+        self.source = source
+        self.port = port
+        self.fetch = fetch
+        self.headless = headless
+        self.interval = interval
+        self.track_changes = track_changes
+        self.context = context or zmq.Context.instance()
+        self.console_utils = RichConsoleUtils()
+        self.encoder = FleetStreamEncoder(keyframe_interval)
+        self.lock = Lock()
+        self.dirty = True
+        self.records = records_from_rows([])
+
+    def mark_dirty(self):
+        self.dirty = True
+
+    def refresh_records(self):
+        # Re-read the fleet only when something changed since the last snapshot
+        with self.lock:
+            if self.track_changes and not self.dirty:
+                return False
+            self.dirty = False
+        try:
+            records = self.fetch()
+        except Exception as e:
+            self.dirty = True
+            self.console_utils.print(f"Error reading fleet for snapshot: {e}", 3)
+            return False
+        self.records = records if isinstance(records, np.ndarray) else records_from_rows(records)
+        return True
+
+    def publish(self, publisher):
+        # Sent every interval even when unchanged: an empty delta keeps the sequence going,
+        # and a dashboard that just joined fills in at the next keyframe
+        header, body, removed = self.encoder.encode(self.records, time.time())
+        publisher.send_multipart([SNAPSHOT_TOPIC, header, body, removed], copy=False)
+
+    def serve(self, stop_event):
+        publisher = self.context.socket(zmq.PUB)
+        try:
+            publisher.bind(f"tcp://*:{self.port}")
+        except zmq.ZMQError as e:
+            self.console_utils.print(f"Fleet snapshots unavailable on port {self.port}: {e}", 3)
+            publisher.close(linger=0)
+            publisher = None
+        try:
+            if self.headless:
+                while not stop_event.wait(self.interval):
+                    self.refresh_records()
+                    if publisher:
+                        self.publish(publisher)
+                return
+            table = self.console_utils.create_table("Taxi Positions", FLEET_COLUMNS)
+            with self.console_utils.start_live_display(table) as live:
+                while not stop_event.wait(self.interval):
+                    if self.refresh_records():
+                        live.update(self.console_utils.generate_fleet_table(rows_from_records(self.records)))
+                    if publisher:
+                        self.publish(publisher)
+        finally:
+            if publisher:
+                publisher.close(linger=0)
@@ -0,0 +1,79 @@
+import csv
+import itertools
+import os
+from concurrent.futures import ProcessPoolExecutor
+from src.config import MAX_N, MAX_M, VALID_SPEEDS, SERVICE_DURATION
+from src.services.simulation_service import SimulationService
+
+# Parameters a sweep file can list; every combination becomes one simulation run
+SWEEP_PARAMETERS = ["grid", "fleet_size", "speeds", "requests_per_hour", "service_duration", "seed"]
+SWEEP_DEFAULTS = {
+    "grid": [[10, 10]],
+    "fleet_size": [10],
+    "speeds": [VALID_SPEEDS],
+    "requests_per_hour": [60],
+    "service_duration": [SERVICE_DURATION],
+    "seed": [0],
+}
+RESULT_FIELDS = [
+    "N", "M", "fleet_size", "speeds", "requests_per_hour", "service_duration", "seed", "hours",
+    "requests", "served", "fill_rate", "wait_p50", "wait_p90", "wait_p99", "mean_pickup_distance", "utilization",
+]
+
+
+def expand_sweep(spec):
+    """Turns a sweep spec (lists of values per parameter, plus `hours`) into one config per combination."""
+    unknown = set(spec) - set(SWEEP_PARAMETERS) - {"hours"}
+    if unknown:
+        raise ValueError(f"Unknown sweep parameters: {', '.join(sorted(unknown))}")
+    values = [spec.get(name, SWEEP_DEFAULTS[name]) for name in SWEEP_PARAMETERS]
+    configs = []
+    for combination in itertools.product(*values):
+        config = dict(zip(SWEEP_PARAMETERS, combination))
+        config["hours"] = spec.get("hours", 24)
+        N, M = config["grid"]
+        if not (0 < N <= MAX_N and 0 < M <= MAX_M):
+            raise ValueError(f"Grid {N}x{M} exceeds {MAX_N}x{MAX_M}")
+        if not config["speeds"] or any(speed not in VALID_SPEEDS for speed in config["speeds"]):
+            raise ValueError(f"Speeds must be taken from {VALID_SPEEDS}: {config['speeds']}")
+        configs.append(config)
+    return configs
+
+
+def run_configuration(config):
+    # Top-level so the process pool can pickle it
+    N, M = config["grid"]
+    simulation = SimulationService.generated(
+        N, M, config["fleet_size"], config["requests_per_hour"], config["hours"] * 3600,
+        seed=config["seed"], speeds=config["speeds"], service_duration=config["service_duration"],
+    )
+    row = {
+        "N": N,
+        "M": M,
+        "fleet_size": config["fleet_size"],
+        "speeds": "/".join(str(speed) for speed in config["speeds"]),
+        "requests_per_hour": config["requests_per_hour"],
+        "service_duration": config["service_duration"],
+        "seed": config["seed"],
+        "hours": config["hours"],
+    }
+    row.update(simulation.run().summary())
+    return row
+
+
+class SweepService:
+    """Runs every configuration of a capacity-planning sweep across a pool of processes."""
+    def __init__(self, spec, workers=None):
+        self.configs = expand_sweep(spec)
+        self.workers = workers or os.cpu_count()
+
+    def run(self):
+        # Rows come back in configuration order whatever order the workers finish in
+        with ProcessPoolExecutor(max_workers=self.workers) as executor:
+            return list(executor.map(run_configuration, self.configs, chunksize=max(len(self.configs) // (self.workers * 4), 1)))
+
+    @staticmethod
+    def write_csv(rows, output):
+        writer = csv.DictWriter(output, fieldnames=RESULT_FIELDS)
+        writer.writeheader()
+        writer.writerows(rows)
@@ -1,25 +1,46 @@
 import zmq
 import time
 import os
-import random
 from threading import Event, Thread, Lock, Condition
-from src.config import DISPATCHER_IP, PUB_PORT, SUB_PORT, REP_PORT, PULL_PORT, HEARTBEAT_PORT, BACKUP_DISPATCHER_IP, HEARTBEAT_2_PORT
+from src.config import DISPATCHER_IP, PUB_PORT, SUB_PORT, REP_PORT, PULL_PORT, HEARTBEAT_PORT, BACKUP_DISPATCHER_IP, HEARTBEAT_2_PORT, TAXI_GATEWAY_IP, SHARD_GRID
+from src.models.shard_model import ShardMap
 from src.models.taxi_model import Taxi
 from src.utils.rich_utils import RichConsoleUtils
 from src.models.grid_model import Grid
 from src.utils.validation_utils import validate_grid, validate_initial_position, validate_speed
 from src.utils.zmq_utils import ZMQUtils
-from src.config import DB_USER, DB_PASSWORD, DB_HOST, DB_PORT, DB_NAME
+from src.utils.dead_reckoning import PositionReporter
+from src.utils.clock import default_clock
+from src.utils.tracing import Tracer, split_tags
+from src.utils.profiling import Profiler
+from src.services.control_service import ControlService
+from src.config import DB_USER, DB_PASSWORD, DB_HOST, DB_PORT, DB_NAME, TAXI_MOVE_INTERVAL, HEARTBEAT_INTERVAL, TAXI_CONTROL_PORT, TAXI_REPLY_TIMEOUT, TAXI_CONNECT_RETRY_AFTER
 
 class TaxiService:
-    def __init__(self, taxi_id, pos_x, pos_y, speed, N, M, status):
+    def __init__(self, taxi_id, pos_x, pos_y, speed, N, M, status, clock=None):
+        self.clock = clock or default_clock()
         self.grid = Grid(N, M)
         self.taxi = Taxi(taxi_id, self.grid.rows, self.grid.cols, pos_x, pos_y, speed, status)
-        self.dispatcher_ip = DISPATCHER_IP
+        # A fleet gateway, when configured, stands in for the dispatcher on the same ports
+        self.dispatcher_ip = TAXI_GATEWAY_IP or DISPATCHER_IP
         self.backup_dispatcher_ip = BACKUP_DISPATCHER_IP
+        port_offset = 0
+
+        # In sharded mode the taxi starts on the shard that owns its initial cell
+        self.shard_map = ShardMap(N, M, *SHARD_GRID) if tuple(SHARD_GRID) != (1, 1) else None
+        if self.shard_map:
+            shard = self.shard_map.owner(pos_x, pos_y)
+            self.dispatcher_ip = shard.host
+            port_offset = shard.port_offset
 
         self.console_utils = RichConsoleUtils()
-        self.zmq_utils = ZMQUtils(DISPATCHER_IP, PUB_PORT, SUB_PORT, REP_PORT, PULL_PORT, HEARTBEAT_PORT, HEARTBEAT_2_PORT)
+        self.tracer = Tracer(f"taxi-{taxi_id}")
+        self.control_service = ControlService(TAXI_CONTROL_PORT)
+        Profiler(f"taxi-{taxi_id}").register(self.control_service)
+        self.zmq_utils = ZMQUtils(
+            self.dispatcher_ip, PUB_PORT + port_offset, SUB_PORT + port_offset, REP_PORT + port_offset,
+            PULL_PORT + port_offset, HEARTBEAT_PORT + port_offset, HEARTBEAT_2_PORT + port_offset
+        )
         self.stop_event = Event()
         self.msg = f"{self.taxi.taxi_id} {self.taxi.pos_x} {self.taxi.pos_y} {self.taxi.speed} {self.taxi.status}"
 
@@ -29,7 +50,8 @@ class TaxiService:
         self.socket_initialized = False
         self.connected = False
         self.main_dispatcher_offline = False
-        self.pub_port = PUB_PORT
+        self.pub_port = PUB_PORT + port_offset
+        self.position_reporter = PositionReporter(self.grid.rows, self.grid.cols)
     
     def connect_to_backup_dispatcher(self, reconnect=False):
         self.console_utils.print("Main dispatcher is offline, connecting to backup server")
@@ -57,7 +79,7 @@ class TaxiService:
                     requester = self.zmq_utils.connect_req()
                     requester.send_string(f"connect_request {self.msg}")
 
-                if requester.poll(1000):
+                if requester.poll(int(TAXI_REPLY_TIMEOUT * 1000)):
                     response = requester.recv_string()
                     if response == f"connect_ack {self.taxi.taxi_id}":
                         if reconnect:
@@ -69,6 +91,10 @@ class TaxiService:
                         else:
                             self.console_utils.print(f"Successfully connected to Backup Dispatcher as Taxi {self.taxi.taxi_id}", 4)
                         self.connected = True
+                    elif response == f"connect_retry {self.taxi.taxi_id}":
+                        # Up but behind on storage: not a failed attempt, just ask it again later
+                        self.console_utils.print(f"Backup dispatcher busy, retrying in {TAXI_CONNECT_RETRY_AFTER} seconds.", 3)
+                        self.clock.sleep(TAXI_CONNECT_RETRY_AFTER)
                     else:
                         self.console_utils.print(f"Unexpected response from backup dispatcher: {response}", 3)
                 else:
@@ -78,7 +104,7 @@ class TaxiService:
                         3, end="\r"
                     )
                     self.connect_to_dispatcher(reconnect=True)
-                    time.sleep(2)
+                    self.clock.sleep(2)
 
                 requester.close()
 
@@ -91,15 +117,15 @@ class TaxiService:
                     f"SUB={self.zmq_utils.subscriber}",
                     3
                 )
-                time.sleep(2)
+                self.clock.sleep(2)
             except Exception as e:
                 self.console_utils.print(
                     f"Unexpected error during connection attempt: {e}", 3
                 )
-                time.sleep(2)
+                self.clock.sleep(2)
 
     def connect_to_dispatcher(self, reconnect=False):
-        self.zmq_utils.dispatcher_ip = DISPATCHER_IP
+        self.zmq_utils.dispatcher_ip = self.dispatcher_ip
         # connected = False
         retry_count = 0
 
@@ -124,7 +150,7 @@ class TaxiService:
                     requester = self.zmq_utils.connect_req()
                     requester.send_string(f"connect_request {self.msg}")
 
-                if requester.poll(1000):
+                if requester.poll(int(TAXI_REPLY_TIMEOUT * 1000)):
                     response = requester.recv_string()
                     if response == f"connect_ack {self.taxi.taxi_id}":
                         if reconnect:
@@ -136,6 +162,10 @@ class TaxiService:
                         else:
                             self.console_utils.print(f"Successfully connected to Dispatcher as Taxi {self.taxi.taxi_id}", 4)
                         self.connected = True
+                    elif response == f"connect_retry {self.taxi.taxi_id}":
+                        # Up but behind on storage: not a failed attempt, so no step towards the backup
+                        self.console_utils.print(f"Dispatcher busy, retrying in {TAXI_CONNECT_RETRY_AFTER} seconds.", 3)
+                        self.clock.sleep(TAXI_CONNECT_RETRY_AFTER)
                     else:
                         self.console_utils.print(f"Unexpected response from dispatcher: {response}", 3)
                 else:
@@ -144,7 +174,7 @@ class TaxiService:
                         f"{'Re' if reconnect else ''}Connection attempt failed, retrying... [{retry_count}]",
                         3, end="\r"
                     )
-                    time.sleep(2)
+                    self.clock.sleep(2)
 
                     if retry_count == 5:
                         self.main_dispatcher_offline = True
@@ -161,22 +191,27 @@ class TaxiService:
                     f"SUB={self.zmq_utils.subscriber}",
                     3
                 )
-                time.sleep(2)
+                self.clock.sleep(2)
             except Exception as e:
                 self.console_utils.print(
                     f"Unexpected error during connection attempt: {e}", 3
                 )
-                time.sleep(2)
+                self.clock.sleep(2)
     
     def dispatcher_active(self):
         try:
             temp_requester = self.zmq_utils.connect_req()
             temp_requester.send_string(f"connect_request {self.msg}")
-            if temp_requester.poll(1000):  # Wait for a response
+            if temp_requester.poll(int(TAXI_REPLY_TIMEOUT * 1000)):  # Wait for a response
                 response = temp_requester.recv_string()
                 if response == f"connect_ack {self.taxi.taxi_id}":
                     temp_requester.close()
                     return True
+                if response == f"connect_retry {self.taxi.taxi_id}":
+                    # Alive but behind on storage: reconnecting would only add load, so back off instead
+                    temp_requester.close()
+                    self.clock.sleep(TAXI_CONNECT_RETRY_AFTER)
+                    return True
             temp_requester.close()
         except zmq.ZMQError as e:
             self.console_utils.print(f"Dispatcher check error: {e}", 3)
@@ -185,46 +220,35 @@ class TaxiService:
     
     def publish_position(self):
         try:
-            time.sleep(5)
+            self.clock.sleep(TAXI_MOVE_INTERVAL)
             while not self.stop_event.is_set() and not self.taxi.stopped:
                 # if not self.dispatcher_active():
                 #     print("send_heartbeat not self.publish_position()")
                 #     self.connect_to_dispatcher(reconnect=True)
                 try:
-                    self.taxi.move_counter += 1
-
-                    if self.taxi.speed == 4:
-                        cells_to_move = 2
-                    elif self.taxi.speed == 2:
-                        cells_to_move = 1
-                    elif self.taxi.speed == 1:
-                        cells_to_move = 1 if self.taxi.move_counter % 2 == 0 else 0
-                    else:
-                        cells_to_move = 0
+                    self.position_reporter.tick(TAXI_MOVE_INTERVAL)
+                    cells_to_move = self.taxi.cells_for_tick()
 
                     if cells_to_move > 0:
-                        directions = ['NORTH', 'SOUTH', 'EAST', 'WEST']
-                        valid_directions = []
-
-                        for direction in directions:
-                            if self.taxi.can_move(direction):
-                                valid_directions.append(direction)
+                        direction = self.taxi.choose_direction()
 
-                        if not valid_directions:
+                        if direction is None:
                             self.console_utils.print(f"Taxi {self.taxi.taxi_id} cannot move, stopping.", level=3)
                             self.taxi.stopped = True
+                            self.report_position()
                             break
 
-                        direction = random.choice(valid_directions)
                         self.taxi.move(direction, cells_to_move)
-
-                        if not self.dispatcher_active():
-                            # self.console_utils.print("Dispatcher inactive. Attempting to reconnect.", 3)
-                            self.connect_to_dispatcher(reconnect=True)
-                            continue
-
                         self.msg = f"{self.taxi.taxi_id} {self.taxi.pos_x} {self.taxi.pos_y} {self.taxi.speed} {self.taxi.status}"
-                        self.zmq_utils.pusher.send_string(f"{self.msg}")
+
+                        if self.position_reporter.should_report(self.taxi):
+                            if not self.dispatcher_active():
+                                # self.console_utils.print("Dispatcher inactive. Attempting to reconnect.", 3)
+                                self.connect_to_dispatcher(reconnect=True)
+                                continue
+                            self.report_position()
+                        else:
+                            self.position_reporter.mark_suppressed()
 
                         if self.taxi.stopped:
                             self.console_utils.print(
@@ -239,18 +263,23 @@ class TaxiService:
                     else:
                         self.console_utils.print(f"Taxi {self.taxi.taxi_id} did not move this interval.", level=2)
 
-                    time.sleep(5)
+                    self.clock.sleep(TAXI_MOVE_INTERVAL)
                 except zmq.ZMQError as e:
                     self.console_utils.print(f"Error publishing position: {e}", level=3)
                     self.console_utils.print("Attempting to reconnect to dispatcher...", level=1)
                     self.connect_to_dispatcher(reconnect=True)
                 except Exception as e:
                     self.console_utils.print(f"Unexpected error in publish_position: {e}", level=3)
-                    time.sleep(2)
+                    self.clock.sleep(2)
         except Exception as e:
             self.console_utils.print(f"Fatal error in publish_position: {e}", level=3)
             self.stop_event.set()
 
+    def report_position(self):
+        heading = self.position_reporter.reported_heading(self.taxi)
+        self.zmq_utils.pusher.send_string(f"{self.msg} {heading}")
+        self.position_reporter.mark_reported(self.taxi)
+
     def receive_commands(self):
         try:
             while not self.stop_event.is_set():
@@ -268,24 +297,53 @@ class TaxiService:
         except zmq.ZMQError as e:
             self.console_utils.print(f"Error receiving message: {e}", 3, end="\r")
 
-    def subscribe_to_assignments(self):
-        if hasattr(self, "subscriber") and self.subscriber:  # Check if the subscriber already exists
-            self.subscriber.close()
+    def connect_assignment_subscriber(self):
         subscriber = self.zmq_utils.context.socket(zmq.SUB)
         subscriber.connect(f"tcp://{self.dispatcher_ip}:{self.pub_port}")
         subscriber.setsockopt_string(zmq.SUBSCRIBE, f"assign {self.taxi.taxi_id}")
+        subscriber.setsockopt_string(zmq.SUBSCRIBE, f"handoff {self.taxi.taxi_id} ")
+        return subscriber
+
+    def subscribe_to_assignments(self):
+        if hasattr(self, "subscriber") and self.subscriber:  # Check if the subscriber already exists
+            self.subscriber.close()
+        subscriber = self.connect_assignment_subscriber()
         while not self.stop_event.is_set():
             try:
                 message = subscriber.recv_string(flags=zmq.NOBLOCK)
-                if message.startswith(f"assign_taxi {self.taxi.taxi_id}"):
-                    _, taxi_id, user_id = message.split()
-                    self.handle_assignment(user_id)
+                if message.startswith("assign "):
+                    # The dispatcher publishes "assign <taxi_id> <user_id>", plus trace tags when traced
+                    parts, tags = split_tags(message.split())
+                    # The subscription is a prefix match: "assign 1" also delivers taxi 12's assignments
+                    if len(parts) == 3 and parts[1] == str(self.taxi.taxi_id):
+                        self.tracer.span_since(tags.get("trace"), "taxi.assignment_delivery", tags.get("sent"))
+                        self.handle_assignment(parts[2])
+                elif message.startswith(f"handoff {self.taxi.taxi_id} "):
+                    _, taxi_id, shard_id = message.split()
+                    # Close before the sockets' context is recreated by the reconnect
+                    subscriber.close()
+                    self.switch_shard(int(shard_id))
+                    subscriber = self.connect_assignment_subscriber()
             except zmq.Again:
                 time.sleep(0.1)
             except Exception as e:
                 self.console_utils.print(f"Error in subscribing to assignments: {e}", 3)
         subscriber.close()
 
+    def switch_shard(self, shard_id):
+        shard = self.shard_map.shards[shard_id]
+        self.console_utils.print(f"Taxi {self.taxi.taxi_id} handed off to shard {shard_id}.", 2)
+        self.dispatcher_ip = shard.host
+        self.zmq_utils.pub_port = shard.port(PUB_PORT)
+        self.zmq_utils.sub_port = shard.port(SUB_PORT)
+        self.zmq_utils.rep_port = shard.port(REP_PORT)
+        self.zmq_utils.pull_port = shard.port(PULL_PORT)
+        self.zmq_utils.heartbeat_port = shard.port(HEARTBEAT_PORT)
+        self.zmq_utils.heartbeat_2_port = shard.port(HEARTBEAT_2_PORT)
+        self.pub_port = shard.port(PUB_PORT)
+        self.connect_to_dispatcher(reconnect=True)
+        self.heartbeat_pusher = self.zmq_utils.heartbeat_pusher
+
     def handle_assignment(self, user_id):
         self.console_utils.print(f"Taxi {self.taxi.taxi_id} assigned to User {user_id}", 2)
     
@@ -295,13 +353,13 @@ class TaxiService:
                 heartbeat_msg = f"heartbeat {self.taxi.taxi_id}"
                 self.heartbeat_pusher.send_string(heartbeat_msg)
                 # self.console_utils.print(f"Sent heartbeat from Taxi {self.taxi.taxi_id}", show_level=False)
-                time.sleep(5)
+                self.clock.sleep(HEARTBEAT_INTERVAL)
             except zmq.ZMQError as e:
                 self.console_utils.print(f"Error sending heartbeat: {e}", 3)
-                time.sleep(5)
+                self.clock.sleep(HEARTBEAT_INTERVAL)
             except Exception as e:
                 self.console_utils.print(f"Unexpected error in send_heartbeat: {e}", 3)
-                time.sleep(5)
+                self.clock.sleep(HEARTBEAT_INTERVAL)
 
     def run(self):
         if not validate_grid(self.grid.rows, self.grid.cols, self.console_utils) or not validate_initial_position(self.taxi.pos_x, self.taxi.pos_y, self.taxi.grid.rows, self.taxi.grid.cols, self.taxi.taxi_id, self.console_utils) or not validate_speed(self.taxi.speed, self.taxi.taxi_id, self.console_utils):
@@ -315,22 +373,26 @@ class TaxiService:
             receive_commands_thread = Thread(target=self.receive_commands)
             heartbeat_thread = Thread(target=self.send_heartbeat)
             subscribe_to_assignments_thread = Thread(target=self.subscribe_to_assignments)
+            control_thread = Thread(target=self.control_service.serve, args=(self.stop_event,), name="ControlChannel")
 
             publish_position_thread.daemon = False
             receive_commands_thread.daemon = False
             heartbeat_thread.daemon = False
             subscribe_to_assignments_thread.daemon = False
+            control_thread.daemon = False
 
             publish_position_thread.start()
             receive_commands_thread.start()
             heartbeat_thread.start()
             subscribe_to_assignments_thread.start()
+            control_thread.start()
 
             while not self.stop_event.is_set():
                 publish_position_thread.join(timeout=1)
                 receive_commands_thread.join(timeout=1)
                 heartbeat_thread.join(timeout=1)
                 subscribe_to_assignments_thread.join(timeout=1)
+                control_thread.join(timeout=1)
             
         except KeyboardInterrupt:
             self.console_utils.print(f"Taxi {self.taxi.taxi_id} process interrupted by user, terminating process...", 2)
@@ -338,4 +400,5 @@ class TaxiService:
 
         finally:
             self.console_utils.print(f"Taxi {self.taxi.taxi_id} process ended and resources cleaned up.", 4)
+            self.console_utils.flush()  # os._exit skips the log writer's queue otherwise
             os._exit(0)
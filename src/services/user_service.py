@@ -1,15 +1,20 @@
 import zmq
 import threading
-import time
 import csv
+import uuid
 from threading import Thread, Event
-from src.config import DISPATCHER_IP, USER_REQ_PORT
+from src.config import DISPATCHER_IP, USER_REQ_PORT, USER_REQUEST_TIMEOUT, USER_FAILOVER_AFTER
 from src.utils.rich_utils import RichConsoleUtils
 from src.models.user_model import User
+from src.utils.clock import default_clock
+from src.utils.tracing import Tracer, new_trace_id, trace_tags, split_tags
+from src.utils.admission import request_time
 
 class UserThread(Thread):
-    def __init__(self, user_id, pos_x, pos_y, waiting_time, dispatcher_ip, backup_dispatcher_ip, user_req_port, backup_user_req_port, console_utils, stop_event):
+    def __init__(self, user_id, pos_x, pos_y, waiting_time, dispatcher_ip, backup_dispatcher_ip, user_req_port, backup_user_req_port, console_utils, stop_event, clock=None, tracer=None):
         super().__init__()
+        self.clock = clock or default_clock()
+        self.tracer = tracer or Tracer("users")
         self.user_id = user_id
         self.pos_x = pos_x
         self.pos_y = pos_y
@@ -23,6 +28,8 @@ class UserThread(Thread):
         self.socket = self.context.socket(zmq.REQ)
         self.stop_event = stop_event
         self.use_backup = False  # Track if using backup dispatcher
+        # One id for this ride request, kept across retries and failover so no dispatcher serves it twice
+        self.request_id = uuid.uuid4().hex
         self.connect_to_dispatcher()
 
     def connect_to_dispatcher(self):
@@ -38,38 +45,66 @@ class UserThread(Thread):
         self.console_utils.print(f"User {self.user_id} switching to backup dispatcher.", 3)
         self.connect_to_dispatcher()
 
+    def request(self, trace_id, deadline, until):
+        # One attempt: the reply, or None when `until` (at most the deadline) passed without one
+        sent = request_time()
+        self.socket.send_string(f"user_request {self.user_id} {self.pos_x} {self.pos_y}{trace_tags(trace_id, sent)} deadline={deadline:.6f} request={self.request_id}")
+        self.console_utils.print(f"User {self.user_id} sent request to dispatcher.", 2)
+        if self.socket.poll(max(int((until - sent) * 1000), 0)):
+            return self.socket.recv_string()
+        return None
+
+    def request_ride(self, trace_id, deadline, until):
+        # Attempts against the current dispatcher until a final reply, or None once `until` passed
+        reply = self.request(trace_id, deadline, until)
+        while reply is not None and reply.startswith("busy"):
+            # The dispatcher is shedding load; come back when it says, if that is before we give up
+            retry_after = float(split_tags(reply.split())[1].get("retry_after", 1))
+            if request_time() + retry_after >= deadline:
+                break
+            self.console_utils.print(f"User {self.user_id} told the dispatcher is busy, retrying in {retry_after:.1f} seconds.", 3)
+            if self.stop_event.wait(retry_after):
+                break
+            reply = self.request(trace_id, deadline, until)
+        return reply
+
     def run(self):
         try:
             self.console_utils.print(f"User {self.user_id} at ({self.pos_x}, {self.pos_y}) will request a taxi in {self.waiting_time} minutes.", 2)
             
-            if self.stop_event.wait(timeout=self.waiting_time):
+            if self.clock.wait(self.stop_event, self.waiting_time):
                 self.console_utils.print(f"User {self.user_id} was interrupted before sending request.", 2)
                 return
 
-            request_message = f"user_request {self.user_id} {self.pos_x} {self.pos_y}"
-            start_time = time.time()
-            self.socket.send_string(request_message)
-            self.console_utils.print(f"User {self.user_id} sent request to dispatcher.", 2)
-
-            poller = zmq.Poller()
-            poller.register(self.socket, zmq.POLLIN)
-            socks = dict(poller.poll(30000))
+            trace_id = new_trace_id()
+            start_time = request_time()
+            # One deadline for the whole request: the main dispatcher gets the first USER_FAILOVER_AFTER
+            # seconds of it, the backup the rest. Wall-clock seconds, as the dispatchers compare them,
+            # even when self.clock is scaled
+            deadline = start_time + USER_REQUEST_TIMEOUT
+            while True:
+                until = deadline if self.use_backup else min(start_time + USER_FAILOVER_AFTER, deadline)
+                reply = self.request_ride(trace_id, deadline, until)
+                if reply is not None:
+                    break
+                if self.use_backup or request_time() >= deadline:
+                    self.console_utils.print(f"User {self.user_id} request timed out after {USER_REQUEST_TIMEOUT} seconds. Giving up.", 3)
+                    return
+                self.console_utils.print(f"User {self.user_id} got no reply in {USER_FAILOVER_AFTER} seconds. Switching to backup dispatcher.", 3)
+                self.switch_to_backup()  # Retry with backup dispatcher, under the same request id
+                if self.stop_event.is_set():
+                    return
 
-            if socks.get(self.socket) == zmq.POLLIN:
-                reply = self.socket.recv_string()
-                end_time = time.time()
-                response_time = end_time - start_time
-                if reply.startswith("assign_taxi"):
-                    _, taxi_id = reply.split()
-                    self.console_utils.print(f"User {self.user_id} assigned to Taxi {taxi_id}. Response time: {response_time:.2f} seconds.", 2)
-                elif reply.startswith("no_taxi_available"):
-                    self.console_utils.print(f"User {self.user_id} could not be assigned a taxi. Reason: {reply}", 3)
-                else:
-                    self.console_utils.print(f"User {self.user_id} received unexpected reply: {reply}", 3)
+            end_time = request_time()
+            response_time = end_time - start_time
+            self.tracer.span(trace_id, "user.response", start_time, response_time)
+            if reply.startswith("assign_taxi"):
+                _, taxi_id = reply.split()
+                self.console_utils.print(f"User {self.user_id} assigned to Taxi {taxi_id}. Response time: {response_time:.2f} seconds.", 2)
+            elif reply.startswith("no_taxi_available") or reply.startswith("busy") or reply.startswith("request_expired"):
+                self.console_utils.print(f"User {self.user_id} could not be assigned a taxi. Reason: {reply}", 3)
             else:
-                self.console_utils.print(f"User {self.user_id} request timed out after 5 seconds. Switching to backup dispatcher.", 3)
-                self.switch_to_backup()
-                self.run()  # Retry with backup dispatcher
+                self.console_utils.print(f"User {self.user_id} received unexpected reply: {reply}", 3)
         except Exception as e:
             self.console_utils.print(f"Error in User {self.user_id}: {e}", 3)
         finally:
@@ -77,7 +112,9 @@ class UserThread(Thread):
             self.context.term()
 
 class UserService:
-    def __init__(self, users_file, dispatcher_ip, backup_dispatcher_ip, user_req_port, backup_user_req_port):
+    def __init__(self, users_file, dispatcher_ip, backup_dispatcher_ip, user_req_port, backup_user_req_port, clock=None):
+        self.clock = clock or default_clock()
+        self.tracer = Tracer("users")
         self.users_file = users_file
         self.dispatcher_ip = dispatcher_ip
         self.backup_dispatcher_ip = backup_dispatcher_ip
@@ -120,7 +157,9 @@ class UserService:
                     user_req_port=self.user_req_port,
                     backup_user_req_port=self.backup_user_req_port,
                     console_utils=self.console_utils,
-                    stop_event=self.stop_event
+                    stop_event=self.stop_event,
+                    clock=self.clock,
+                    tracer=self.tracer
                 )
                 user_thread.start()
                 threads.append(user_thread)
@@ -0,0 +1,24 @@
+import sys
+from src.services.dispatcher_service import DispatcherService
+from src.models.shard_model import ShardMap
+from src.config import SHARD_GRID
+
+def main():
+    if len(sys.argv) != 4:
+        print("Usage: python shard.py <N> <M> <shard_id>")
+        sys.exit(1)
+
+    N = int(sys.argv[1])
+    M = int(sys.argv[2])
+    shard_id = int(sys.argv[3])
+
+    shard_map = ShardMap(N, M, *SHARD_GRID)
+    if not 0 <= shard_id < len(shard_map.shards):
+        print(f"Shard id must be between 0 and {len(shard_map.shards) - 1} for SHARD_GRID {SHARD_GRID}")
+        sys.exit(1)
+
+    dispatcher = DispatcherService(N, M, shard_map=shard_map, shard=shard_map.shards[shard_id])
+    dispatcher.run()
+
+if __name__ == "__main__":
+    main()
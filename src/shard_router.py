@@ -0,0 +1,18 @@
+import sys
+from src.services.shard_router_service import ShardRouterService
+from src.models.shard_model import ShardMap
+from src.config import SHARD_GRID
+
+def main():
+    if len(sys.argv) != 3:
+        print("Usage: python shard_router.py <N> <M>")
+        sys.exit(1)
+
+    N = int(sys.argv[1])
+    M = int(sys.argv[2])
+
+    router = ShardRouterService(ShardMap(N, M, *SHARD_GRID))
+    router.run()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,37 @@
+import sys
+from src.services.simulation_service import SimulationService, random_fleet
+from src.services.user_service import UserService
+from src.config import MAX_N, MAX_M
+
+def main():
+    if len(sys.argv) not in (6, 7, 8):
+        print("Usage: python simulate.py <N> <M> <taxis> <hours> <requests_per_hour> [seed] [users_file]")
+        sys.exit(1)
+
+    N = int(sys.argv[1])
+    M = int(sys.argv[2])
+    fleet_size = int(sys.argv[3])
+    duration = float(sys.argv[4]) * 3600
+    requests_per_hour = float(sys.argv[5])
+    seed = int(sys.argv[6]) if len(sys.argv) > 6 else 0
+
+    if not (0 < N <= MAX_N and 0 < M <= MAX_M):
+        print(f"Grid must be at most {MAX_N}x{MAX_M}")
+        sys.exit(1)
+
+    if len(sys.argv) == 8:
+        # Replay a users file (id, x, y, seconds until the request) against a random fleet
+        import random
+        users = UserService(sys.argv[7], None, None, None, None).load_users()
+        taxis = random_fleet(N, M, fleet_size, random.Random(seed))
+        simulation = SimulationService(N, M, taxis, users, duration, seed=seed)
+    else:
+        simulation = SimulationService.generated(N, M, fleet_size, requests_per_hour, duration, seed=seed)
+
+    result = simulation.run()
+    print(f"Simulated {duration / 3600:g} h of {fleet_size} taxis on {N}x{M} in {result.wall_time:.2f} s ({result.events} events)")
+    for key, value in result.summary().items():
+        print(f"{key:>22}: {value}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,28 @@
+import sys
+import json
+import time
+from src.services.sweep_service import SweepService
+
+def main():
+    if len(sys.argv) not in (2, 3, 4):
+        print("Usage: python sweep.py <sweep_file> [output_csv] [workers]")
+        sys.exit(1)
+
+    with open(sys.argv[1]) as file:
+        spec = json.load(file)
+    workers = int(sys.argv[3]) if len(sys.argv) == 4 else None
+
+    sweep = SweepService(spec, workers)
+    started = time.perf_counter()
+    rows = sweep.run()
+    elapsed = time.perf_counter() - started
+
+    if len(sys.argv) >= 3:
+        with open(sys.argv[2], "w", newline="") as output:
+            SweepService.write_csv(rows, output)
+        print(f"{len(rows)} configuration(s) on {sweep.workers} worker(s) in {elapsed:.1f} s, written to {sys.argv[2]}")
+    else:
+        SweepService.write_csv(rows, sys.stdout)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,35 @@
+import sys
+from src.config import TRACE_DIR
+from src.utils.tracing import load_spans, stage_breakdown, slowest_traces
+
+def main():
+    if len(sys.argv) > 3:
+        print("Usage: python trace_report.py [trace_dir] [slowest]")
+        sys.exit(1)
+
+    trace_dir = sys.argv[1] if len(sys.argv) > 1 else TRACE_DIR
+    limit = int(sys.argv[2]) if len(sys.argv) > 2 else 10
+
+    spans = load_spans(trace_dir)
+    if not spans:
+        print(f"No spans found in {trace_dir}")
+        return
+
+    print(f"{len(spans)} spans from {len({span['trace'] for span in spans})} traces\n")
+    print(f"{'span':<36} {'count':>7} {'mean ms':>10} {'p50 ms':>10} {'p90 ms':>10} {'max ms':>10}")
+    for row in stage_breakdown(spans):
+        print(
+            f"{row['span']:<36} {row['count']:>7} {row['mean_ms']:>10.2f} "
+            f"{row['p50_ms']:>10.2f} {row['p90_ms']:>10.2f} {row['max_ms']:>10.2f}"
+        )
+
+    print(f"\nSlowest {limit} traces")
+    for total, trace_id, trace_spans in slowest_traces(spans, limit):
+        print(f"{trace_id}  {total:.2f} ms")
+        origin = trace_spans[0]["start"]
+        for span in trace_spans:
+            offset = (span["start"] - origin) * 1000
+            print(f"    +{offset:9.2f} ms  {span['duration_ms']:9.2f} ms  {span['service']:<18} {span['span']}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,93 @@
+import time
+from threading import Lock
+from src.config import ADMISSION_TARGET_DELAY, ADMISSION_INTERVAL, ADMISSION_RETRY_AFTER, USER_REQUEST_TIMEOUT
+
+
+def request_time():
+    # The time base of sent= and deadline= tags and of every comparison with them: the wall clock,
+    # whatever CLOCK_SCALE says, since users and dispatchers wait on their sockets in real time
+    return time.time()
+
+
+def tag_time(tags, name):
+    # A timestamp tag as a float, None when the sender did not stamp it
+    try:
+        return float(tags[name])
+    except (KeyError, TypeError, ValueError):
+        return None
+
+
+class AdmissionControl:
+    """
+    Decides whether a user request is worth serving before any work is done on it. Requests carry
+    the client's deadline (deadline=<time>) and the time they were sent (sent=<time>); one that
+    arrives past its deadline is answered `request_expired`, since its user has given up. Once the
+    queueing delay (arrival minus sent) has stayed above ADMISSION_TARGET_DELAY for a whole
+    ADMISSION_INTERVAL, a standing queue rather than a burst, requests above the target are answered
+    `busy retry_after=<seconds>` at once, which drains the queue; the first request below the
+    target ends the shedding. Served requests count as goodput when answered before their deadline.
+    Every time here is request_time(), wall-clock seconds even when the services run on a scaled clock.
+    """
+    def __init__(self, metrics, target=ADMISSION_TARGET_DELAY, interval=ADMISSION_INTERVAL, retry_after=ADMISSION_RETRY_AFTER):
+        self.metrics = metrics
+        self.target = target
+        self.interval = interval
+        self.retry_after = retry_after
+        self.lock = Lock()
+        self.above_since = None  # When the queueing delay last rose above the target
+
+    def admit(self, tags, now):
+        # None to serve the request, otherwise the reply that turns it away
+        deadline = tag_time(tags, "deadline")
+        if deadline is not None and now >= deadline:
+            self.metrics.inc("user_requests.expired")
+            self.metrics.inc("user_requests.deadline_missed")
+            return "request_expired"
+        sent = tag_time(tags, "sent")
+        if sent is None:
+            return None
+        delay = max(now - sent, 0.0)
+        self.metrics.observe("user_request.queue_delay", delay * 1000)
+        with self.lock:
+            if delay <= self.target:
+                self.above_since = None
+                return None
+            if self.above_since is None:
+                self.above_since = now
+            if now - self.above_since < self.interval:
+                return None
+        self.metrics.inc("user_requests.shed")
+        # The queue took `delay` to get here; retrying sooner would only join it again
+        return f"busy retry_after={max(self.retry_after, delay):.1f}"
+
+    def served(self, tags, now):
+        deadline = tag_time(tags, "deadline")
+        if deadline is None or now <= deadline:
+            self.metrics.inc("user_requests.goodput")
+        else:
+            self.metrics.inc("user_requests.late")
+            self.metrics.inc("user_requests.deadline_missed")
+        if deadline is not None:
+            # How close to giving up users were when served; negative slack is clamped to 0
+            self.metrics.observe("user_request.slack", max(deadline - now, 0.0) * 1000)
+
+    def tolerance(self, tags):
+        # Whole seconds the user was still willing to wait when this attempt was sent (users.waiting_time)
+        deadline, sent = tag_time(tags, "deadline"), tag_time(tags, "sent")
+        if deadline is None or sent is None:
+            return USER_REQUEST_TIMEOUT
+        return max(int(round(deadline - sent)), 0)
+
+    def status(self, args=None):
+        counters = self.metrics.snapshot()["counters"]
+        with self.lock:
+            shedding = self.above_since is not None and request_time() - self.above_since >= self.interval
+        requests = counters.get("user_requests", 0)
+        goodput = counters.get("user_requests.goodput", 0)
+        rate = goodput / requests * 100 if requests else 0.0
+        return (
+            f"{'shedding' if shedding else 'admitting'} (target delay {self.target:.1f} s), "
+            f"goodput {goodput} of {requests} requests ({rate:.1f}%), late {counters.get('user_requests.late', 0)}, "
+            f"shed {counters.get('user_requests.shed', 0)}, expired {counters.get('user_requests.expired', 0)}, "
+            f"deadline misses {counters.get('user_requests.deadline_missed', 0)}"
+        )
@@ -0,0 +1,77 @@
+import time
+from threading import Condition
+from src.config import CLOCK_SCALE, CLOCK_EPOCH
+
+
+class RealClock:
+    """Wall-clock time; what every service uses unless CLOCK_SCALE says otherwise."""
+    scale = 1.0
+
+    def time(self):
+        return time.time()
+
+    def sleep(self, seconds):
+        time.sleep(seconds)
+
+    def wait(self, event, timeout):
+        # Event.wait on a simulated timeout; True if the event was set
+        return event.wait(timeout)
+
+
+class ScaledClock(RealClock):
+    """
+    Simulated time running `scale` times faster than the wall clock. Every process derives
+    its time from the same CLOCK_EPOCH, so timestamps stay comparable across machines as
+    long as their wall clocks agree and they share CLOCK_SCALE.
+    """
+    def __init__(self, scale, epoch=CLOCK_EPOCH):
+        if scale <= 0:
+            raise ValueError(f"Clock scale must be positive: {scale}")
+        self.scale = float(scale)
+        self.epoch = epoch
+
+    def time(self):
+        return self.epoch + (time.time() - self.epoch) * self.scale
+
+    def sleep(self, seconds):
+        time.sleep(seconds / self.scale)
+
+    def wait(self, event, timeout):
+        return event.wait(None if timeout is None else timeout / self.scale)
+
+
+class ManualClock:
+    """Time only moves when a test calls `advance`; sleepers wake once their deadline is reached."""
+    scale = 1.0
+
+    def __init__(self, start=0.0):
+        self.now = start
+        self.condition = Condition()
+
+    def time(self):
+        with self.condition:
+            return self.now
+
+    def advance(self, seconds):
+        with self.condition:
+            self.now += seconds
+            self.condition.notify_all()
+
+    def sleep(self, seconds):
+        with self.condition:
+            deadline = self.now + seconds
+            self.condition.wait_for(lambda: self.now >= deadline)
+
+    def wait(self, event, timeout):
+        with self.condition:
+            deadline = None if timeout is None else self.now + timeout
+        # Poll the event in short real-time slices so set() is seen without a clock advance
+        while not event.wait(0.01):
+            with self.condition:
+                if deadline is not None and self.now >= deadline:
+                    return False
+        return True
+
+
+def default_clock():
+    return RealClock() if CLOCK_SCALE == 1 else ScaledClock(CLOCK_SCALE)
@@ -1,6 +1,54 @@
 import mysql.connector as msc
 from src.utils.rich_utils import RichConsoleUtils
 from threading import local
+from src.config import FLEET_PRELOAD_CHUNK
+from src.models.taxi_model import encode_status, decode_status, TAXI_STATUS_AVAILABLE, TAXI_STATUS_UNAVAILABLE
+
+# Single-statement writes that can share a transaction (see execute_batch): query and argument mapping
+WRITE_STATEMENTS = {
+    "update_taxi_position": (
+        "UPDATE taxis SET pos_x = %s, pos_y = %s WHERE taxi_id = %s",
+        lambda taxi_id, pos_x, pos_y: (pos_x, pos_y, taxi_id),
+    ),
+    "set_taxi_status": (
+        "UPDATE taxis SET status = %s WHERE taxi_id = %s",
+        lambda taxi_id, status: (encode_status(status), taxi_id),
+    ),
+    "update_taxi_connected_status": (
+        "UPDATE taxis SET connected = %s WHERE taxi_id = %s",
+        lambda taxi_id, connected: (connected, taxi_id),
+    ),
+    "record_heartbeat": (
+        "INSERT INTO heartbeat (taxi_id) VALUES (%s) ON DUPLICATE KEY UPDATE timestamp = CURRENT_TIMESTAMP",
+        lambda taxi_id: (taxi_id,),
+    ),
+    "add_user_request": (
+        """
+        INSERT INTO users (user_id, pos_x, pos_y, waiting_time)
+        VALUES (%s, %s, %s, %s)
+        ON DUPLICATE KEY UPDATE pos_x = VALUES(pos_x), pos_y = VALUES(pos_y), waiting_time = VALUES(waiting_time)
+        """,
+        lambda user_id, pos_x, pos_y, waiting_time=30: (user_id, pos_x, pos_y, waiting_time),
+    ),
+}
+
+# The dispatcher's hot queries by name; src.utils.schema checks their plans with EXPLAIN
+HOT_QUERIES = {
+    "get_available_taxis": "SELECT taxi_id, pos_x, pos_y, speed, status, connected FROM taxis WHERE status = %s AND connected = %s",
+    "taxi_exists": "SELECT 1 FROM taxis WHERE taxi_id = %s",
+    "get_taxi_by_id": "SELECT * FROM taxis WHERE taxi_id = %s",
+    "reserve_taxi": "UPDATE taxis SET status = %s, connected = %s WHERE taxi_id = %s AND status = %s AND connected = %s",
+    "get_heartbeat_history": """
+        SELECT bucket_start, bucket_seconds, beats, first_seen, last_seen, gaps, max_gap
+        FROM heartbeat_rollup WHERE taxi_id = %s AND bucket_start >= %s ORDER BY bucket_start
+        """,
+    "compacted_heartbeat_rollups": "DELETE FROM heartbeat_rollup WHERE bucket_seconds < %s AND bucket_start < %s",
+    "expired_heartbeat_rollups": "DELETE FROM heartbeat_rollup WHERE bucket_seconds = %s AND bucket_start < %s",
+    "recent_assignments": """
+        SELECT request_id, taxi_id, UNIX_TIMESTAMP(assignment_time) FROM assignments
+        WHERE assignment_time >= FROM_UNIXTIME(%s) AND request_id IS NOT NULL ORDER BY assignment_time
+        """,
+}
 
 class DatabaseHandler:
     def __init__(self, host, user, password, database):
@@ -59,7 +107,7 @@ class DatabaseHandler:
             status = VALUES(status)
         """
         # Use `pos_x` and `pos_y` as initial values only during insertion
-        values = (taxi_id, pos_x, pos_y, speed, status, pos_x, pos_y)
+        values = (taxi_id, pos_x, pos_y, speed, encode_status(status), pos_x, pos_y)
         cursor.execute(query, values)
         connection.commit()
         self.close()
@@ -79,7 +127,7 @@ class DatabaseHandler:
         cursor = self.get_cursor()
         connection = self.get_connection()
         query = "UPDATE taxis SET status = %s WHERE taxi_id = %s"
-        values = (status, taxi_id)
+        values = (encode_status(status), taxi_id)
         cursor.execute(query, values)
         connection.commit()
         self.close()
@@ -116,7 +164,7 @@ class DatabaseHandler:
 
         # Update the taxi status
         query_taxi = "UPDATE taxis SET status = %s, connected = %s WHERE taxi_id = %s"
-        values_taxi = ("unavailable", False, taxi_id)
+        values_taxi = (TAXI_STATUS_UNAVAILABLE, False, taxi_id)
         cursor.execute(query_taxi, values_taxi)
 
         connection.commit()
@@ -138,12 +186,166 @@ class DatabaseHandler:
         # finally:
         self.close()
 
+    # -------------------------
+    # Transactions: several writes, one commit, on one connection
+    # -------------------------
+    def execute_batch(self, operations):
+        """
+        Runs (name, args) write operations in one transaction with a single commit and returns
+        their results in order: the affected row count for a WRITE_STATEMENTS entry, or what a
+        compound operation returns. Nothing is committed if any of them fails.
+        The thread's connection stays open; reconnecting costs more round trips than the writes.
+        """
+        cursor = self.get_cursor()
+        connection = self.get_connection()
+        try:
+            results = [self.execute_write(cursor, name, args) for name, args in operations]
+            connection.commit()
+        except Exception:
+            connection.rollback()
+            raise
+        return results
+
+    def execute_write(self, cursor, name, args):
+        statement = WRITE_STATEMENTS.get(name)
+        if statement is not None:
+            query, parameters = statement
+            cursor.execute(query, parameters(*args))
+            return cursor.rowcount
+        if name == "upsert_taxi_on_connect":
+            return self.upsert_taxi_on_connect_statements(cursor, *args)
+        if name == "reserve_and_assign":
+            return self.reserve_and_assign_statements(cursor, *args)
+        if name == "release_reservation":
+            return self.release_reservation_statements(cursor, *args)
+        if name == "record_heartbeat_rollups":
+            return self.record_heartbeat_rollups_statements(cursor, *args)
+        if name == "compact_heartbeat_rollups":
+            return self.compact_heartbeat_rollups_statements(cursor, *args)
+        raise ValueError(f"Unknown write operation {name}")
+
+    def upsert_taxi_on_connect(self, taxi_id, pos_x, pos_y, speed, status):
+        """
+        Registers or refreshes a connecting taxi: one statement and one commit, where taxi_exists,
+        update_taxi_position, set_taxi_status and update_taxi_connected_status took four of each.
+        Its heartbeat is kept in memory (HeartbeatHistory). Returns True when the taxi was new.
+        """
+        return self.execute_batch([("upsert_taxi_on_connect", (taxi_id, pos_x, pos_y, speed, status))])[0]
+
+    def upsert_taxi_on_connect_statements(self, cursor, taxi_id, pos_x, pos_y, speed, status):
+        query_taxi = """
+        INSERT INTO taxis (taxi_id, pos_x, pos_y, speed, status, connected, initial_pos_x, initial_pos_y)
+        VALUES (%s, %s, %s, %s, %s, %s, %s, %s)
+        ON DUPLICATE KEY UPDATE
+            pos_x = VALUES(pos_x),
+            pos_y = VALUES(pos_y),
+            speed = VALUES(speed),
+            status = VALUES(status),
+            connected = VALUES(connected)
+        """
+        cursor.execute(query_taxi, (taxi_id, pos_x, pos_y, speed, encode_status(status), True, pos_x, pos_y))
+        # Affected rows: 1 for an insert, 2 for an update, 0 when nothing changed
+        return cursor.rowcount == 1
+
+    def reserve_and_assign(self, user_id, pos_x, pos_y, taxi_id, waiting_time=30, request_id=None):
+        """
+        Records the user's request and, if the taxi is still available and connected, reserves it
+        and creates the assignment, all in one transaction. The conditional UPDATE is the reservation:
+        a taxi taken meanwhile matches no row and nothing is assigned. Returns True when assigned.
+        The assignment keeps the request id, so another dispatcher can answer retries of it.
+        """
+        return self.execute_batch([("reserve_and_assign", (user_id, pos_x, pos_y, taxi_id, waiting_time, request_id))])[0]
+
+    def reserve_and_assign_statements(self, cursor, user_id, pos_x, pos_y, taxi_id, waiting_time=30, request_id=None):
+        query, parameters = WRITE_STATEMENTS["add_user_request"]
+        cursor.execute(query, parameters(user_id, pos_x, pos_y, waiting_time))
+        cursor.execute(HOT_QUERIES["reserve_taxi"], (TAXI_STATUS_UNAVAILABLE, False, taxi_id, TAXI_STATUS_AVAILABLE, True))
+        reserved = cursor.rowcount == 1
+        if reserved:
+            query_assignment = """
+            INSERT INTO assignments (user_id, taxi_id, status, request_id)
+            VALUES (%s, %s, %s, %s)
+            ON DUPLICATE KEY UPDATE
+                taxi_id = VALUES(taxi_id),
+                status = VALUES(status),
+                request_id = VALUES(request_id),
+                assignment_time = CURRENT_TIMESTAMP
+            """
+            cursor.execute(query_assignment, (user_id, taxi_id, "assigned", request_id))
+        return reserved
+
+    def release_reservation_statements(self, cursor, taxi_id, user_id, request_id=None):
+        # Undoes a reserve_and_assign that committed after its caller gave up: the taxi is back to the
+        # available, connected state reserve_taxi required of it, and the assignment is gone, so a retry
+        # of request_id is matched afresh rather than answered with this taxi
+        cursor.execute("UPDATE taxis SET status = %s, connected = %s WHERE taxi_id = %s", (TAXI_STATUS_AVAILABLE, True, taxi_id))
+        cursor.execute(
+            "DELETE FROM assignments WHERE user_id = %s AND taxi_id = %s AND request_id <=> %s",
+            (user_id, taxi_id, request_id)
+        )
+        return cursor.rowcount == 1
+
+    # -------------------------
+    # Heartbeat history: per-taxi rollups instead of a row per heartbeat
+    # -------------------------
+    def record_heartbeat_rollups_statements(self, cursor, rows):
+        # rows: (taxi_id, bucket_start, bucket_seconds, beats, first_seen, last_seen, gaps, max_gap);
+        # a bucket written twice (a restart, the backup taking over) is merged, not duplicated
+        query = """
+        INSERT INTO heartbeat_rollup (taxi_id, bucket_start, bucket_seconds, beats, first_seen, last_seen, gaps, max_gap)
+        VALUES (%s, %s, %s, %s, %s, %s, %s, %s)
+        ON DUPLICATE KEY UPDATE
+            beats = beats + VALUES(beats),
+            first_seen = LEAST(first_seen, VALUES(first_seen)),
+            last_seen = GREATEST(last_seen, VALUES(last_seen)),
+            gaps = gaps + VALUES(gaps),
+            max_gap = GREATEST(max_gap, VALUES(max_gap))
+        """
+        cursor.executemany(query, rows)
+        return len(rows)
+
+    def compact_heartbeat_rollups_statements(self, cursor, compact_before, bucket_seconds, retain_after):
+        """
+        Merges the finer rollups that start before `compact_before` into `bucket_seconds` buckets,
+        then deletes the merged rollups that start before `retain_after`. Both range scans run on the
+        (bucket_seconds, bucket_start) index. Returns the number of rows removed.
+        """
+        cursor.execute("""
+        INSERT INTO heartbeat_rollup (taxi_id, bucket_start, bucket_seconds, beats, first_seen, last_seen, gaps, max_gap)
+        SELECT taxi_id, FLOOR(bucket_start / %s) * %s, %s, SUM(beats), MIN(first_seen), MAX(last_seen), SUM(gaps), MAX(max_gap)
+        FROM heartbeat_rollup AS fine
+        WHERE bucket_seconds < %s AND bucket_start < %s
+        GROUP BY taxi_id, FLOOR(bucket_start / %s)
+        ON DUPLICATE KEY UPDATE
+            beats = beats + VALUES(beats),
+            first_seen = LEAST(first_seen, VALUES(first_seen)),
+            last_seen = GREATEST(last_seen, VALUES(last_seen)),
+            gaps = gaps + VALUES(gaps),
+            max_gap = GREATEST(max_gap, VALUES(max_gap))
+        """, (bucket_seconds, bucket_seconds, bucket_seconds, bucket_seconds, compact_before, bucket_seconds))
+        cursor.execute(HOT_QUERIES["compacted_heartbeat_rollups"], (bucket_seconds, compact_before))
+        removed = cursor.rowcount
+        # Only compacted rollups are old enough to expire (HEARTBEAT_RETENTION > HEARTBEAT_COMPACT_AFTER)
+        cursor.execute(HOT_QUERIES["expired_heartbeat_rollups"], (bucket_seconds, retain_after))
+        return removed + cursor.rowcount
+
+    def get_recent_assignments(self, since):
+        # (request_id, taxi_id, assigned_at) of the requests assigned from `since` (epoch seconds) on, oldest first
+        cursor = self.get_cursor()
+        cursor.execute(HOT_QUERIES["recent_assignments"], (since,))
+        return [(request_id, taxi_id, float(assigned_at)) for request_id, taxi_id, assigned_at in cursor.fetchall()]
+
+    def get_heartbeat_history(self, taxi_id, since):
+        # A taxi's rollups from `since` on: a primary key range, however long the system has run
+        cursor = self.get_cursor()
+        cursor.execute(HOT_QUERIES["get_heartbeat_history"], (taxi_id, since))
+        return cursor.fetchall()
+
     def get_available_taxis(self):
         cursor = self.get_cursor()
         connection = self.get_connection()
-        query = "SELECT taxi_id, pos_x, pos_y, speed, status, connected FROM taxis WHERE status = %s AND connected = %s"
-        values = ("available", True)
-        cursor.execute(query, values)
+        # Answered from the taxis_available covering index alone
+        cursor.execute(HOT_QUERIES["get_available_taxis"], (TAXI_STATUS_AVAILABLE, True))
         rows = cursor.fetchall()
         self.close()
         
@@ -154,7 +356,7 @@ class DatabaseHandler:
                 "pos_x": row[1],
                 "pos_y": row[2],
                 "speed": row[3],
-                "status": row[4],
+                "status": decode_status(row[4]),
                 "connected": row[5],
             }
             for row in rows
@@ -180,10 +382,9 @@ class DatabaseHandler:
         cursor = self.get_cursor()
         connection = self.get_connection()
         # try:
-        query = "SELECT COUNT(*) FROM taxis WHERE taxi_id = %s"
-        cursor.execute(query, (taxi_id,))
-        result = cursor.fetchone()
-        return result[0] > 0
+        # A primary key probe; COUNT(*) had nothing to count beyond the first row
+        cursor.execute(HOT_QUERIES["taxi_exists"], (taxi_id,))
+        return cursor.fetchone() is not None
         # except Exception as e:
             # self.console_utils.print(f"Error checking if taxi exists: {e}", 3)
             # return False
@@ -196,14 +397,71 @@ class DatabaseHandler:
         connection = self.get_connection()
         query = "SELECT taxi_id, pos_x, pos_y, speed, status, connected FROM taxis"
         cursor.execute(query)
-        taxis = cursor.fetchall()
+        taxis = [
+            (taxi_id, pos_x, pos_y, speed, decode_status(status), connected)
+            for taxi_id, pos_x, pos_y, speed, status, connected in cursor.fetchall()
+        ]
         self.close()
         return taxis
 
+    def get_taxis_updated_since(self, since):
+        # Taxis changed from `since` (epoch seconds) on, by any dispatcher, shaped like get_all_taxis.
+        # last_updated has no index, so this scans the table: start-up reconciliation only
+        cursor = self.get_cursor()
+        cursor.execute(
+            "SELECT taxi_id, pos_x, pos_y, speed, status, connected FROM taxis WHERE last_updated >= FROM_UNIXTIME(%s)",
+            (since,),
+        )
+        return [
+            (taxi_id, pos_x, pos_y, speed, decode_status(status), bool(connected))
+            for taxi_id, pos_x, pos_y, speed, status, connected in cursor.fetchall()
+        ]
+
+    def get_ride_owners(self, taxi_ids):
+        # taxi_id -> (user_id of the taxi's latest assignment or None, its status) for each taxi that exists
+        taxi_ids = list(taxi_ids)
+        if not taxi_ids:
+            return {}
+        cursor = self.get_cursor()
+        placeholders = ", ".join(["%s"] * len(taxi_ids))
+        cursor.execute(f"SELECT taxi_id, status FROM taxis WHERE taxi_id IN ({placeholders})", taxi_ids)
+        statuses = {taxi_id: decode_status(status) for taxi_id, status in cursor.fetchall()}
+        cursor.execute(
+            f"SELECT taxi_id, user_id FROM assignments WHERE taxi_id IN ({placeholders}) ORDER BY assignment_time, assignment_id",
+            taxi_ids,
+        )
+        latest = {taxi_id: user_id for taxi_id, user_id in cursor.fetchall()}  # Later rows win
+        return {taxi_id: (latest.get(taxi_id), status) for taxi_id, status in statuses.items()}
+
+    def iter_taxis(self, chunk_size=FLEET_PRELOAD_CHUNK):
+        """
+        Streams the taxis table in primary key order as lists of up to `chunk_size` rows shaped like
+        get_all_taxis. The cursor is unbuffered and on its own connection: MySQL sends rows as they
+        are fetched, so neither side ever holds the whole fleet, and the thread's connection stays
+        free for other queries meanwhile.
+        """
+        connection = msc.connect(host=self.host, user=self.user, password=self.password, database=self.database)
+        cursor = connection.cursor(buffered=False)
+        try:
+            cursor.execute("SELECT taxi_id, pos_x, pos_y, speed, status, connected FROM taxis ORDER BY taxi_id")
+            while True:
+                rows = cursor.fetchmany(chunk_size)
+                if not rows:
+                    break
+                yield [
+                    (taxi_id, pos_x, pos_y, speed, decode_status(status), bool(connected))
+                    for taxi_id, pos_x, pos_y, speed, status, connected in rows
+                ]
+        finally:
+            try:
+                cursor.close()
+            except msc.Error:
+                pass  # Rows left unread when the caller stopped early; closing the connection drops them
+            connection.close()
+
     def get_taxi_by_id(self, taxi_id):
         cursor = self.get_cursor()
-        query = "SELECT * FROM taxis WHERE taxi_id = %s"
-        cursor.execute(query, (taxi_id,))
+        cursor.execute(HOT_QUERIES["get_taxi_by_id"], (taxi_id,))
         row = cursor.fetchone()
         self.close()
 
@@ -211,6 +469,7 @@ class DatabaseHandler:
             # Map the database row to a dictionary
             columns = [desc[0] for desc in cursor.description]
             taxi = dict(zip(columns, row))
+            taxi["status"] = decode_status(taxi["status"])
             return taxi
 
         return None  # Return None if no matching taxi is found
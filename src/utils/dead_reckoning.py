@@ -0,0 +1,117 @@
+from threading import Lock
+from src.config import TAXI_MOVE_INTERVAL, DEAD_RECKONING_THRESHOLD
+from src.utils.clock import default_clock
+
+# Unit vector per heading; NONE (or anything unknown) means the taxi is predicted to stay put
+HEADING_VECTORS = {
+    "NORTH": (0, 1),
+    "SOUTH": (0, -1),
+    "EAST": (1, 0),
+    "WEST": (-1, 0),
+}
+
+
+def cells_per_second(speed, interval=TAXI_MOVE_INTERVAL):
+    # Mirrors Taxi.cells_for_tick: speed 4 -> 2 cells/tick, speed 2 -> 1, speed 1 -> 1 every other tick
+    if speed == 4:
+        cells_per_tick = 2
+    elif speed == 2:
+        cells_per_tick = 1
+    elif speed == 1:
+        cells_per_tick = 0.5
+    else:
+        cells_per_tick = 0
+    return cells_per_tick / interval
+
+
+def predict_position(pos_x, pos_y, heading, speed, elapsed, N, M):
+    """
+    Linear prediction of a taxi's position `elapsed` seconds after it reported
+    (pos_x, pos_y) heading in `heading`, clamped to the grid (x in [0, M], y in [0, N]).
+    """
+    dx, dy = HEADING_VECTORS.get(heading, (0, 0))
+    distance = int(cells_per_second(speed) * max(elapsed, 0))
+    new_x = min(max(pos_x + dx * distance, 0), M)
+    new_y = min(max(pos_y + dy * distance, 0), N)
+    return new_x, new_y
+
+
+class PositionReporter:
+    """
+    Taxi-side half of dead reckoning: runs the same prediction as the dispatcher and
+    decides whether the current state is worth a position update.
+    """
+    def __init__(self, N, M, threshold=DEAD_RECKONING_THRESHOLD):
+        self.N = N
+        self.M = M
+        self.threshold = threshold
+        self.last_report = None  # (pos_x, pos_y, heading, speed, status, stopped)
+        self.elapsed = 0
+        self.reports_sent = 0
+        self.reports_suppressed = 0
+
+    def tick(self, seconds=TAXI_MOVE_INTERVAL):
+        self.elapsed += seconds
+
+    def should_report(self, taxi):
+        if self.last_report is None:
+            return True
+
+        last_x, last_y, last_heading, last_speed, last_status, last_stopped = self.last_report
+        if taxi.status != last_status or taxi.stopped != last_stopped:
+            return True
+        if taxi.stopped:
+            return False
+        if self.reported_heading(taxi) != last_heading:
+            return True
+
+        predicted_x, predicted_y = predict_position(last_x, last_y, last_heading, last_speed, self.elapsed, self.N, self.M)
+        drift = abs(predicted_x - taxi.pos_x) + abs(predicted_y - taxi.pos_y)
+        return drift > self.threshold
+
+    def mark_reported(self, taxi):
+        self.last_report = (taxi.pos_x, taxi.pos_y, self.reported_heading(taxi), taxi.speed, taxi.status, taxi.stopped)
+        self.elapsed = 0
+        self.reports_sent += 1
+
+    def mark_suppressed(self):
+        self.reports_suppressed += 1
+
+    @staticmethod
+    def reported_heading(taxi):
+        if taxi.stopped or taxi.heading is None:
+            return "NONE"
+        return taxi.heading
+
+
+class DeadReckoningTracker:
+    """
+    Dispatcher-side half of dead reckoning: remembers the last report of each taxi and
+    estimates where it is now, so matching can run between reports.
+    """
+    def __init__(self, N, M, clock=None):
+        self.N = N
+        self.M = M
+        self.clock = clock or default_clock()
+        self.lock = Lock()
+        self.reports = {}  # taxi_id -> (pos_x, pos_y, heading, speed, received_at)
+
+    def record(self, taxi_id, pos_x, pos_y, heading="NONE", speed=0, received_at=None):
+        if received_at is None:
+            received_at = self.clock.time()
+        with self.lock:
+            self.reports[taxi_id] = (pos_x, pos_y, heading, speed, received_at)
+
+    def forget(self, taxi_id):
+        with self.lock:
+            self.reports.pop(taxi_id, None)
+
+    def estimate(self, taxi_id, now=None):
+        with self.lock:
+            report = self.reports.get(taxi_id)
+        if report is None:
+            return None
+        if now is None:
+            now = self.clock.time()
+        pos_x, pos_y, heading, speed, received_at = report
+        return predict_position(pos_x, pos_y, heading, speed, now - received_at, self.N, self.M)
@@ -0,0 +1,112 @@
+import numpy as np
+from src.models.taxi_model import encode_status, decode_status
+
+# One packed record per taxi on the wire; 19 bytes instead of a JSON row
+STREAM_RECORD = np.dtype([
+    ("taxi_id", "<i8"),
+    ("pos_x", "<i4"),
+    ("pos_y", "<i4"),
+    ("speed", "u1"),
+    ("status", "u1"),
+    ("connected", "u1"),
+])
+# Header frame: sequence number, the keyframe a delta applies to, send time and frame kind
+STREAM_HEADER = np.dtype([
+    ("seq", "<u8"),
+    ("keyframe_seq", "<u8"),
+    ("time", "<f8"),
+    ("kind", "u1"),
+])
+KEYFRAME = 0
+DELTA = 1
+NO_TAXIS = np.empty(0, dtype="<i8")
+
+
+def records_from_rows(rows):
+    # Storage rows (taxi_id, pos_x, pos_y, speed, status, connected) as stream records
+    records = np.empty(len(rows), dtype=STREAM_RECORD)
+    for index, (taxi_id, pos_x, pos_y, speed, status, connected) in enumerate(rows):
+        records[index] = (taxi_id, pos_x, pos_y, speed, encode_status(status), bool(connected))
+    return records
+
+
+def rows_from_records(records):
+    return [
+        (int(taxi_id), int(pos_x), int(pos_y), int(speed), decode_status(status), bool(connected))
+        for taxi_id, pos_x, pos_y, speed, status, connected in records.tolist()
+    ]
+
+
+class FleetStreamEncoder:
+    """
+    Turns successive fleet states into frames: a full keyframe every `keyframe_interval`
+    messages and, in between, deltas holding only the taxis that changed plus the ids that left.
+    Frames are [header, records, removed ids], ready for a zero-copy multipart send.
+    """
+    def __init__(self, keyframe_interval):
+        self.keyframe_interval = keyframe_interval
+        self.seq = 0
+        self.keyframe_seq = 0
+        self.previous = None
+
+    def encode(self, records, now):
+        records = np.sort(records, order="taxi_id")
+        self.seq += 1
+        if self.previous is None or self.seq - self.keyframe_seq >= self.keyframe_interval:
+            self.keyframe_seq = self.seq
+            kind, body, removed = KEYFRAME, records, NO_TAXIS
+        else:
+            kind, body, removed = DELTA, *self.diff(self.previous, records)
+        self.previous = records
+        header = np.array([(self.seq, self.keyframe_seq, now, kind)], dtype=STREAM_HEADER)
+        return [header, np.ascontiguousarray(body), removed]
+
+    @staticmethod
+    def diff(previous, records):
+        # Both sorted by taxi_id; vectorised, so the Python work is per message, not per taxi
+        if len(previous) == 0:
+            return records, NO_TAXIS
+        index = np.minimum(np.searchsorted(previous["taxi_id"], records["taxi_id"]), len(previous) - 1)
+        known = previous["taxi_id"][index] == records["taxi_id"]
+        changed = ~known | (previous[index] != records)
+        removed = previous["taxi_id"][~np.isin(previous["taxi_id"], records["taxi_id"], assume_unique=True)]
+        return records[changed], removed.astype("<i8")
+
+
+class FleetStreamReceiver:
+    """
+    Rebuilds the fleet from a keyframe/delta stream. A missing sequence number, or a delta
+    against a keyframe it never saw, drops the state until the next keyframe arrives.
+    """
+    def __init__(self):
+        self.fleet = {}
+        self.synced = False
+        self.seq = None
+        self.keyframe_seq = None
+        self.source_time = None
+        self.gaps = 0
+
+    def apply(self, frames):
+        # frames: [header, records, removed] as bytes, memoryviews or zmq Frames; True if the fleet changed
+        header, records, removed = (np.frombuffer(memoryview(frame), dtype=dtype)
+                                    for frame, dtype in zip(frames, (STREAM_HEADER, STREAM_RECORD, "<i8")))
+        seq, keyframe_seq, sent, kind = header[0].tolist()
+        if kind == KEYFRAME:
+            self.fleet = {}
+        elif not self.synced or seq != self.seq + 1 or keyframe_seq != self.keyframe_seq:
+            if self.synced:
+                self.gaps += 1
+                self.synced = False
+            self.seq = seq
+            return False
+        for taxi_id in removed.tolist():
+            self.fleet.pop(taxi_id, None)
+        for record in records.tolist():
+            self.fleet[record[0]] = record
+        self.synced = True
+        self.seq, self.keyframe_seq, self.source_time = seq, keyframe_seq, sent
+        return True
+
+    def rows(self):
+        records = np.array(sorted(self.fleet.values()), dtype=STREAM_RECORD) if self.fleet else np.empty(0, STREAM_RECORD)
+        return rows_from_records(records)
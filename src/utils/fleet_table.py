@@ -0,0 +1,194 @@
+import numpy as np
+from multiprocessing import shared_memory
+from src.models.taxi_model import TAXI_STATUS_AVAILABLE
+from src.utils.dead_reckoning import HEADING_VECTORS, cells_per_second
+
+# One fixed-width record per dense taxi slot. `seq` is a per-record seqlock: the single
+# writer makes it odd while a record is being changed and even again once it is consistent.
+FLEET_RECORD = np.dtype([
+    ("seq", np.uint32),
+    ("in_use", np.uint8),
+    ("status", np.uint8),
+    ("connected", np.uint8),
+    ("speed", np.uint8),
+    ("heading", np.uint8),
+    ("taxi_id", np.int64),
+    ("pos_x", np.int32),
+    ("pos_y", np.int32),
+    ("last_heartbeat", np.float64),
+    ("updated_at", np.float64),
+], align=True)
+
+# Header: capacity, high-water mark (number of slots ever handed out) and grid size
+HEADER = np.dtype([
+    ("capacity", np.uint64),
+    ("high_water", np.uint64),
+    ("rows", np.int32),
+    ("cols", np.int32),
+], align=True)
+
+# Headings as stored in the table: 0 is NONE, then the dead reckoning directions in order
+HEADINGS = ["NONE", *HEADING_VECTORS]
+HEADING_CODES = {heading: code for code, heading in enumerate(HEADINGS)}
+HEADING_DX = np.array([0] + [vector[0] for vector in HEADING_VECTORS.values()], dtype=np.int64)
+HEADING_DY = np.array([0] + [vector[1] for vector in HEADING_VECTORS.values()], dtype=np.int64)
+RATE_BY_SPEED = np.array([cells_per_second(speed) for speed in range(256)], dtype=np.float64)
+
+MAX_READ_RETRIES = 8
+
+
+class SharedFleetTable:
+    """
+    Fleet state in `multiprocessing.shared_memory`, indexed by dense taxi slot.
+
+    Exactly one process (the ingest process) writes; any number of processes attach and
+    read it zero-copy. Readers detect torn records through the per-record seqlock and retry.
+    """
+    def __init__(self, shm, owner=False):
+        self.shm = shm
+        self.owner = owner
+        self.header = np.ndarray((1,), dtype=HEADER, buffer=shm.buf, offset=0)
+        capacity = int(self.header["capacity"][0])
+        self.records = np.ndarray((capacity,), dtype=FLEET_RECORD, buffer=shm.buf, offset=HEADER.itemsize)
+
+    @classmethod
+    def create(cls, capacity, N, M, name=None):
+        size = HEADER.itemsize + FLEET_RECORD.itemsize * capacity
+        shm = shared_memory.SharedMemory(name=name, create=True, size=size)
+        header = np.ndarray((1,), dtype=HEADER, buffer=shm.buf, offset=0)
+        header["capacity"] = capacity
+        header["high_water"] = 0
+        header["rows"] = N
+        header["cols"] = M
+        del header
+        table = cls(shm, owner=True)
+        table.records[:] = 0
+        return table
+
+    @classmethod
+    def attach(cls, name):
+        return cls(shared_memory.SharedMemory(name=name), owner=False)
+
+    @property
+    def name(self):
+        return self.shm.name
+
+    @property
+    def capacity(self):
+        return len(self.records)
+
+    @property
+    def high_water(self):
+        return int(self.header["high_water"][0])
+
+    def close(self):
+        # Views into the buffer must go before the mapping can be released
+        del self.records
+        del self.header
+        self.shm.close()
+        if self.owner:
+            self.shm.unlink()
+
+    # -------------------------
+    # Writer (ingest process only)
+    # -------------------------
+    def write(self, slot, **fields):
+        if slot >= self.capacity:
+            raise IndexError(f"Fleet table slot {slot} exceeds capacity {self.capacity}")
+        record = self.records[slot:slot + 1]
+        seq = int(record["seq"][0])
+        record["seq"] = seq + 1
+        for field, value in fields.items():
+            record[field] = value
+        record["seq"] = seq + 2
+        if slot >= self.high_water:
+            self.header["high_water"] = slot + 1
+
+    def register(self, slot, taxi_id, pos_x, pos_y, speed, status, connected=True, now=0.0):
+        self.write(
+            slot, in_use=1, taxi_id=taxi_id, pos_x=pos_x, pos_y=pos_y, speed=speed, heading=0,
+            status=status, connected=int(connected), last_heartbeat=now, updated_at=now,
+        )
+
+    def release(self, slot):
+        self.write(slot, in_use=0, connected=0)
+
+    # -------------------------
+    # Readers (any process)
+    # -------------------------
+    def read(self, slot):
+        # Consistent one-record copy of `slot`, or None if the writer kept it busy
+        record = self.records[slot:slot + 1]
+        for _ in range(MAX_READ_RETRIES):
+            seq_before = int(record["seq"][0])
+            if seq_before % 2 == 0:
+                copy = record.copy()
+                if int(record["seq"][0]) == seq_before:
+                    return copy
+        return None
+
+    def stream_records(self, dtype):
+        # Taxis in use, as `dtype` records for the fleet stream; a record caught mid-write
+        # is skipped and goes out with the next message
+        records = self.records[:self.high_water].copy()
+        records = records[(records["in_use"] == 1) & (records["seq"] % 2 == 0)]
+        out = np.empty(len(records), dtype=dtype)
+        for field in dtype.names:
+            out[field] = records[field]
+        return out
+
+    def estimated_positions(self, records, now):
+        # Vectorised DeadReckoningTracker.estimate over the whole table
+        if now is None:
+            return records["pos_x"].astype(np.int64), records["pos_y"].astype(np.int64)
+        rows = int(self.header["rows"][0])
+        cols = int(self.header["cols"][0])
+        heading = records["heading"]
+        distance = (RATE_BY_SPEED[records["speed"]] * np.maximum(now - records["updated_at"], 0)).astype(np.int64)
+        pos_x = np.clip(records["pos_x"] + HEADING_DX[heading] * distance, 0, cols)
+        pos_y = np.clip(records["pos_y"] + HEADING_DY[heading] * distance, 0, rows)
+        return pos_x, pos_y
+
+    def find_nearest_available(self, user_x, user_y, now=None):
+        """
+        Returns (taxi_id, pos_x, pos_y, distance) of the closest available, connected taxi,
+        breaking ties on taxi_id like DispatcherService.find_nearest_available_taxi, or None.
+        Positions are dead-reckoned to `now` when it is given.
+        """
+        for _ in range(MAX_READ_RETRIES):
+            records = self.records[:self.high_water]
+            available = (
+                (records["in_use"] == 1)
+                & (records["connected"] == 1)
+                & (records["status"] == TAXI_STATUS_AVAILABLE)
+            )
+            if not available.any():
+                return None
+            pos_x, pos_y = self.estimated_positions(records, now)
+            # One int64 key per slot: distance first, taxi_id as the tie-breaker
+            keys = (np.abs(pos_x - user_x) + np.abs(pos_y - user_y)) << 32
+            keys += records["taxi_id"] & 0xFFFFFFFF
+            keys[~available] = np.iinfo(np.int64).max
+            slot = int(np.argmin(keys))
+            # The scan reads fields in separate passes; only the winner needs to be consistent
+            record = self.read(slot)
+            if (
+                record is not None
+                and record["in_use"][0] == 1
+                and record["connected"][0] == 1
+                and record["status"][0] == TAXI_STATUS_AVAILABLE
+            ):
+                best_x, best_y = self.estimated_positions(record, now)
+                best_x, best_y = int(best_x[0]), int(best_y[0])
+                distance = abs(best_x - user_x) + abs(best_y - user_y)
+                return int(record["taxi_id"][0]), best_x, best_y, distance
+        return None
+
+    def stale_taxis(self, now, timeout):
+        records = self.records[:self.high_water]
+        stale = np.flatnonzero(
+            (records["in_use"] == 1)
+            & (records["connected"] == 1)
+            & (now - records["last_heartbeat"] > timeout)
+        )
+        return [int(taxi_id) for taxi_id in records["taxi_id"][stale]]
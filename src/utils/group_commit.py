@@ -0,0 +1,183 @@
+import queue
+import time
+from concurrent.futures import Future, TimeoutError as FutureTimeout
+from contextlib import nullcontext
+from threading import Lock
+from src.config import GROUP_COMMIT_WINDOW, GROUP_COMMIT_MAX_OPS, STORAGE_WRITE_QUEUE_SIZE
+from src.utils.storage_executor import StorageBusy, StorageTimeout, storage_timeout
+
+# Writes where only the latest one per taxi matters, and that no other write in a group reads
+COALESCED_WRITES = {"update_taxi_position", "record_heartbeat"}
+
+
+def forward(source, target):
+    # Resolves `target` with whatever `source` resolves with
+    def done(future):
+        if future.exception() is not None:
+            target.set_exception(future.exception())
+        else:
+            target.set_result(future.result())
+    source.add_done_callback(done)
+
+
+class GroupCommitWriter:
+    """
+    Funnels storage writes from every handler thread through one connection and commits them
+    in groups: whatever arrives within GROUP_COMMIT_WINDOW seconds of the first write, up to
+    GROUP_COMMIT_MAX_OPS, goes into one transaction (DatabaseHandler.execute_batch).
+    `submit` returns a Future; callers that need the write durable, or its result, wait on it
+    with `write`, the rest fire and forget. Repeated position and heartbeat writes for the
+    same taxi within a group are coalesced into the last one.
+    The queue holds at most STORAGE_WRITE_QUEUE_SIZE writes. While it is full the writer degrades
+    instead of blocking its callers: coalesced writes wait outside the queue, latest per taxi only,
+    `offer`ed writes are skipped, and any other write waits up to its STORAGE_TIMEOUTS entry and
+    then raises StorageBusy.
+    """
+    def __init__(self, db_handler, metrics=None, window=GROUP_COMMIT_WINDOW, max_ops=GROUP_COMMIT_MAX_OPS, queue_size=STORAGE_WRITE_QUEUE_SIZE):
+        self.db_handler = db_handler
+        self.metrics = metrics
+        self.window = window
+        self.max_ops = max_ops
+        self.queue = queue.Queue(queue_size)
+        self.overflow = {}  # (name, taxi_id) -> the latest coalesced write that found the queue full
+        self.lock = Lock()
+        self.stopped = False
+
+    def count(self, name, amount=1):
+        if self.metrics:
+            self.metrics.inc(name, amount)
+
+    def enqueue(self, entry, timeout, optional=False):
+        # True once queued, False when shutting down, None when an optional write was skipped
+        name, args, future = entry
+        deadline = time.monotonic() + timeout
+        while True:
+            with self.lock:
+                if self.stopped:
+                    return False
+                try:
+                    self.queue.put_nowait(entry)
+                    return True
+                except queue.Full:
+                    if name in COALESCED_WRITES:
+                        previous = self.overflow.get((name, args[0]))
+                        if previous is not None:
+                            forward(future, previous[2])
+                        self.overflow[(name, args[0])] = entry
+                        self.count("storage.degraded.coalesced")
+                        return True
+                    if optional:
+                        self.count(f"storage.degraded.skipped.{name}")
+                        return None
+            if time.monotonic() >= deadline:
+                self.count(f"storage.busy.{name}")
+                raise StorageBusy(name)
+            time.sleep(0.001)
+
+    def submit(self, name, *args, timeout=None):
+        future = Future()
+        queued = self.enqueue((name, args, future), storage_timeout(name) if timeout is None else timeout)
+        if not queued:
+            # Shutting down: nobody is left to commit this, so do it here
+            self.commit([(name, args, future)])
+        return future
+
+    def offer(self, name, *args):
+        # A write that may be skipped under load; None when it was
+        future = Future()
+        queued = self.enqueue((name, args, future), 0, optional=True)
+        if queued is None:
+            return None
+        if not queued:
+            self.commit([(name, args, future)])
+        return future
+
+    def write(self, name, *args, timeout=None):
+        # Waits for the commit, at most `timeout` seconds in all; StorageTimeout carries the future
+        timeout = storage_timeout(name) if timeout is None else timeout
+        deadline = time.monotonic() + timeout
+        future = self.submit(name, *args, timeout=timeout)
+        try:
+            return future.result(max(deadline - time.monotonic(), 0))
+        except FutureTimeout:
+            self.count(f"storage.timeouts.{name}")
+            raise StorageTimeout(name, future)
+
+    def take_overflow(self):
+        with self.lock:
+            overflow, self.overflow = self.overflow, {}
+        return list(overflow.values())
+
+    def serve(self, stop_event):
+        while not stop_event.is_set():
+            try:
+                first = self.queue.get(timeout=0.1)
+            except queue.Empty:
+                overflow = self.take_overflow()
+                if overflow:
+                    self.commit(overflow)
+                continue
+            batch = [first]
+            deadline = time.monotonic() + self.window
+            while len(batch) < self.max_ops:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(self.queue.get(timeout=remaining))
+                except queue.Empty:
+                    break
+            # Writes that overflowed the queue are newer than everything queued before them
+            self.commit(batch + self.take_overflow())
+        with self.lock:
+            self.stopped = True
+        # Whatever was queued before the stop still gets written
+        batch = []
+        while not self.queue.empty():
+            batch.append(self.queue.get_nowait())
+        batch += self.take_overflow()
+        if batch:
+            self.commit(batch)
+
+    @staticmethod
+    def coalesce(batch):
+        # Keeps the last of each coalesced write, in order; the dropped ones (always earlier
+        # in the batch) resolve with its result
+        last = {}
+        for index, (name, args, _) in enumerate(batch):
+            if name in COALESCED_WRITES:
+                last[(name, args[0])] = index
+        operations = []
+        followers = {}
+        for index, (name, args, future) in enumerate(batch):
+            if name in COALESCED_WRITES and last[(name, args[0])] != index:
+                followers.setdefault(last[(name, args[0])], []).append(future)
+                continue
+            operations.append((name, args, [future] + followers.get(index, [])))
+        return operations
+
+    def commit(self, batch):
+        operations = self.coalesce(batch)
+        timer = self.metrics.timer("storage.group_commit") if self.metrics else nullcontext()
+        try:
+            with timer:
+                results = self.db_handler.execute_batch([(name, args) for name, args, _ in operations])
+        except Exception:
+            # One bad write must not fail its whole group: retry each in its own transaction
+            results = None
+        self.count("storage.group_commit.groups")
+        self.count("storage.group_commit.writes", len(batch))
+        self.count("storage.group_commit.coalesced", len(batch) - len(operations))
+        for index, (name, args, futures) in enumerate(operations):
+            if results is not None:
+                result, error = results[index], None
+            else:
+                try:
+                    result, error = self.db_handler.execute_batch([(name, args)])[0], None
+                except Exception as e:
+                    result, error = None, e
+            for future in futures:
+                if error is None:
+                    future.set_result(result)
+                else:
+                    future.set_exception(error)
@@ -0,0 +1,105 @@
+from threading import Lock
+from src.config import (
+    HEARTBEAT_TIMEOUT, HEARTBEAT_ROLLUP_INTERVAL, HEARTBEAT_COMPACTION_INTERVAL,
+    HEARTBEAT_COMPACT_AFTER, HEARTBEAT_COMPACTED_BUCKET, HEARTBEAT_RETENTION,
+)
+
+
+class HeartbeatHistory:
+    """
+    Heartbeats as in-memory state instead of a row write each. The last time every taxi was
+    seen stays here; every HEARTBEAT_ROLLUP_INTERVAL the window's beats are written as one
+    heartbeat_rollup row per taxi (count, first and last seen, gaps longer than HEARTBEAT_TIMEOUT).
+    A compaction pass merges rollups older than HEARTBEAT_COMPACT_AFTER into
+    HEARTBEAT_COMPACTED_BUCKET rows and deletes those past HEARTBEAT_RETENTION, so the table,
+    and the cost of querying it, stops growing once the retention period is reached.
+    """
+    def __init__(self, storage_writer, clock, interval=HEARTBEAT_ROLLUP_INTERVAL, gap=HEARTBEAT_TIMEOUT):
+        self.storage_writer = storage_writer
+        self.clock = clock
+        self.interval = interval
+        self.gap = gap
+        self.lock = Lock()
+        self.last_seen = {}
+        self.window = {}  # taxi_id -> [beats, first_seen, last_seen, gaps, max_gap]
+        self.window_start = self.bucket(clock.time())
+
+    def bucket(self, now):
+        return now - now % self.interval
+
+    def seen(self, taxi_id, now=None):
+        if now is None:
+            now = self.clock.time()
+        with self.lock:
+            previous = self.last_seen.get(taxi_id)
+            self.last_seen[taxi_id] = now
+            rollup = self.window.get(taxi_id)
+            if rollup is None:
+                rollup = self.window[taxi_id] = [0, now, now, 0, 0.0]
+            rollup[0] += 1
+            rollup[2] = now
+            if previous is not None:
+                # Gaps are counted in the window where they end, so they survive window boundaries
+                silence = now - previous
+                if silence > self.gap:
+                    rollup[3] += 1
+                if silence > rollup[4]:
+                    rollup[4] = silence
+
+    def forget(self, taxi_id):
+        # The taxi left (handed off to another shard); its current window is still written
+        with self.lock:
+            self.last_seen.pop(taxi_id, None)
+
+    def drain(self, now=None):
+        # The closed window as heartbeat_rollup rows, and a fresh window from `now`
+        if now is None:
+            now = self.clock.time()
+        with self.lock:
+            window, bucket_start = self.window, self.window_start
+            self.window = {}
+            self.window_start = self.bucket(now)
+        return [
+            (taxi_id, bucket_start, self.interval, beats, first_seen, last_seen, gaps, max_gap)
+            for taxi_id, (beats, first_seen, last_seen, gaps, max_gap) in window.items()
+        ]
+
+    def flush(self, now=None):
+        rows = self.drain(now)
+        if rows:
+            self.storage_writer.submit("record_heartbeat_rollups", rows)
+        return len(rows)
+
+    def compact(self, now=None):
+        if now is None:
+            now = self.clock.time()
+        return self.storage_writer.submit(
+            "compact_heartbeat_rollups", now - HEARTBEAT_COMPACT_AFTER, HEARTBEAT_COMPACTED_BUCKET, now - HEARTBEAT_RETENTION
+        )
+
+    def status(self, args):
+        now = self.clock.time()
+        with self.lock:
+            if not args:
+                return f"{len(self.last_seen)} taxis seen, {len(self.window)} in the window since {self.window_start:.0f}"
+            taxi_id = int(args[0])
+            last_seen = self.last_seen.get(taxi_id)
+            rollup = self.window.get(taxi_id)
+        if last_seen is None:
+            return f"taxi {taxi_id} not seen"
+        line = f"taxi {taxi_id} last seen {now - last_seen:.1f} s ago"
+        if rollup:
+            beats, first_seen, _, gaps, max_gap = rollup
+            line += f", {beats} beats since {first_seen:.0f}, {gaps} gaps, longest silence {max_gap:.1f} s"
+        return line
+
+    def serve(self, stop_event, compact=True):
+        # Only one history per dispatcher compacts; others (the fleet ingest worker's) just flush
+        compacted_at = self.clock.time()
+        while not self.clock.wait(stop_event, self.interval - self.clock.time() % self.interval):
+            self.flush()
+            if compact and self.clock.time() - compacted_at >= HEARTBEAT_COMPACTION_INTERVAL:
+                compacted_at = self.clock.time()
+                self.compact(compacted_at)
+        # The partial window is still history
+        self.flush()
@@ -0,0 +1,16 @@
+# Matching rules shared by the dispatchers and the simulation: the closest taxi by
+# Manhattan distance wins, ties go to the lowest taxi_id.
+
+def manhattan_distance(x1, y1, x2, y2):
+    return abs(x1 - x2) + abs(y1 - y2)
+
+
+def match_key(taxi_id, pos_x, pos_y, user_x, user_y):
+    return (manhattan_distance(pos_x, pos_y, user_x, user_y), taxi_id)
+
+
+def nearest_taxi(taxis, user_x, user_y):
+    # `taxis` are the dispatcher's row dicts (taxi_id, pos_x, pos_y, ...)
+    if not taxis:
+        return None
+    return min(taxis, key=lambda taxi: match_key(taxi['taxi_id'], taxi['pos_x'], taxi['pos_y'], user_x, user_y))
@@ -0,0 +1,192 @@
+import time
+import zmq
+from contextlib import contextmanager
+from threading import Lock
+
+# Histogram bucket upper bounds in milliseconds; the last bucket catches everything slower
+LATENCY_BUCKETS_MS = [0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000]
+
+
+class Histogram:
+    __slots__ = ("counts", "count", "total", "max")
+
+    def __init__(self):
+        self.counts = [0] * (len(LATENCY_BUCKETS_MS) + 1)
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def observe(self, ms):
+        index = 0
+        while index < len(LATENCY_BUCKETS_MS) and ms > LATENCY_BUCKETS_MS[index]:
+            index += 1
+        self.counts[index] += 1
+        self.count += 1
+        self.total += ms
+        if ms > self.max:
+            self.max = ms
+
+    def percentile(self, fraction):
+        # Upper bound of the bucket holding the requested rank
+        if not self.count:
+            return 0.0
+        rank = fraction * self.count
+        seen = 0
+        for index, bucket_count in enumerate(self.counts):
+            seen += bucket_count
+            if seen >= rank:
+                return LATENCY_BUCKETS_MS[index] if index < len(LATENCY_BUCKETS_MS) else self.max
+        return self.max
+
+    def summary(self):
+        return {
+            "count": self.count,
+            "mean_ms": round(self.total / self.count, 3) if self.count else 0.0,
+            "p50_ms": self.percentile(0.50),
+            "p90_ms": self.percentile(0.90),
+            "p99_ms": self.percentile(0.99),
+            "max_ms": round(self.max, 3),
+        }
+
+
+class Stopwatch:
+    """
+    Splits one message's handling into stages; `finish` records every stage and the total.
+    Once `trace` is called the stages are also written as spans of that trace.
+    """
+    __slots__ = ("metrics", "name", "started", "last", "stages", "laps", "wall_start", "trace_id", "tracer")
+
+    def __init__(self, metrics, name):
+        self.metrics = metrics
+        self.name = name
+        self.started = self.last = time.perf_counter()
+        self.wall_start = time.time()
+        self.stages = {}
+        self.laps = []
+        self.trace_id = None
+        self.tracer = None
+
+    def trace(self, trace_id, tracer):
+        self.trace_id = trace_id
+        self.tracer = tracer
+
+    def lap(self, stage):
+        now = time.perf_counter()
+        self.stages[stage] = self.stages.get(stage, 0.0) + now - self.last
+        self.laps.append((stage, self.last - self.started, now - self.last))
+        self.last = now
+
+    def finish(self):
+        now = time.perf_counter()
+        with self.metrics.lock:
+            for stage, seconds in self.stages.items():
+                self.metrics.histogram(f"{self.name}.{stage}").observe(seconds * 1000)
+            self.metrics.histogram(f"{self.name}.total").observe((now - self.started) * 1000)
+        if self.trace_id and self.tracer:
+            for stage, offset, seconds in self.laps:
+                self.tracer.span(self.trace_id, f"{self.name}.{stage}", self.wall_start + offset, seconds)
+
+
+class Metrics:
+    """
+    In-process counters and latency histograms for a dispatcher. Recording is a dict lookup
+    and a few additions under one lock, cheap enough to leave on.
+    """
+    def __init__(self):
+        self.lock = Lock()
+        self.counters = {}
+        self.histograms = {}
+        self.started_at = time.time()
+
+    def histogram(self, name):
+        # Caller holds self.lock
+        histogram = self.histograms.get(name)
+        if histogram is None:
+            histogram = self.histograms[name] = Histogram()
+        return histogram
+
+    def inc(self, name, amount=1):
+        with self.lock:
+            self.counters[name] = self.counters.get(name, 0) + amount
+
+    def observe(self, name, ms):
+        with self.lock:
+            self.histogram(name).observe(ms)
+
+    def stopwatch(self, name):
+        return Stopwatch(self, name)
+
+    @contextmanager
+    def timer(self, name):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, (time.perf_counter() - started) * 1000)
+
+    @contextmanager
+    def acquire(self, lock, name):
+        # Times the wait for `lock` separately from the time it is held
+        started = time.perf_counter()
+        with lock:
+            acquired = time.perf_counter()
+            self.observe(f"lock.{name}.wait", (acquired - started) * 1000)
+            try:
+                yield
+            finally:
+                self.observe(f"lock.{name}.held", (time.perf_counter() - acquired) * 1000)
+
+    def sample_backlog(self, name, socket):
+        # ZeroMQ does not expose queue lengths; count how often more input was already waiting
+        self.inc(f"queue.{name}.handled")
+        if socket.get(zmq.EVENTS) & zmq.POLLIN:
+            self.inc(f"queue.{name}.backlogged")
+
+    def reset(self):
+        with self.lock:
+            self.counters.clear()
+            self.histograms.clear()
+            self.started_at = time.time()
+
+    def snapshot(self):
+        with self.lock:
+            return {
+                "uptime_s": round(time.time() - self.started_at, 1),
+                "counters": dict(sorted(self.counters.items())),
+                "latency": {name: histogram.summary() for name, histogram in sorted(self.histograms.items())},
+            }
+
+    def render(self):
+        snapshot = self.snapshot()
+        lines = [f"uptime {snapshot['uptime_s']} s"]
+        for name, value in snapshot["counters"].items():
+            lines.append(f"{name:<48} {value}")
+        for name, summary in snapshot["latency"].items():
+            lines.append(
+                f"{name:<48} n={summary['count']} mean={summary['mean_ms']}ms p50={summary['p50_ms']}ms "
+                f"p90={summary['p90_ms']}ms p99={summary['p99_ms']}ms max={summary['max_ms']}ms"
+            )
+        return "\n".join(lines)
+
+
+class InstrumentedCalls:
+    """Wraps an object (the DatabaseHandler) so every method call is timed as `<prefix>.<method>`."""
+    def __init__(self, target, metrics, prefix):
+        self._target = target
+        self._metrics = metrics
+        self._prefix = prefix
+
+    def __getattr__(self, name):
+        attribute = getattr(self._target, name)
+        if not callable(attribute):
+            return attribute
+        metrics = self._metrics
+        histogram_name = f"{self._prefix}.{name}"
+
+        def timed(*args, **kwargs):
+            started = time.perf_counter()
+            try:
+                return attribute(*args, **kwargs)
+            finally:
+                metrics.observe(histogram_name, (time.perf_counter() - started) * 1000)
+        return timed
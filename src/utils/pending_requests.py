@@ -0,0 +1,38 @@
+import heapq
+import itertools
+from src.config import USER_REQUEST_TIMEOUT, USER_PENDING_LIMIT
+from src.utils.admission import tag_time
+
+
+class PendingRequests:
+    """
+    User requests taken off the socket but not yet served, earliest deadline first. The
+    dispatcher drains its socket into here before serving each request, so when taxis are short
+    the users closest to giving up are matched first. A request without a deadline tag gets
+    USER_REQUEST_TIMEOUT from its arrival. Holds at most USER_PENDING_LIMIT requests; the rest
+    wait on the socket. Only the user-request thread uses it, so it has no lock.
+    """
+    def __init__(self, limit=USER_PENDING_LIMIT, timeout=USER_REQUEST_TIMEOUT):
+        self.limit = limit
+        self.timeout = timeout
+        self.heap = []
+        self.order = itertools.count()  # Ties are served in arrival order
+
+    def __len__(self):
+        return len(self.heap)
+
+    def full(self):
+        return len(self.heap) >= self.limit
+
+    def push(self, request, tags, now):
+        deadline = tag_time(tags, "deadline")
+        if deadline is None:
+            deadline = now + self.timeout
+        heapq.heappush(self.heap, (deadline, next(self.order), request))
+        return deadline
+
+    def pop(self):
+        # The request with the earliest deadline, None when nothing is pending
+        if not self.heap:
+            return None
+        return heapq.heappop(self.heap)[2]
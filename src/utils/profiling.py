@@ -0,0 +1,182 @@
+import cProfile
+import io
+import os
+import pstats
+import sys
+import threading
+import time
+import tracemalloc
+from collections import Counter
+from src.config import PROFILE_DIR, PROFILE_SAMPLE_INTERVAL
+
+# cProfile only covers every thread once it is built on sys.monitoring (3.12+); before that it
+# would see nothing but the control thread that started it
+DETERMINISTIC_ALL_THREADS = sys.version_info >= (3, 12)
+
+
+class SamplingProfiler:
+    """
+    Samples the stacks of every thread with sys._current_frames on a background thread.
+    Results are folded stacks (`thread;outer;...;inner count`), the input format of flame graph tools.
+    """
+    def __init__(self, interval):
+        self.interval = interval
+        self.samples = Counter()
+        self.sample_count = 0
+        self.stop_event = threading.Event()
+        self.thread = threading.Thread(target=self.run, name="SamplingProfiler", daemon=True)
+
+    def start(self):
+        self.thread.start()
+
+    def run(self):
+        own_id = threading.get_ident()
+        while not self.stop_event.wait(self.interval):
+            names = {thread.ident: thread.name for thread in threading.enumerate()}
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id == own_id:
+                    continue
+                stack = []
+                while frame is not None:
+                    code = frame.f_code
+                    stack.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{frame.f_lineno})")
+                    frame = frame.f_back
+                stack.append(names.get(thread_id, str(thread_id)))
+                self.samples[";".join(reversed(stack))] += 1
+            self.sample_count += 1
+
+    def stop(self, path):
+        self.stop_event.set()
+        self.thread.join()
+        with open(path, "w") as file:
+            for stack, count in self.samples.most_common():
+                file.write(f"{stack} {count}\n")
+        # Leaf frames by sample count, the quick answer to "where is the CPU going"
+        leaves = Counter()
+        for stack, count in self.samples.items():
+            leaves[stack.rsplit(";", 1)[-1]] += count
+        lines = [f"{self.sample_count} samples every {self.interval * 1000:g} ms written to {path}"]
+        lines += [f"{count:>8}  {leaf}" for leaf, count in leaves.most_common(15)]
+        return "\n".join(lines)
+
+
+class Profiler:
+    """
+    On-demand profiling for a running process, driven through its ControlService:
+    a sampling or cProfile run across all threads, and tracemalloc snapshots with diffs.
+    Results are dumped under PROFILE_DIR as `<name>-<pid>-<time>-<n>.<ext>`.
+    """
+    def __init__(self, name, profile_dir=PROFILE_DIR):
+        self.name = name
+        self.profile_dir = profile_dir
+        self.lock = threading.Lock()
+        self.mode = None
+        self.active = None
+        self.last_snapshot = None
+        self.dumps = 0
+
+    def output_path(self, extension):
+        os.makedirs(self.profile_dir, exist_ok=True)
+        stamp = time.strftime("%Y%m%d-%H%M%S")
+        self.dumps += 1
+        return os.path.join(self.profile_dir, f"{self.name}-{os.getpid()}-{stamp}-{self.dumps}.{extension}")
+
+    def start(self, mode="sampling", interval_ms=None):
+        with self.lock:
+            if self.active is not None:
+                return f"error {self.mode} profiler already running"
+            if mode == "sampling":
+                interval = (float(interval_ms) if interval_ms else PROFILE_SAMPLE_INTERVAL) / 1000
+                self.active = SamplingProfiler(interval)
+                self.active.start()
+            elif mode == "cprofile":
+                if not DETERMINISTIC_ALL_THREADS:
+                    return "error cprofile covers all threads only on Python 3.12+, use sampling"
+                self.active = cProfile.Profile()
+                self.active.enable()
+            else:
+                return f"error unknown profiler {mode}"
+            self.mode = mode
+            return f"ok {mode} profiler started"
+
+    def stop(self):
+        with self.lock:
+            if self.active is None:
+                return "error no profiler running"
+            profiler, mode = self.active, self.mode
+            self.active = self.mode = None
+        if mode == "sampling":
+            return profiler.stop(self.output_path("folded"))
+        profiler.disable()
+        path = self.output_path("prof")
+        profiler.dump_stats(path)
+        summary = io.StringIO()
+        pstats.Stats(profiler, stream=summary).sort_stats("cumulative").print_stats(15)
+        return f"written to {path}\n{summary.getvalue()}"
+
+    def status(self):
+        with self.lock:
+            profiling = f"{self.mode} profiler running" if self.active else "no profiler running"
+        memory = "tracemalloc tracing" if tracemalloc.is_tracing() else "tracemalloc off"
+        return f"{profiling}, {memory}"
+
+    def memory_start(self, frames=None):
+        if tracemalloc.is_tracing():
+            return "error tracemalloc already tracing"
+        tracemalloc.start(int(frames) if frames else 1)
+        self.last_snapshot = None
+        return "ok tracemalloc started"
+
+    def memory_snapshot(self, limit=None):
+        # Dumps a snapshot and reports the top allocations, or the growth since the previous one
+        if not tracemalloc.is_tracing():
+            return "error tracemalloc is not tracing"
+        snapshot = tracemalloc.take_snapshot().filter_traces([
+            tracemalloc.Filter(False, tracemalloc.__file__),
+            tracemalloc.Filter(False, "<frozen importlib._bootstrap>"),
+        ])
+        path = self.output_path("snapshot")
+        snapshot.dump(path)
+        limit = int(limit) if limit else 15
+        if self.last_snapshot is None:
+            header = f"snapshot written to {path}, top allocations"
+            stats = snapshot.statistics("lineno")[:limit]
+        else:
+            header = f"snapshot written to {path}, growth since previous snapshot"
+            stats = snapshot.compare_to(self.last_snapshot, "lineno")[:limit]
+        self.last_snapshot = snapshot
+        current, peak = tracemalloc.get_traced_memory()
+        lines = [header, f"traced {current / 2**20:.1f} MiB, peak {peak / 2**20:.1f} MiB"]
+        lines += [str(stat) for stat in stats]
+        return "\n".join(lines)
+
+    def memory_stop(self):
+        if not tracemalloc.is_tracing():
+            return "error tracemalloc is not tracing"
+        tracemalloc.stop()
+        self.last_snapshot = None
+        return "ok tracemalloc stopped"
+
+    def handle_profile(self, args):
+        command = args[0] if args else "status"
+        if command == "start":
+            return self.start(*args[1:3])
+        if command == "stop":
+            return self.stop()
+        if command == "status":
+            return self.status()
+        return "error usage: profile start [sampling|cprofile] [interval_ms] | stop | status"
+
+    def handle_memory(self, args):
+        command = args[0] if args else ""
+        if command == "start":
+            return self.memory_start(*args[1:2])
+        if command == "snapshot":
+            return self.memory_snapshot(*args[1:2])
+        if command == "stop":
+            return self.memory_stop()
+        return "error usage: memory start [frames] | snapshot [limit] | stop"
+
+    def register(self, control_service):
+        control_service.register("profile", self.handle_profile)
+        control_service.register("memory", self.handle_memory)
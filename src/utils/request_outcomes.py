@@ -0,0 +1,58 @@
+from collections import OrderedDict
+from threading import Lock
+from src.config import REQUEST_DEDUP_SIZE, REQUEST_DEDUP_TTL
+
+
+class RequestOutcomes:
+    """
+    The reply each user request got, by its request id. A repeat of the request (a retry after a
+    lost reply, a user failing over to the backup) gets the original reply from here instead of a
+    second match and, worse, a second taxi. Only final replies are kept (an assignment or
+    no_taxi_available); busy and expired replies invite a retry. Outcomes expire after
+    REQUEST_DEDUP_TTL seconds, and beyond REQUEST_DEDUP_SIZE the oldest are evicted first.
+    """
+    def __init__(self, metrics, capacity=REQUEST_DEDUP_SIZE, ttl=REQUEST_DEDUP_TTL):
+        self.metrics = metrics
+        self.capacity = capacity
+        self.ttl = ttl
+        self.lock = Lock()
+        self.outcomes = OrderedDict()  # request_id -> (reply, recorded_at), oldest first
+
+    def expire(self, now):
+        # Caller holds self.lock
+        while self.outcomes:
+            request_id, (_, recorded_at) = next(iter(self.outcomes.items()))
+            if now - recorded_at < self.ttl and len(self.outcomes) <= self.capacity:
+                break
+            self.outcomes.popitem(last=False)
+
+    def get(self, request_id, now):
+        if not request_id:
+            return None
+        with self.lock:
+            self.expire(now)
+            outcome = self.outcomes.get(request_id)
+        if outcome is None:
+            return None
+        self.metrics.inc("user_requests.repeated")
+        return outcome[0]
+
+    def record(self, request_id, reply, now):
+        if not request_id:
+            return
+        with self.lock:
+            self.outcomes.pop(request_id, None)
+            self.outcomes[request_id] = (reply, now)
+            self.expire(now)
+
+    def restore(self, assignments, now):
+        # (request_id, taxi_id, assigned_at) rows, oldest first, as DatabaseHandler.get_recent_assignments returns them
+        with self.lock:
+            for request_id, taxi_id, assigned_at in assignments:
+                if request_id not in self.outcomes:
+                    self.outcomes[request_id] = (f"assign_taxi {taxi_id}", assigned_at)
+            self.expire(now)
+            return len(self.outcomes)
+
+    def __len__(self):
+        return len(self.outcomes)
@@ -1,33 +1,223 @@
+import atexit
+import json
+import os
+import queue
+import sys
+import time
+from threading import Lock, Thread
 from rich.console import Console
+from rich.errors import MarkupError
 from rich.table import Table
 from rich.live import Live
+from rich.text import Text
+from src.config import (
+    LOG_LEVEL,
+    LOG_QUEUE_SIZE,
+    LOG_RATE_LIMIT,
+    LOG_RATE_BURST,
+    LOG_SUPPRESSION_REPORT,
+    LOG_JSON_PATH,
+)
 
-class RichConsoleUtils:
-    def __init__(self):
+# print() level -> (name, style); severities below order them for filtering
+LEVELS = {
+    1: ("INFO", "bold blue"),
+    2: ("WARNING", "bold yellow"),
+    3: ("ERROR", "bold red"),
+    4: ("SUCCESS", "bold green"),
+}
+SEVERITY = {"INFO": 10, "SUCCESS": 20, "WARNING": 30, "ERROR": 40}
+
+FLEET_COLUMNS = ["Taxi ID", "Position X", "Position Y", "Speed", "Status", "Connected"]
+
+
+class LogWriter:
+    """
+    One per process. Callers only filter, rate-limit and enqueue; a daemon thread does the
+    Rich markup parsing and the terminal (or JSON-lines) writes. A full queue drops the message
+    and counts it instead of blocking the handler that logged it.
+    Rate limits are per call site (file and line), a token bucket of `rate` messages per second
+    with `burst` headroom; suppressed messages are counted and reported with the next message
+    from that site, or in a summary every `report_interval` seconds.
+    """
+    def __init__(self, level=LOG_LEVEL, queue_size=LOG_QUEUE_SIZE, rate=LOG_RATE_LIMIT,
+                 burst=LOG_RATE_BURST, report_interval=LOG_SUPPRESSION_REPORT, json_path=LOG_JSON_PATH):
         self.console = Console()
+        self.set_level(level)
+        self.queue = queue.Queue(queue_size)
+        self.rate = rate
+        self.burst = burst
+        self.report_interval = report_interval
+        self.json_path = json_path
+        self.json_file = None
+        self.lock = Lock()
+        self.buckets = {}  # call site -> [tokens, last refill, suppressed since last emitted]
+        self.dropped = 0
+        self.dropped_reported = 0
+        self.suppressed = 0
+        self.thread = None
 
-    def print(self, message, level=1, show_level=False, end="\n"):
-        levels = {
-            1: ("INFO", "bold blue"),
-            2: ("WARNING", "bold yellow"),
-            3: ("ERROR", "bold red"),
-            4: ("SUCCESS", "bold green"),
-        }
+    def set_level(self, level):
+        level = str(level).upper()
+        if level not in SEVERITY:
+            raise ValueError(f"Unknown log level {level}, expected one of {', '.join(SEVERITY)}")
+        self.level = level
+        self.min_severity = SEVERITY[level]
+
+    def allow(self, site):
+        # Token bucket per call site; returns None when suppressed, else the count to report
+        now = time.monotonic()
+        with self.lock:
+            bucket = self.buckets.get(site)
+            if bucket is None:
+                bucket = self.buckets[site] = [self.burst, now, 0]
+            else:
+                bucket[0] = min(self.burst, bucket[0] + (now - bucket[1]) * self.rate)
+                bucket[1] = now
+            if bucket[0] < 1:
+                bucket[2] += 1
+                self.suppressed += 1
+                return None
+            bucket[0] -= 1
+            suppressed, bucket[2] = bucket[2], 0
+            return suppressed
+
+    def submit(self, record):
+        with self.lock:
+            if self.thread is None:
+                self.thread = Thread(target=self.run, name="LogWriter", daemon=True)
+                self.thread.start()
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            with self.lock:
+                self.dropped += 1
 
-        level_text, color = levels.get(level, ("INFO", "bold blue"))
+    def run(self):
+        next_report = time.monotonic() + self.report_interval
+        while True:
+            try:
+                record = self.queue.get(timeout=self.report_interval)
+            except queue.Empty:
+                record = None
+            try:
+                if record is not None:
+                    self.write(*record)
+                if time.monotonic() >= next_report:
+                    self.report_suppressed()
+                    next_report = time.monotonic() + self.report_interval
+            except Exception as e:
+                # Never let one bad message kill the writer
+                sys.stderr.write(f"Log writer error: {e}\n")
+            finally:
+                if record is not None:
+                    self.queue.task_done()
 
+    def report_suppressed(self):
+        # Summary for call sites that went quiet while rate limited, plus queue overflows
+        with self.lock:
+            pending = [(site, bucket[2]) for site, bucket in self.buckets.items() if bucket[2]]
+            for site, _ in pending:
+                self.buckets[site][2] = 0
+            dropped, self.dropped_reported = self.dropped - self.dropped_reported, self.dropped
+        for (filename, lineno), count in pending:
+            self.write(time.time(), 2, f"Suppressed {count} messages from {os.path.basename(filename)}:{lineno}", True, "\n", 0)
+        if dropped:
+            self.write(time.time(), 2, f"Dropped {dropped} messages, log queue full", True, "\n", 0)
+
+    def write(self, timestamp, level, message, show_level, end, suppressed):
+        level_text, color = LEVELS.get(level, LEVELS[1])
+        if suppressed:
+            message = f"{message} ({suppressed} similar messages suppressed)"
+        if self.json_path:
+            self.write_json(timestamp, level_text, message, suppressed)
+            return
         if show_level:
             formatted_message = f"[{color}]{level_text}:[/{color}] {message}"
         else:
             formatted_message = f"[{color}]{message}[/{color}]"
+        try:
+            self.console.print(formatted_message, end=end, highlight=False)
+        except MarkupError:
+            # Brackets in the message itself; print it as plain text
+            self.console.print(Text(message, style=color), end=end, highlight=False)
 
-        self.console.print(formatted_message, end=end, highlight=False)
-        """
-        if end == "\r":
-            self.console.print(formatted_message, end="", highlight=False)
-            self.console.print(end, end="", highlight=False)
-        else:
-            self.console.print(formatted_message, end=end, highlight=False)"""
+    def write_json(self, timestamp, level_text, message, suppressed):
+        if self.json_file is None:
+            self.json_file = sys.stdout if self.json_path == "-" else open(self.json_path, "a", buffering=1)
+        try:
+            message = Text.from_markup(message).plain
+        except MarkupError:
+            pass
+        record = {"time": round(timestamp, 6), "level": level_text, "pid": os.getpid(), "message": message}
+        if suppressed:
+            record["suppressed"] = suppressed
+        self.json_file.write(json.dumps(record) + "\n")
+
+    def flush(self, timeout=2.0):
+        # Waits (bounded) for queued messages to be written, e.g. before os._exit
+        deadline = time.monotonic() + timeout
+        while self.queue.unfinished_tasks and self.thread and self.thread.is_alive():
+            if time.monotonic() >= deadline:
+                return False
+            time.sleep(0.01)
+        if self.json_file:
+            self.json_file.flush()
+        return True
+
+    def stats(self):
+        with self.lock:
+            return {
+                "level": self.level,
+                "queued": self.queue.qsize(),
+                "dropped": self.dropped,
+                "suppressed": self.suppressed,
+                "sink": self.json_path or "console",
+            }
+
+    def handle_log(self, args):
+        # Control channel command: `log` for counters, `log level <LEVEL>` to change the filter
+        if args[:1] == ["level"] and len(args) == 2:
+            self.set_level(args[1])
+            return f"ok log level {self.level}"
+        if args:
+            return "error usage: log [level INFO|SUCCESS|WARNING|ERROR]"
+        return " ".join(f"{key}={value}" for key, value in self.stats().items())
+
+
+_writer = None
+_writer_lock = Lock()
+
+
+def log_writer():
+    global _writer
+    with _writer_lock:
+        if _writer is None:
+            _writer = LogWriter()
+            atexit.register(_writer.flush)
+        return _writer
+
+
+class RichConsoleUtils:
+    def __init__(self, writer=None):
+        # Every instance in a process shares one writer and console, so output stays ordered
+        # and a Live display sees all prints
+        self.writer = writer or log_writer()
+        self.console = self.writer.console
+
+    def print(self, message, level=1, show_level=False, end="\n"):
+        writer = self.writer
+        # Filter before anything else is done with the message
+        if SEVERITY[LEVELS.get(level, LEVELS[1])[0]] < writer.min_severity:
+            return
+        caller = sys._getframe(1)
+        suppressed = writer.allow((caller.f_code.co_filename, caller.f_lineno))
+        if suppressed is None:
+            return
+        writer.submit((time.time(), level, message, show_level, end, suppressed))
+
+    def flush(self, timeout=2.0):
+        return self.writer.flush(timeout)
 
     def create_table(self, title, columns, styles=None):
         table = Table(title=title)
@@ -57,6 +247,24 @@ class RichConsoleUtils:
 
         return table
 
+    def generate_fleet_table(self, rows, title="Taxi Positions", caption=None):
+        # rows are (taxi_id, pos_x, pos_y, speed, status, connected), as in fleet snapshots
+        taxi_data = []
+        for taxi_id, pos_x, pos_y, speed, status, connected in rows:
+            status_lower = str(status).lower()
+            if status_lower == "available":
+                status_str = "[light_green]Available[/light_green]"
+            elif status_lower == "unavailable":
+                status_str = "[red]Unavailable[/red]"
+            else:
+                status_str = f"[yellow]{status}[/yellow]"
+            connected_str = "[light_green]True[/light_green]" if connected else "[red]False[/red]"
+            taxi_data.append([str(taxi_id), str(pos_x), str(pos_y), str(speed), status_str, connected_str])
+
+        table = self.generate_table(title, FLEET_COLUMNS, taxi_data)
+        table.caption = caption
+        return table
+
     def update_live_table(self, table, data, live_display):
         table.rows.clear()
 
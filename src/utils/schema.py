@@ -0,0 +1,198 @@
+from src.models.taxi_model import TAXI_STATUS_AVAILABLE, TAXI_STATUS_UNAVAILABLE
+from src.utils.db_handler import WRITE_STATEMENTS, HOT_QUERIES
+
+# Tables in creation order; keys beyond the primary key are in INDEXES, so one list serves
+# fresh databases and migrations alike
+TABLES = {
+    "taxis": """
+        CREATE TABLE IF NOT EXISTS taxis (
+            taxi_id INT NOT NULL PRIMARY KEY,
+            pos_x INT NOT NULL,
+            pos_y INT NOT NULL,
+            speed TINYINT UNSIGNED NOT NULL,
+            status TINYINT UNSIGNED NOT NULL DEFAULT 1,
+            connected BOOLEAN NOT NULL DEFAULT TRUE,
+            stopped BOOLEAN NOT NULL DEFAULT FALSE,
+            initial_pos_x INT NOT NULL,
+            initial_pos_y INT NOT NULL,
+            last_updated TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP
+        )
+        """,
+    "users": """
+        CREATE TABLE IF NOT EXISTS users (
+            user_id INT NOT NULL PRIMARY KEY,
+            pos_x INT NOT NULL,
+            pos_y INT NOT NULL,
+            waiting_time INT NOT NULL,
+            request_time TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+        """,
+    "assignments": """
+        CREATE TABLE IF NOT EXISTS assignments (
+            assignment_id INT NOT NULL AUTO_INCREMENT PRIMARY KEY,
+            user_id INT NOT NULL,
+            taxi_id INT NOT NULL,
+            assignment_time TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            status VARCHAR(20) NOT NULL,
+            request_id VARCHAR(32) NULL
+        )
+        """,
+    "heartbeat": """
+        CREATE TABLE IF NOT EXISTS heartbeat (
+            heartbeat_id INT NOT NULL AUTO_INCREMENT PRIMARY KEY,
+            taxi_id INT NOT NULL,
+            timestamp TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+        """,
+    "heartbeat_rollup": """
+        CREATE TABLE IF NOT EXISTS heartbeat_rollup (
+            taxi_id INT NOT NULL,
+            bucket_start DOUBLE NOT NULL,
+            bucket_seconds INT NOT NULL,
+            beats INT NOT NULL,
+            first_seen DOUBLE NOT NULL,
+            last_seen DOUBLE NOT NULL,
+            gaps INT NOT NULL,
+            max_gap DOUBLE NOT NULL,
+            PRIMARY KEY (taxi_id, bucket_start, bucket_seconds)
+        )
+        """,
+}
+
+# (table, index, columns, unique)
+INDEXES = [
+    # Covers get_available_taxis: InnoDB appends the primary key, so the scan never reads a row
+    ("taxis", "taxis_available", ("status", "connected", "pos_x", "pos_y", "speed"), False),
+    # ON DUPLICATE KEY UPDATE targets: one assignment per user, one heartbeat row per taxi
+    ("assignments", "assignments_user", ("user_id",), True),
+    ("assignments", "assignments_taxi", ("taxi_id",), False),
+    # Rebuilding the request dedup cache reads the assignments of the last REQUEST_DEDUP_TTL seconds
+    ("assignments", "assignments_recent", ("assignment_time",), False),
+    ("heartbeat", "heartbeat_taxi", ("taxi_id",), True),
+    # Compaction and retention scan by bucket size and age
+    ("heartbeat_rollup", "heartbeat_rollup_age", ("bucket_seconds", "bucket_start"), False),
+]
+
+# Unique indexes over tables that older schemas let fill with duplicates (no key made their
+# ON DUPLICATE KEY UPDATE fire): the statement keeping only the latest row per key, run first
+DEDUPLICATE = {
+    "assignments_user": """
+        DELETE FROM assignments WHERE assignment_id NOT IN (
+            SELECT assignment_id FROM (SELECT MAX(assignment_id) AS assignment_id FROM assignments GROUP BY user_id) AS latest
+        )
+        """,
+    "heartbeat_taxi": """
+        DELETE FROM heartbeat WHERE heartbeat_id NOT IN (
+            SELECT heartbeat_id FROM (SELECT MAX(heartbeat_id) AS heartbeat_id FROM heartbeat GROUP BY taxi_id) AS latest
+        )
+        """,
+}
+
+# The index each hot query must use, with sample parameters for EXPLAIN. "covering" also
+# requires the plan to be answered from the index alone (Extra: Using index)
+QUERY_PLANS = [
+    ("get_available_taxis", HOT_QUERIES["get_available_taxis"], (TAXI_STATUS_AVAILABLE, True), "taxis_available", "covering"),
+    ("taxi_exists", HOT_QUERIES["taxi_exists"], (1,), "PRIMARY", None),
+    ("get_taxi_by_id", HOT_QUERIES["get_taxi_by_id"], (1,), "PRIMARY", None),
+    ("reserve_taxi", HOT_QUERIES["reserve_taxi"], (TAXI_STATUS_UNAVAILABLE, False, 1, TAXI_STATUS_AVAILABLE, True), "PRIMARY", None),
+    ("update_taxi_position", WRITE_STATEMENTS["update_taxi_position"][0], (0, 0, 1), "PRIMARY", None),
+    ("set_taxi_status", WRITE_STATEMENTS["set_taxi_status"][0], (TAXI_STATUS_AVAILABLE, 1), "PRIMARY", None),
+    ("get_heartbeat_history", HOT_QUERIES["get_heartbeat_history"], (1, 0.0), "PRIMARY", None),
+    ("compacted_heartbeat_rollups", HOT_QUERIES["compacted_heartbeat_rollups"], (3600, 0.0), "heartbeat_rollup_age", None),
+    ("expired_heartbeat_rollups", HOT_QUERIES["expired_heartbeat_rollups"], (3600, 0.0), "heartbeat_rollup_age", None),
+    ("recent_assignments", HOT_QUERIES["recent_assignments"], (2147483647,), "assignments_recent", None),
+]
+
+
+def column_type(cursor, table, column):
+    cursor.execute(
+        "SELECT DATA_TYPE FROM information_schema.COLUMNS WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = %s AND COLUMN_NAME = %s",
+        (table, column),
+    )
+    row = cursor.fetchone()
+    return row[0].lower() if row else None
+
+
+def existing_indexes(cursor, table):
+    cursor.execute(
+        "SELECT DISTINCT INDEX_NAME FROM information_schema.STATISTICS WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = %s",
+        (table,),
+    )
+    return {row[0] for row in cursor.fetchall()}
+
+
+def migrate(db_handler):
+    """
+    Brings the database to the schema above and returns (steps taken, steps failed), both []
+    when it was already there. Every step checks information_schema first, so running it on
+    each dispatcher start is cheap. Duplicates that older schemas allowed are removed before a
+    unique index is added, keeping the latest row, and each index is added on its own, so one
+    that fails is reported and the rest are still added.
+    """
+    cursor = db_handler.get_cursor()
+    connection = db_handler.get_connection()
+    steps = []
+    cursor.execute("SHOW TABLES")
+    existing = {row[0] for row in cursor.fetchall()}
+    for table, statement in TABLES.items():
+        if table not in existing:
+            cursor.execute(statement)
+            steps.append(f"created {table}")
+
+    # Taxi status as a one-byte code (src.models.taxi_model) instead of 'available'/'unavailable'
+    if column_type(cursor, "taxis", "status") != "tinyint":
+        cursor.execute(
+            "UPDATE taxis SET status = CASE status WHEN 'available' THEN %s ELSE %s END",
+            (str(TAXI_STATUS_AVAILABLE), str(TAXI_STATUS_UNAVAILABLE)),
+        )
+        cursor.execute("ALTER TABLE taxis MODIFY status TINYINT UNSIGNED NOT NULL DEFAULT 1")
+        connection.commit()
+        steps.append("encoded taxis.status as integers")
+
+    # Assignments remember the user request they answered (request dedup)
+    if column_type(cursor, "assignments", "request_id") is None:
+        cursor.execute("ALTER TABLE assignments ADD COLUMN request_id VARCHAR(32) NULL")
+        steps.append("added assignments.request_id")
+
+    failures = []
+    for table, index, columns, unique in INDEXES:
+        if index in existing_indexes(cursor, table):
+            continue
+        try:
+            if index in DEDUPLICATE:
+                cursor.execute(DEDUPLICATE[index])
+                if cursor.rowcount > 0:
+                    steps.append(f"removed {cursor.rowcount} duplicate rows from {table}")
+                connection.commit()
+            kind = "UNIQUE INDEX" if unique else "INDEX"
+            cursor.execute(f"ALTER TABLE {table} ADD {kind} {index} ({', '.join(columns)})")
+            steps.append(f"added {index} on {table}")
+        except Exception as e:
+            connection.rollback()
+            failures.append(f"could not add {index} on {table}: {e}")
+    return steps, failures
+
+
+def explain(cursor, query, parameters):
+    # EXPLAIN rows as dicts; only the first table of the plan matters for these single-table queries
+    cursor.execute(f"EXPLAIN {query}", parameters)
+    columns = [description[0] for description in cursor.description]
+    return [dict(zip(columns, row)) for row in cursor.fetchall()]
+
+
+def check_query_plans(db_handler):
+    """
+    EXPLAINs every query in QUERY_PLANS and returns (name, ok, detail) per query. On a nearly
+    empty table the optimizer may prefer a full scan to any index, so check a populated database.
+    """
+    cursor = db_handler.get_cursor()
+    results = []
+    for name, query, parameters, index, requirement in QUERY_PLANS:
+        plan = explain(cursor, query, parameters)[0]
+        key = plan.get("key")
+        extra = plan.get("Extra") or ""
+        ok = key == index and (requirement != "covering" or "Using index" in extra)
+        detail = f"key={key} type={plan.get('type')} rows={plan.get('rows')} extra={extra or '-'} (expected {index}"
+        detail += ", covering)" if requirement == "covering" else ")"
+        results.append((name, ok, detail))
+    return results
@@ -0,0 +1,48 @@
+class SlotMap:
+    """
+    Maps arbitrary taxi ids onto dense slots 0..n-1 for array-backed fleet storage.
+    Released slots are reused before new ones are handed out, so the arrays stay as
+    short as the largest fleet seen rather than growing with every id ever connected.
+    """
+    __slots__ = ("slots", "ids", "free")
+
+    def __init__(self):
+        self.slots = {}  # taxi_id -> slot
+        self.ids = []    # slot -> taxi_id, None while the slot is free
+        self.free = []
+
+    def __len__(self):
+        return len(self.slots)
+
+    def __contains__(self, taxi_id):
+        return taxi_id in self.slots
+
+    @property
+    def high_water(self):
+        return len(self.ids)
+
+    def get(self, taxi_id):
+        return self.slots.get(taxi_id)
+
+    def slot_for(self, taxi_id):
+        slot = self.slots.get(taxi_id)
+        if slot is not None:
+            return slot
+        if self.free:
+            slot = self.free.pop()
+            self.ids[slot] = taxi_id
+        else:
+            slot = len(self.ids)
+            self.ids.append(taxi_id)
+        self.slots[taxi_id] = slot
+        return slot
+
+    def release(self, taxi_id):
+        slot = self.slots.pop(taxi_id, None)
+        if slot is not None:
+            self.ids[slot] = None
+            self.free.append(slot)
+        return slot
+
+    def taxi_id_at(self, slot):
+        return self.ids[slot] if slot < len(self.ids) else None
@@ -0,0 +1,362 @@
+import glob
+import os
+import struct
+import time
+import numpy as np
+from threading import Lock
+from src.config import STATE_DIR, STATE_SNAPSHOT_INTERVAL
+from src.models.taxi_model import encode_status, decode_status, TAXI_STATUS_AVAILABLE, TAXI_STATUS_UNAVAILABLE
+from src.utils.slot_map import SlotMap
+
+# Snapshot layout: header, then the fleet, active rides and pending requests as packed arrays
+SNAPSHOT_HEADER = np.dtype([
+    ("magic", "<u4"),
+    ("version", "<u4"),
+    ("generation", "<u8"),  # Journals from this generation on are not in the snapshot
+    ("taxis", "<u8"),
+    ("rides", "<u8"),
+    ("requests", "<u8"),
+    ("taken_at", "<f8"),
+])
+STATE_TAXI = np.dtype([
+    ("taxi_id", "<i8"),
+    ("pos_x", "<i4"),
+    ("pos_y", "<i4"),
+    ("initial_x", "<i4"),
+    ("initial_y", "<i4"),
+    ("speed", "u1"),
+    ("status", "u1"),
+    ("connected", "u1"),
+    ("updated_at", "<f8"),
+])
+STATE_RIDE = np.dtype([("user_id", "<i8"), ("taxi_id", "<i8"), ("assigned_at", "<f8")])
+STATE_REQUEST = np.dtype([("user_id", "<i8"), ("pos_x", "<i4"), ("pos_y", "<i4"), ("received_at", "<f8")])
+SNAPSHOT_MAGIC = 0x49584154  # "TAXI"
+SNAPSHOT_VERSION = 1
+
+# Journal entries are fixed width: written with struct, replayed in bulk with NumPy
+JOURNAL_ENTRY = struct.Struct("<BBqqiid")
+JOURNAL_RECORD = np.dtype([
+    ("op", "u1"),
+    ("flag", "u1"),  # status code or connected
+    ("key", "<i8"),  # taxi_id, or user_id for request and ride entries
+    ("other", "<i8"),  # speed, or taxi_id for ride entries
+    ("pos_x", "<i4"),
+    ("pos_y", "<i4"),
+    ("time", "<f8"),
+])
+assert JOURNAL_RECORD.itemsize == JOURNAL_ENTRY.size
+
+OP_TAXI_CONNECT = 1
+OP_TAXI_POSITION = 2
+OP_TAXI_STATUS = 3
+OP_TAXI_CONNECTED = 4
+OP_REQUEST = 5
+OP_REQUEST_DROPPED = 6
+OP_RIDE_ASSIGNED = 7
+OP_RIDE_FINISHED = 8
+OP_RIDE_DROPPED = 9
+
+
+class StateStore:
+    """
+    The dispatcher's own copy of its fleet, active rides and pending requests, kept on local
+    disk as a periodic snapshot plus an append-only journal of the changes since. On restart
+    the snapshot is memory-mapped and the journal replayed, instead of rebuilding from MySQL.
+
+    Journal entries reach the OS on every change, so they survive a crash of the process;
+    they are fsynced with each snapshot (every STATE_SNAPSHOT_INTERVAL).
+    """
+    def __init__(self, directory=STATE_DIR, clock=None, capacity=1024):
+        self.directory = directory
+        self.clock = clock
+        self.lock = Lock()
+        self.slots = SlotMap()
+        self.fleet = np.zeros(capacity, dtype=STATE_TAXI)
+        self.rides = {}  # user_id -> (taxi_id, assigned_at)
+        self.requests = {}  # user_id -> (pos_x, pos_y, received_at)
+        self.generation = 0
+        self.journal = None
+        self.journaled = 0  # Entries since the last snapshot
+        self.written_at = None  # Wall time the restored files were last written, None when there were none
+
+    @property
+    def snapshot_path(self):
+        return os.path.join(self.directory, "snapshot.bin")
+
+    @property
+    def seeded_path(self):
+        return os.path.join(self.directory, "seeded")
+
+    @property
+    def seeded(self):
+        # True once a preload from MySQL completed; without it the state may be a partial fleet
+        return os.path.exists(self.seeded_path)
+
+    def mark_seeded(self):
+        with open(self.seeded_path, "w") as file:
+            file.write(f"{time.time():.6f}\n")
+            file.flush()
+            os.fsync(file.fileno())
+
+    def journal_path(self, generation):
+        return os.path.join(self.directory, f"journal-{generation:08d}.bin")
+
+    def journal_generations(self):
+        paths = glob.glob(os.path.join(self.directory, "journal-*.bin"))
+        return sorted(int(os.path.basename(path)[8:16]) for path in paths)
+
+    def now(self):
+        return self.clock.time() if self.clock else time.time()
+
+    # -------------------------
+    # Restore
+    # -------------------------
+    def restore(self):
+        """Loads the last snapshot and replays the journals after it; returns the entries replayed."""
+        os.makedirs(self.directory, exist_ok=True)
+        with self.lock:
+            snapshot_generation = self.load_snapshot() if os.path.exists(self.snapshot_path) else 0
+            generations = [generation for generation in self.journal_generations() if generation >= snapshot_generation]
+            # Before the new journal exists: anything changed in MySQL since then is news to this store
+            paths = [self.journal_path(generation) for generation in generations]
+            if os.path.exists(self.snapshot_path):
+                paths.append(self.snapshot_path)
+            self.written_at = max((os.path.getmtime(path) for path in paths), default=None)
+            replayed = 0
+            for generation in generations:
+                path = self.journal_path(generation)
+                # A crash can leave half an entry at the end; replay whole entries only
+                count = os.path.getsize(path) // JOURNAL_RECORD.itemsize
+                for entry in np.fromfile(path, dtype=JOURNAL_RECORD, count=count).tolist():
+                    self.apply(*entry)
+                replayed += count
+            # Never append to a journal that may end in a torn entry
+            self.generation = max(generations + [snapshot_generation]) + 1
+            self.journal = open(self.journal_path(self.generation), "ab", buffering=0)
+            self.journaled = replayed
+        return replayed
+
+    def load_snapshot(self):
+        mapped = np.memmap(self.snapshot_path, dtype=np.uint8, mode="r")
+        header = np.frombuffer(mapped, dtype=SNAPSHOT_HEADER, count=1)[0]
+        if header["magic"] != SNAPSHOT_MAGIC or header["version"] != SNAPSHOT_VERSION:
+            raise ValueError(f"{self.snapshot_path} is not a version {SNAPSHOT_VERSION} dispatcher snapshot")
+        offset = SNAPSHOT_HEADER.itemsize
+        arrays = []
+        for dtype, count in ((STATE_TAXI, header["taxis"]), (STATE_RIDE, header["rides"]), (STATE_REQUEST, header["requests"])):
+            arrays.append(np.frombuffer(mapped, dtype=dtype, count=int(count), offset=offset))
+            offset += dtype.itemsize * int(count)
+        taxis, rides, requests = arrays
+
+        # The fleet is copied out of the mapping in one block; the id index is one dict build
+        self.fleet = np.zeros(max(len(taxis) * 2, 1024), dtype=STATE_TAXI)
+        self.fleet[:len(taxis)] = taxis
+        ids = taxis["taxi_id"].tolist()
+        self.slots = SlotMap()
+        self.slots.ids = ids
+        self.slots.slots = dict(zip(ids, range(len(ids))))
+        self.rides = {user_id: (taxi_id, assigned_at) for user_id, taxi_id, assigned_at in rides.tolist()}
+        self.requests = {user_id: (pos_x, pos_y, received_at) for user_id, pos_x, pos_y, received_at in requests.tolist()}
+        return int(header["generation"])
+
+    # -------------------------
+    # Changes
+    # -------------------------
+    def slot(self, taxi_id):
+        slot = self.slots.slot_for(taxi_id)
+        if slot >= len(self.fleet):
+            grown = np.zeros(len(self.fleet) * 2, dtype=STATE_TAXI)
+            grown[:len(self.fleet)] = self.fleet
+            self.fleet = grown
+        return slot
+
+    def apply(self, op, flag, key, other, pos_x, pos_y, timestamp):
+        # The one place state changes, for live changes and journal replay alike
+        if op == OP_TAXI_CONNECT:
+            new = key not in self.slots
+            slot = self.slot(key)
+            self.fleet[slot] = (
+                key, pos_x, pos_y,
+                pos_x if new else self.fleet["initial_x"][slot],
+                pos_y if new else self.fleet["initial_y"][slot],
+                other, flag, 1, timestamp,
+            )
+        elif op in (OP_TAXI_POSITION, OP_TAXI_STATUS, OP_TAXI_CONNECTED):
+            slot = self.slots.get(key)
+            if slot is None:
+                return
+            if op == OP_TAXI_POSITION:
+                self.fleet["pos_x"][slot] = pos_x
+                self.fleet["pos_y"][slot] = pos_y
+                self.fleet["updated_at"][slot] = timestamp
+            elif op == OP_TAXI_STATUS:
+                self.fleet["status"][slot] = flag
+            else:
+                self.fleet["connected"][slot] = flag
+        elif op == OP_REQUEST:
+            self.requests[key] = (pos_x, pos_y, timestamp)
+        elif op == OP_REQUEST_DROPPED:
+            self.requests.pop(key, None)
+        elif op == OP_RIDE_ASSIGNED:
+            self.requests.pop(key, None)
+            self.rides[key] = (other, timestamp)
+            slot = self.slots.get(other)
+            if slot is not None:
+                self.fleet["status"][slot] = TAXI_STATUS_UNAVAILABLE
+        elif op == OP_RIDE_DROPPED:
+            self.rides.pop(key, None)
+        elif op == OP_RIDE_FINISHED:
+            self.rides.pop(key, None)
+            slot = self.slots.get(other)
+            if slot is not None:
+                self.fleet["status"][slot] = TAXI_STATUS_AVAILABLE
+                self.fleet["pos_x"][slot] = pos_x
+                self.fleet["pos_y"][slot] = pos_y
+                self.fleet["updated_at"][slot] = timestamp
+
+    def record(self, op, key, other=0, pos_x=0, pos_y=0, flag=0):
+        timestamp = self.now()
+        with self.lock:
+            self.apply(op, flag, key, other, pos_x, pos_y, timestamp)
+            if self.journal:
+                self.journal.write(JOURNAL_ENTRY.pack(op, flag, key, other, pos_x, pos_y, timestamp))
+                self.journaled += 1
+
+    def taxi_connected(self, taxi_id, pos_x, pos_y, speed, status):
+        self.record(OP_TAXI_CONNECT, taxi_id, speed, pos_x, pos_y, encode_status(status))
+
+    def taxi_moved(self, taxi_id, pos_x, pos_y):
+        self.record(OP_TAXI_POSITION, taxi_id, 0, pos_x, pos_y)
+
+    def taxi_status(self, taxi_id, status):
+        self.record(OP_TAXI_STATUS, taxi_id, flag=encode_status(status))
+
+    def taxi_connection(self, taxi_id, connected):
+        # Every heartbeat reports this; only actual changes are journaled
+        slot = self.slots.get(taxi_id)
+        if slot is None or self.fleet["connected"][slot] == int(bool(connected)):
+            return
+        self.record(OP_TAXI_CONNECTED, taxi_id, flag=int(bool(connected)))
+
+    def request_received(self, user_id, pos_x, pos_y):
+        self.record(OP_REQUEST, user_id, 0, pos_x, pos_y)
+
+    def request_dropped(self, user_id):
+        self.record(OP_REQUEST_DROPPED, user_id)
+
+    def ride_assigned(self, user_id, taxi_id):
+        self.record(OP_RIDE_ASSIGNED, user_id, taxi_id)
+
+    def ride_finished(self, user_id, taxi_id, pos_x, pos_y):
+        self.record(OP_RIDE_FINISHED, user_id, taxi_id, pos_x, pos_y)
+
+    def ride_dropped(self, user_id):
+        # The ride is someone else's business now; its taxi keeps whatever status it has
+        self.record(OP_RIDE_DROPPED, user_id)
+
+    def reconcile(self, changed_taxis, ride_owners):
+        """
+        Brings restored state in line with MySQL, which another dispatcher (the backup, after a
+        failover) may have changed since this store was written. `changed_taxis` are rows shaped
+        like taxis() that changed in MySQL since `written_at`; they replace the local copies.
+        `ride_owners` maps each restored ride's taxi to (user_id of its latest assignment, status)
+        in MySQL. A ride is kept only while its taxi is still unavailable and assigned to the same
+        user; the others are dropped and their taxis take the MySQL status. Returns the rides dropped.
+        """
+        for taxi_id, pos_x, pos_y, speed, status, connected in changed_taxis:
+            self.taxi_connected(taxi_id, pos_x, pos_y, speed, status)
+            self.taxi_connection(taxi_id, connected)
+        dropped = 0
+        for user_id, (taxi_id, _) in self.active_rides().items():
+            owner, status = ride_owners.get(taxi_id, (None, "available"))
+            if owner == user_id and status == "unavailable":
+                continue
+            self.ride_dropped(user_id)
+            self.taxi_status(taxi_id, status)
+            dropped += 1
+        return dropped
+
+    # -------------------------
+    # Reads
+    # -------------------------
+    def taxis(self):
+        # (taxi_id, pos_x, pos_y, speed, status, connected) like DatabaseHandler.get_all_taxis
+        with self.lock:
+            fleet = self.fleet[:self.slots.high_water].copy()
+        return [
+            (taxi_id, pos_x, pos_y, speed, decode_status(status), bool(connected))
+            for taxi_id, pos_x, pos_y, speed, status, connected in zip(
+                fleet["taxi_id"].tolist(), fleet["pos_x"].tolist(), fleet["pos_y"].tolist(),
+                fleet["speed"].tolist(), fleet["status"].tolist(), fleet["connected"].tolist(),
+            )
+        ]
+
+    def active_rides(self):
+        with self.lock:
+            return dict(self.rides)
+
+    def pending_requests(self):
+        with self.lock:
+            return dict(self.requests)
+
+    # -------------------------
+    # Snapshots
+    # -------------------------
+    def snapshot(self):
+        """Writes the current state and starts a new journal generation; older journals are removed."""
+        with self.lock:
+            taxis = self.fleet[:self.slots.high_water].copy()
+            rides = np.array([(user_id, *ride) for user_id, ride in self.rides.items()], dtype=STATE_RIDE)
+            requests = np.array([(user_id, *request) for user_id, request in self.requests.items()], dtype=STATE_REQUEST)
+            self.generation += 1
+            generation = self.generation
+            if self.journal:
+                self.journal.close()
+            self.journal = open(self.journal_path(generation), "ab", buffering=0)
+            self.journaled = 0
+
+        header = np.array([(
+            SNAPSHOT_MAGIC, SNAPSHOT_VERSION, generation, len(taxis), len(rides), len(requests), time.time()
+        )], dtype=SNAPSHOT_HEADER)
+        temporary = self.snapshot_path + ".tmp"
+        with open(temporary, "wb") as file:
+            for array in (header, taxis, rides, requests):
+                file.write(array.tobytes())
+            file.flush()
+            os.fsync(file.fileno())
+        os.replace(temporary, self.snapshot_path)
+        for old in self.journal_generations():
+            if old < generation:
+                os.remove(self.journal_path(old))
+        return generation
+
+    def discard(self):
+        """Forgets everything, on disk too, and starts an empty journal; the next start seeds from MySQL again."""
+        with self.lock:
+            self.slots = SlotMap()
+            self.fleet = np.zeros(len(self.fleet), dtype=STATE_TAXI)
+            self.rides = {}
+            self.requests = {}
+            if self.journal:
+                self.journal.close()
+            for path in [self.seeded_path, self.snapshot_path] + [self.journal_path(old) for old in self.journal_generations()]:
+                if os.path.exists(path):
+                    os.remove(path)
+            self.generation += 1
+            self.journal = open(self.journal_path(self.generation), "ab", buffering=0)
+            self.journaled = 0
+
+    def serve(self, stop_event, interval=STATE_SNAPSHOT_INTERVAL):
+        while not stop_event.wait(interval):
+            if self.journaled:
+                self.snapshot()
+
+    def close(self):
+        # A final snapshot makes the next start a pure mapping, with nothing to replay
+        if self.journal:
+            if self.journaled:
+                self.snapshot()
+            with self.lock:
+                self.journal.close()
+                self.journal = None
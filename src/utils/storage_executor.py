@@ -0,0 +1,73 @@
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeout
+from threading import BoundedSemaphore
+from src.config import STORAGE_READ_WORKERS, STORAGE_READ_QUEUE_SIZE, STORAGE_TIMEOUTS, STORAGE_DEFAULT_TIMEOUT
+
+
+class StorageUnavailable(Exception):
+    """A storage call that was refused or did not finish in time; the caller degrades instead of waiting."""
+
+
+class StorageBusy(StorageUnavailable):
+    def __init__(self, name):
+        super().__init__(f"storage queue full for {name}")
+        self.name = name
+
+
+class StorageTimeout(StorageUnavailable):
+    # The call may still complete; `future` lets the caller compensate when it does
+    def __init__(self, name, future):
+        super().__init__(f"{name} did not complete in time")
+        self.name = name
+        self.future = future
+
+
+def storage_timeout(name):
+    return STORAGE_TIMEOUTS.get(name, STORAGE_DEFAULT_TIMEOUT)
+
+
+class StorageExecutor:
+    """
+    Runs blocking storage reads on a bounded pool, so a slow MySQL stalls the pool and not the
+    socket loops. At most STORAGE_READ_WORKERS calls run and STORAGE_READ_QUEUE_SIZE wait; beyond
+    that `call` raises StorageBusy at once. A caller waits at most the operation's STORAGE_TIMEOUTS
+    entry and then gets StorageTimeout. A timed-out call keeps its slot until MySQL answers, so a
+    latency spike fills the queue and turns into fast refusals rather than piling up threads.
+    """
+    def __init__(self, db_handler, metrics=None, workers=STORAGE_READ_WORKERS, queue_size=STORAGE_READ_QUEUE_SIZE):
+        self.db_handler = db_handler
+        self.metrics = metrics
+        self.pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="StorageReader")
+        self.slots = BoundedSemaphore(workers + queue_size)
+
+    def count(self, name):
+        if self.metrics:
+            self.metrics.inc(name)
+
+    def submit(self, name, *args):
+        if not self.slots.acquire(blocking=False):
+            self.count(f"storage.busy.{name}")
+            raise StorageBusy(name)
+        try:
+            return self.pool.submit(self.run, name, args)
+        except RuntimeError:
+            # Shut down
+            self.slots.release()
+            raise StorageBusy(name)
+
+    def run(self, name, args):
+        # The slot is free again before the caller sees the result
+        try:
+            return getattr(self.db_handler, name)(*args)
+        finally:
+            self.slots.release()
+
+    def call(self, name, *args, timeout=None):
+        future = self.submit(name, *args)
+        try:
+            return future.result(storage_timeout(name) if timeout is None else timeout)
+        except FutureTimeout:
+            self.count(f"storage.timeouts.{name}")
+            raise StorageTimeout(name, future)
+
+    def shutdown(self):
+        self.pool.shutdown(wait=False, cancel_futures=True)
@@ -0,0 +1,137 @@
+from collections import OrderedDict
+from threading import Lock
+from src.config import TAXI_CACHE_SIZE
+from src.models.taxi_model import encode_status, decode_status
+
+# Writes whose effect on a cached taxi row is known: the columns they set, from their arguments
+ROW_UPDATES = {
+    "update_taxi_position": lambda taxi_id, pos_x, pos_y: {"pos_x": pos_x, "pos_y": pos_y},
+    "set_taxi_status": lambda taxi_id, status: {"status": decode_status(encode_status(status))},
+    "update_taxi_connected_status": lambda taxi_id, connected: {"connected": int(bool(connected))},
+    "mark_taxi_available": lambda taxi_id: {"status": "available"},
+    "release_reservation": lambda taxi_id, user_id, request_id=None: {"status": "available", "connected": 1},
+}
+# Writes that change a taxi row in ways only the database knows: its cached row is dropped.
+# Maps the operation to the position of taxi_id in its arguments
+ROW_INVALIDATIONS = {"upsert_taxi_on_connect": 0, "add_taxi": 0, "assign_taxi_to_user": 1, "reserve_and_assign": 3}
+
+
+class CachedTaxiReads:
+    """
+    Wraps the DatabaseHandler so taxi_exists and get_taxi_by_id are served from memory: a set
+    of taxis known to exist (taxis are never deleted) and an LRU of up to TAXI_CACHE_SIZE rows.
+    Writes made through this handler, directly or in an execute_batch group, update or drop the
+    cached row once they return. A read that raced with a write is returned but not cached.
+    Other dispatchers' writes are not seen: call `invalidate` when a taxi changes hands.
+    Every other method passes through to the wrapped handler.
+    """
+    def __init__(self, target, metrics, capacity=TAXI_CACHE_SIZE):
+        self._target = target
+        self.metrics = metrics
+        self.capacity = capacity
+        self.lock = Lock()
+        self.known = set()
+        self.rows = OrderedDict()
+        self.generation = 0
+        self.written_at = {}  # taxi_id -> generation of its last write, so a read can tell it raced with one
+
+    def __getattr__(self, name):
+        attribute = getattr(self._target, name)
+        if name in ROW_UPDATES or name in ROW_INVALIDATIONS:
+            def write(*args, **kwargs):
+                try:
+                    return attribute(*args, **kwargs)
+                finally:
+                    self.written(name, args + tuple(kwargs.values()))
+            return write
+        return attribute
+
+    def knows(self, taxi_id):
+        # The half of taxi_exists that never blocks: False only means MySQL has to be asked
+        with self.lock:
+            if taxi_id in self.known:
+                self.metrics.inc("cache.taxi_exists.hits")
+                return True
+        return False
+
+    def taxi_exists(self, taxi_id):
+        if self.knows(taxi_id):
+            return True
+        self.metrics.inc("cache.taxi_exists.misses")
+        exists = self._target.taxi_exists(taxi_id)
+        if exists:
+            with self.lock:
+                self.known.add(taxi_id)
+        return exists
+
+    def get_taxi_by_id(self, taxi_id):
+        with self.lock:
+            row = self.rows.get(taxi_id)
+            if row is not None:
+                self.rows.move_to_end(taxi_id)
+                self.metrics.inc("cache.taxi_rows.hits")
+                return dict(row)
+            started = self.generation
+        self.metrics.inc("cache.taxi_rows.misses")
+        row = self._target.get_taxi_by_id(taxi_id)
+        if row is None:
+            return None
+        with self.lock:
+            self.known.add(taxi_id)
+            if self.written_at.get(taxi_id, 0) <= started:
+                self.rows[taxi_id] = dict(row)
+                if len(self.rows) > self.capacity:
+                    self.rows.popitem(last=False)
+                    self.metrics.inc("cache.taxi_rows.evictions")
+        return row
+
+    def execute_batch(self, operations):
+        try:
+            return self._target.execute_batch(operations)
+        finally:
+            for name, args in operations:
+                self.written(name, args)
+
+    def written(self, name, args):
+        # Runs after the write returned or failed: either way the database is the authority now
+        update = ROW_UPDATES.get(name)
+        if update is None and name not in ROW_INVALIDATIONS:
+            return
+        taxi_id = args[0] if update is not None else args[ROW_INVALIDATIONS[name]]
+        with self.lock:
+            self.generation += 1
+            self.written_at[taxi_id] = self.generation
+            if update is not None:
+                row = self.rows.get(taxi_id)
+                if row is not None:
+                    row.update(update(*args))
+                return
+            if name == "upsert_taxi_on_connect":
+                self.known.add(taxi_id)
+            if self.rows.pop(taxi_id, None) is not None:
+                self.metrics.inc("cache.taxi_rows.invalidations")
+
+    def remember_taxis(self, taxi_ids):
+        # Taxis the dispatcher loaded at start-up; their existence checks never reach MySQL
+        with self.lock:
+            self.known.update(taxi_ids)
+
+    def invalidate(self, taxi_id):
+        with self.lock:
+            self.generation += 1
+            self.written_at[taxi_id] = self.generation
+            self.rows.pop(taxi_id, None)
+
+    def stats(self, args=None):
+        counters = self.metrics.snapshot()["counters"]
+        lines = [f"known taxis {len(self.known)}, cached rows {len(self.rows)}/{self.capacity}"]
+        for name in ("taxi_exists", "taxi_rows"):
+            hits = counters.get(f"cache.{name}.hits", 0)
+            misses = counters.get(f"cache.{name}.misses", 0)
+            rate = hits / (hits + misses) * 100 if hits + misses else 0.0
+            lines.append(f"{name:<12} hits {hits} misses {misses} hit rate {rate:.1f}%")
+        lines.append(
+            f"{'':<12} evictions {counters.get('cache.taxi_rows.evictions', 0)} "
+            f"invalidations {counters.get('cache.taxi_rows.invalidations', 0)}"
+        )
+        return "\n".join(lines)
@@ -0,0 +1,142 @@
+import glob
+import json
+import os
+import time
+import uuid
+from threading import Lock
+from src.config import TRACE_ENABLED, TRACE_DIR
+
+
+def new_trace_id():
+    return uuid.uuid4().hex[:16]
+
+
+def split_tags(parts):
+    """
+    Separates trailing `key=value` tokens (trace=..., sent=...) from a message's positional
+    fields, so older senders without them still parse.
+    """
+    fields = []
+    tags = {}
+    for part in parts:
+        key, sep, value = part.partition("=")
+        if sep and key:
+            tags[key] = value
+        else:
+            fields.append(part)
+    return fields, tags
+
+
+def trace_tags(trace_id, sent=None):
+    # The tags a traced message carries; empty when there is nothing to trace
+    if not trace_id:
+        return ""
+    tags = f" trace={trace_id}"
+    if sent is not None:
+        tags += f" sent={sent:.6f}"
+    return tags
+
+
+class Tracer:
+    """
+    Appends spans as JSON lines to `<TRACE_DIR>/<service>-<pid>.jsonl`. One file per process
+    keeps writes append-only without cross-process locking; the analyzer merges them.
+    """
+    def __init__(self, service, trace_dir=TRACE_DIR, enabled=TRACE_ENABLED):
+        self.service = service
+        self.enabled = enabled
+        self.trace_dir = trace_dir
+        self.lock = Lock()
+        self.file = None  # Opened on the first span, so idle tracers leave no files behind
+
+    def span(self, trace_id, name, start, duration):
+        if not self.enabled or not trace_id:
+            return
+        record = json.dumps({
+            "trace": trace_id,
+            "service": self.service,
+            "span": name,
+            "start": round(start, 6),
+            "duration_ms": round(duration * 1000, 3),
+        })
+        with self.lock:
+            if not self.enabled:
+                return
+            if self.file is None:
+                os.makedirs(self.trace_dir, exist_ok=True)
+                path = os.path.join(self.trace_dir, f"{self.service}-{os.getpid()}.jsonl")
+                self.file = open(path, "a", buffering=1)
+            self.file.write(record + "\n")
+
+    def span_since(self, trace_id, name, sent, until=None):
+        # Span from a timestamp another process stamped on the message until `until` (now)
+        try:
+            sent = float(sent)
+        except (TypeError, ValueError):
+            return
+        if until is None:
+            until = time.time()
+        self.span(trace_id, name, sent, max(until - sent, 0.0))
+
+    def close(self):
+        with self.lock:
+            if self.file:
+                self.file.close()
+                self.file = None
+            self.enabled = False
+
+
+# -------------------------
+# Analysis
+# -------------------------
+def load_spans(trace_dir=TRACE_DIR):
+    spans = []
+    for path in sorted(glob.glob(os.path.join(trace_dir, "*.jsonl"))):
+        with open(path) as file:
+            for line in file:
+                try:
+                    spans.append(json.loads(line))
+                except json.JSONDecodeError:
+                    continue  # A line cut short by a crash
+    return spans
+
+
+def stage_breakdown(spans):
+    """Per span name: count, mean, p50, p90 and max duration in milliseconds, slowest mean first."""
+    durations = {}
+    for span in spans:
+        durations.setdefault(span["span"], []).append(span["duration_ms"])
+    rows = []
+    for name, values in durations.items():
+        values.sort()
+        rows.append({
+            "span": name,
+            "count": len(values),
+            "mean_ms": sum(values) / len(values),
+            "p50_ms": values[(len(values) - 1) // 2],
+            "p90_ms": values[min(int(len(values) * 0.9), len(values) - 1)],
+            "max_ms": values[-1],
+        })
+    return sorted(rows, key=lambda row: row["mean_ms"], reverse=True)
+
+
+def slowest_traces(spans, limit=10):
+    """
+    Traces ordered by end-to-end duration: the user's own span when there is one, otherwise
+    the extent of all its spans. Each comes back with its spans in start order.
+    """
+    traces = {}
+    for span in spans:
+        traces.setdefault(span["trace"], []).append(span)
+    summaries = []
+    for trace_id, trace_spans in traces.items():
+        trace_spans.sort(key=lambda span: span["start"])
+        user = [span for span in trace_spans if span["span"] == "user.response"]
+        if user:
+            total = user[0]["duration_ms"]
+        else:
+            end = max(span["start"] + span["duration_ms"] / 1000 for span in trace_spans)
+            total = (end - trace_spans[0]["start"]) * 1000
+        summaries.append((total, trace_id, trace_spans))
+    summaries.sort(key=lambda summary: summary[0], reverse=True)
+    return summaries[:limit]
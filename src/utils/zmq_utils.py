@@ -22,8 +22,10 @@ class ZMQUtils:
         self.heartbeat_pusher = None
         self.heartbeat_2_pusher = None
         self.heartbeat_responder = None
+        self.gateway_puller = None
         self.socket_ready = threading.Condition()
         self.socket_initialized = False
+        self.publish_lock = threading.Lock()
 
     def bind_pub_socket(self):
         self.publisher = self.context.socket(zmq.PUB)
@@ -76,8 +78,14 @@ class ZMQUtils:
         self.heartbeat_pusher.connect(f"tcp://{self.dispatcher_ip}:{self.heartbeat_2_port}")
         return self.heartbeat_pusher
     
-    def bind_rep_user_request_socket(self, port):
-        socket = self.context.socket(zmq.REP)
+    def bind_pull_gateway_socket(self, port):
+        self.gateway_puller = self.context.socket(zmq.PULL)
+        self.gateway_puller.bind(f"tcp://*:{port}")
+        return self.gateway_puller
+
+    def bind_router_user_request_socket(self, port):
+        # ROUTER rather than REP, so requests can be answered out of arrival order; users keep REQ sockets
+        socket = self.context.socket(zmq.ROUTER)
         socket.bind(f"tcp://*:{port}")
         return socket
     
@@ -92,10 +100,11 @@ class ZMQUtils:
     #     pub_socket.send_string(message)
     #     pub_socket.close()
     def publish_assignment(self, message):
-        pub_socket = self.context.socket(zmq.PUB)
-        pub_socket.bind(f"tcp://*:{self.pub_port}")
-        pub_socket.send_string(message)
-        pub_socket.close()
+        # Keep one bound publisher so long-lived subscribers (taxis, fleet gateways) see every assignment
+        with self.publish_lock:
+            if self.publisher is None:
+                self.bind_pub_socket()
+            self.publisher.send_string(message)
     
     def disconnect_pub(self):
         if self.publisher:
@@ -164,4 +173,6 @@ class ZMQUtils:
             self.heartbeat_2_puller.close()
         if self.heartbeat_2_pusher:
             self.heartbeat_2_pusher.close()
+        if self.gateway_puller:
+            self.gateway_puller.close()
         self.context.term()
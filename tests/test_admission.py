@@ -0,0 +1,22 @@
+from src.utils.metrics import Metrics
+from src.utils.admission import AdmissionControl
+
+
+def test_admission_drops_expired_requests_and_sheds_a_standing_queue():
+    metrics = Metrics()
+    admission = AdmissionControl(metrics, target=1.0, interval=2.0, retry_after=2.0)
+    assert admission.admit({"sent": "99.0", "deadline": "100.0"}, 100.0) == "request_expired"
+    assert admission.admit({}, 100.0) is None  # Unstamped requests from older users are served
+
+    # A burst above the target is served; one that lasts the whole interval is shed
+    assert admission.admit({"sent": "98.5"}, 100.0) is None
+    assert admission.admit({"sent": "99.5"}, 101.0) is None
+    assert admission.admit({"sent": "98.0", "deadline": "130.0"}, 102.0) == "busy retry_after=4.0"
+    assert admission.admit({"sent": "102.5"}, 103.0) is None  # Below the target again
+    assert admission.admit({"sent": "101.0"}, 103.0) is None
+
+    admission.served({"deadline": "130.0"}, 103.0)
+    admission.served({"deadline": "130.0"}, 131.0)
+    counters = metrics.snapshot()["counters"]
+    assert counters["user_requests.expired"] == 1 and counters["user_requests.shed"] == 1
+    assert counters["user_requests.goodput"] == 1 and counters["user_requests.late"] == 1
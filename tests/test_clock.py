@@ -0,0 +1,15 @@
+from threading import Event, Thread
+from src.utils.clock import ManualClock, ScaledClock
+
+
+def test_manual_clock_wakes_sleepers_on_advance():
+    clock = ManualClock()
+    woke = Event()
+    sleeper = Thread(target=lambda: (clock.sleep(5), woke.set()))
+    sleeper.start()
+    clock.advance(4)
+    assert not woke.wait(0.05)
+    clock.advance(1)
+    assert woke.wait(1)
+    sleeper.join()
+    assert ScaledClock(100).wait(Event(), 1) is False
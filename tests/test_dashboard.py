@@ -0,0 +1,24 @@
+from src.services.snapshot_service import SnapshotPublisher
+from src.services.dashboard_service import DashboardService
+
+
+def test_snapshots_feed_a_paged_filtered_dashboard():
+    reads = []
+    rows = [(i, i % 7, i % 5, 1, "available" if i % 3 else "unavailable", i % 4 != 0) for i in range(1, 26)]
+    publisher = SnapshotPublisher("dispatcher", 0, lambda: reads.append(1) or rows, headless=True)
+    assert publisher.refresh_records() and not publisher.refresh_records()  # Unchanged fleet is not re-read
+    publisher.mark_dirty()
+    publisher.refresh_records()
+    assert len(reads) == 2
+
+    dashboard = DashboardService("localhost", 0, page_size=4, sort="x", status_filter="unavailable")
+    dashboard.receiver.apply([frame.tobytes() for frame in publisher.encoder.encode(publisher.records, 0.0)])
+    dashboard.rows = dashboard.receiver.rows()
+    page, matching, pages = dashboard.view(dashboard.rows)
+    assert (matching, pages) == (8, 2)
+    assert [row[0] for row in page] == [21, 15, 9, 3]
+    dashboard.handle_command("n")
+    dashboard.handle_command("n")  # Already on the last page
+    assert [row[0] for row in dashboard.view(dashboard.rows)[0]] == [24, 18, 12, 6]
+    dashboard.handle_command("filter everything")
+    assert dashboard.status_filter == "unavailable"
@@ -0,0 +1,167 @@
+import time
+import zmq
+from concurrent.futures import Future
+from threading import Event, Lock, Thread
+from src.config import MAX_N, TAXI_REPLY_TIMEOUT
+from src.utils.metrics import Metrics
+from src.utils.rich_utils import RichConsoleUtils
+from src.services.dispatcher_service import DispatcherService
+from src.utils.dead_reckoning import DeadReckoningTracker
+from src.utils.state_store import StateStore
+from src.utils.clock import ManualClock
+from src.utils.request_outcomes import RequestOutcomes
+from src.utils.group_commit import GroupCommitWriter
+from src.utils.db_handler import DatabaseHandler
+from src.models.taxi_model import TAXI_STATUS_AVAILABLE
+
+
+class ChunkedTaxis:
+    # iter_taxis and the other storage calls a starting dispatcher makes; fails after `fail_after` chunks
+    def __init__(self, chunks, fail_after=None):
+        self.chunks = chunks
+        self.fail_after = fail_after
+        self.remembered = []
+
+    def iter_taxis(self):
+        for index, chunk in enumerate(self.chunks):
+            if index == self.fail_after:
+                raise ConnectionError("lost connection to MySQL during query")
+            yield chunk
+
+    def remember_taxis(self, taxi_ids):
+        self.remembered.extend(taxi_ids)
+
+    def get_recent_assignments(self, since):
+        return []
+
+    def get_taxis_updated_since(self, since):
+        return []
+
+    def get_ride_owners(self, taxi_ids):
+        return {}
+
+
+def starting_dispatcher(state_dir, db_handler, clock):
+    # Only what initialize_dispatcher_state touches; the real constructor binds sockets and connects to MySQL
+    dispatcher = DispatcherService.__new__(DispatcherService)
+    dispatcher.console_utils = RichConsoleUtils()
+    dispatcher.clock = clock
+    dispatcher.db_handler = db_handler
+    dispatcher.state_store = StateStore(state_dir, clock)
+    dispatcher.position_tracker = DeadReckoningTracker(MAX_N, MAX_N, clock)
+    dispatcher.fleet_table_service = None
+    dispatcher.heartbeat_lock = Lock()
+    dispatcher.heartbeat_timestamps = {}
+    dispatcher.request_outcomes = RequestOutcomes(Metrics())
+    return dispatcher
+
+
+def test_interrupted_preload_is_discarded_and_streamed_again(tmp_path):
+    clock = ManualClock(100.0)
+    chunks = [[(taxi_id, taxi_id, taxi_id, 2, "available", True) for taxi_id in range(first, first + 3)] for first in (1, 4, 7)]
+
+    # MySQL goes away after the first chunk: nothing partial may be trusted on the next start
+    interrupted = starting_dispatcher(str(tmp_path), ChunkedTaxis(chunks, fail_after=1), clock)
+    interrupted.initialize_dispatcher_state()
+    assert interrupted.state_store.taxis() == [] and not interrupted.state_store.seeded
+    interrupted.state_store.close()
+
+    # A crash mid-preload leaves journaled rows but no seeded marker
+    crashed = StateStore(str(tmp_path), clock)
+    crashed.restore()
+    for taxi_id, pos_x, pos_y, speed, status, _ in chunks[0]:
+        crashed.taxi_connected(taxi_id, pos_x, pos_y, speed, status)
+    crashed.close()
+
+    db_handler = ChunkedTaxis(chunks)
+    complete = starting_dispatcher(str(tmp_path), db_handler, clock)
+    complete.initialize_dispatcher_state()
+    assert complete.state_store.seeded
+    assert sorted(taxi[0] for taxi in complete.state_store.taxis()) == list(range(1, 10))
+    assert sorted(db_handler.remembered) == list(range(1, 10))
+    assert sorted(complete.heartbeat_timestamps) == list(range(1, 10))
+    complete.state_store.close()
+
+    # Seeded now: the next start restores locally and never streams the table
+    restarted = starting_dispatcher(str(tmp_path), ChunkedTaxis(chunks, fail_after=0), clock)
+    restarted.initialize_dispatcher_state()
+    assert len(restarted.state_store.taxis()) == 9
+    restarted.state_store.close()
+
+
+def test_late_reservation_is_released_with_its_assignment():
+    class RecordingHandler:
+        def __init__(self):
+            self.batches = []
+
+        def execute_batch(self, operations):
+            self.batches.append(operations)
+            return [True] * len(operations)
+
+    class RecordingCursor:
+        rowcount = 1
+
+        def __init__(self):
+            self.executed = []
+
+        def execute(self, query, parameters):
+            self.executed.append((" ".join(query.split()), parameters))
+
+    # reserve_and_assign committed after reserve_taxi gave up on it: one write undoes all of it
+    handler = RecordingHandler()
+    dispatcher = DispatcherService.__new__(DispatcherService)
+    dispatcher.storage_writer = GroupCommitWriter(handler, Metrics())
+    late = Future()
+    late.set_result(True)
+    dispatcher.release_late_reservation(late, 2, 7, "r-7")
+    dispatcher.storage_writer.commit([dispatcher.storage_writer.queue.get(timeout=1)])
+    assert handler.batches == [[("release_reservation", (2, 7, "r-7"))]]
+
+    cursor = RecordingCursor()
+    assert DatabaseHandler.__new__(DatabaseHandler).execute_write(cursor, "release_reservation", (2, 7, "r-7"))
+    # Back to what reserve_taxi required, available and connected, so the taxi can be matched at once
+    assert cursor.executed[0] == ("UPDATE taxis SET status = %s, connected = %s WHERE taxi_id = %s", (TAXI_STATUS_AVAILABLE, True, 2))
+    # Only that request's assignment goes, so its retry is matched afresh and later rides are untouched
+    assert cursor.executed[1] == ("DELETE FROM assignments WHERE user_id = %s AND taxi_id = %s AND request_id <=> %s", (7, 2, "r-7"))
+
+    # A reservation that failed or was refused leaves nothing to release
+    refused = Future()
+    refused.set_result(False)
+    dispatcher.release_late_reservation(refused, 3, 8, "r-8")
+    assert dispatcher.storage_writer.queue.empty()
+
+
+def test_connect_retry_reaches_the_taxi_within_its_wait():
+    class InprocSockets:
+        def __init__(self, context):
+            self.context = context
+
+        def bind_rep_socket(self):
+            responder = self.context.socket(zmq.REP)
+            responder.bind("inproc://taxi-requests")
+            return responder
+
+    context = zmq.Context()
+    dispatcher = DispatcherService.__new__(DispatcherService)
+    dispatcher.console_utils = RichConsoleUtils()
+    dispatcher.metrics = Metrics()
+    dispatcher.stop_event = Event()
+    dispatcher.zmq_utils = InprocSockets(context)
+    # No thread serves the writer's queue, as if MySQL were too far behind for any group to commit
+    dispatcher.storage_writer = GroupCommitWriter(None, dispatcher.metrics)
+    server = Thread(target=dispatcher.handle_taxi_requests)
+    server.start()
+    try:
+        time.sleep(0.05)  # The REP socket binds on the server thread
+        requester = context.socket(zmq.REQ)
+        requester.connect("inproc://taxi-requests")
+        requester.send_string("connect_request 4 1 1 2 available")
+        # As taxi_service waits: the degraded reply must arrive before the taxi gives up on the dispatcher
+        assert requester.poll(int(TAXI_REPLY_TIMEOUT * 1000))
+        assert requester.recv_string() == "connect_retry 4"
+        assert dispatcher.metrics.snapshot()["counters"]["connect_requests.degraded"] == 1
+        requester.close()
+    finally:
+        dispatcher.stop_event.set()
+        server.join()
+        context.term()
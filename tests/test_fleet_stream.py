@@ -0,0 +1,27 @@
+import numpy as np
+from src.utils.fleet_stream import FleetStreamEncoder, FleetStreamReceiver, STREAM_RECORD, records_from_rows, rows_from_records
+
+
+def test_fleet_stream_sends_deltas_and_resyncs_after_a_gap():
+    encoder = FleetStreamEncoder(keyframe_interval=4)
+    receiver = FleetStreamReceiver()
+    fleet = records_from_rows([(i, i, i, 1, "available", True) for i in range(1000)])
+
+    def send(records):
+        frames = [frame.tobytes() for frame in encoder.encode(records, 0.0)]
+        return frames, receiver.apply(frames)
+
+    frames, _ = send(fleet)
+    assert len(frames[1]) == 1000 * STREAM_RECORD.itemsize
+    fleet = fleet[1:].copy()  # Taxi 0 leaves, taxi 5 moves
+    fleet["pos_x"][4] = 40
+    frames, _ = send(fleet)
+    assert len(frames[1]) == STREAM_RECORD.itemsize and len(frames[2]) == 8
+    assert receiver.rows() == rows_from_records(np.sort(fleet, order="taxi_id"))
+
+    encoder.encode(fleet, 0.0)  # Lost in transit
+    fleet["status"][0] = 1
+    _, changed = send(fleet)
+    assert not changed and not receiver.synced and receiver.gaps == 1
+    frames, _ = send(fleet)  # Keyframe
+    assert receiver.synced and receiver.rows()[0] == (1, 1, 1, 1, "unavailable", True)
@@ -0,0 +1,69 @@
+from src.models.taxi_model import TAXI_STATUS_AVAILABLE, TAXI_STATUS_UNAVAILABLE
+from src.utils.fleet_table import SharedFleetTable, HEADING_CODES
+from src.services.fleet_table_service import FleetIngestWorker
+from src.utils.clock import ManualClock
+from src.utils.group_commit import GroupCommitWriter
+from src.utils.heartbeat_history import HeartbeatHistory
+
+
+def test_fleet_table_nearest_available_taxi():
+    table = SharedFleetTable.create(8, 20, 20)
+    try:
+        table.register(0, 10, 3, 3, 2, TAXI_STATUS_AVAILABLE, now=100.0)
+        table.register(1, 11, 4, 4, 2, TAXI_STATUS_UNAVAILABLE, now=100.0)
+        table.register(2, 12, 9, 9, 4, TAXI_STATUS_AVAILABLE, now=100.0)
+        assert table.find_nearest_available(4, 4) == (10, 3, 3, 2)
+
+        # Dead-reckoned: taxi 12 heads south at 2 cells per tick and passes the user
+        table.write(2, heading=HEADING_CODES["SOUTH"], updated_at=100.0)
+        assert table.find_nearest_available(9, 5, now=110.0) == (12, 9, 5, 0)
+
+        table.write(0, connected=0)
+        table.write(2, status=TAXI_STATUS_UNAVAILABLE)
+        assert table.find_nearest_available(4, 4) is None
+    finally:
+        table.close()
+
+
+def test_fleet_table_reader_attaches_by_name():
+    table = SharedFleetTable.create(4, 10, 10)
+    reader = SharedFleetTable.attach(table.name)
+    try:
+        table.register(0, 7, 1, 2, 1, TAXI_STATUS_AVAILABLE, now=50.0)
+        record = reader.read(0)
+        assert record["taxi_id"][0] == 7 and record["seq"][0] % 2 == 0
+        assert reader.stale_taxis(now=70.0, timeout=10) == [7]
+    finally:
+        reader.close()
+        table.close()
+
+
+def test_fleet_ingest_worker_groups_writes_and_rolls_up_heartbeats():
+    class RecordingHandler:
+        def __init__(self):
+            self.batches = []
+
+        def execute_batch(self, operations):
+            self.batches.append(operations)
+            return [1] * len(operations)
+
+    table = SharedFleetTable.create(4, 10, 10)
+    worker = FleetIngestWorker(table.name)
+    try:
+        handler = RecordingHandler()
+        worker.storage_writer = GroupCommitWriter(handler)
+        worker.heartbeat_history = HeartbeatHistory(worker.storage_writer, ManualClock(960.0))
+        worker.clock = worker.heartbeat_history.clock
+        worker.handle_control(f"register 7 1 1 2 {TAXI_STATUS_AVAILABLE}")
+        worker.handle_position("7 1 2 2 0 NORTH")
+        worker.handle_position("7 1 3 2 0 NORTH")
+        worker.handle_heartbeat("heartbeat 7")
+        worker.heartbeat_history.flush()
+        worker.storage_writer.commit([worker.storage_writer.queue.get_nowait() for _ in range(worker.storage_writer.queue.qsize())])
+        names = [name for name, _ in handler.batches[-1]]
+        # Positions coalesce into the latest; no heartbeat row per update, one rollup of three beats instead
+        assert names == ["update_taxi_position", "update_taxi_connected_status", "record_heartbeat_rollups"]
+        assert handler.batches[-1][0][1] == (7, 1, 3) and handler.batches[-1][2][1][0][0][3] == 3
+    finally:
+        worker.table.close()
+        table.close()
@@ -0,0 +1,36 @@
+import time
+import zmq
+from threading import Thread
+from src.services.gateway_service import GatewayService, UpdateBatcher
+
+
+def test_gateway_batches_latest_update_per_taxi():
+    now = [0.0]
+    batcher = UpdateBatcher(batch_window=0.05, max_batch=3, monotonic=lambda: now[0])
+    batcher.add_position(b"1 0 0 NORTH")
+    batcher.add_position(b"1 0 1 NORTH")
+    batcher.add_heartbeat(b"heartbeat 1")
+    assert batcher.take() == []  # The window is open and only two updates are pending
+    batcher.add_position(b"2 5 5 EAST")
+    assert batcher.take() == [[b"positions", b"1 0 1 NORTH", b"2 5 5 EAST"], [b"heartbeats", b"heartbeat 1"]]
+    batcher.add_heartbeat(b"heartbeat 2")
+    now[0] = 0.06
+    assert batcher.take() == [[b"heartbeats", b"heartbeat 2"]] and batcher.remaining() == 0.05
+
+    gateway = GatewayService("127.0.0.1", batch_window=0.01)
+    upstream = gateway.context.socket(zmq.PULL)
+    upstream.bind("inproc://upstream")
+    forwarder = Thread(target=gateway.forward_updates, args=("inproc://positions", "inproc://heartbeats", "inproc://upstream"))
+    forwarder.start()
+    try:
+        time.sleep(0.05)
+        taxi = gateway.context.socket(zmq.PUSH)
+        taxi.connect("inproc://positions")
+        taxi.send(b"3 1 1 SOUTH")
+        assert upstream.poll(2000) and upstream.recv_multipart() == [b"positions", b"3 1 1 SOUTH"]
+        taxi.close(linger=0)
+    finally:
+        gateway.stop_event.set()
+        forwarder.join()
+        upstream.close(linger=0)
+        gateway.context.term()
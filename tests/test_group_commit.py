@@ -0,0 +1,33 @@
+from src.utils.metrics import Metrics
+from src.utils.group_commit import GroupCommitWriter
+
+
+def test_group_commit_batches_coalesces_and_retries_failures():
+    class RecordingHandler:
+        def __init__(self):
+            self.batches = []
+
+        def execute_batch(self, operations):
+            self.batches.append(operations)
+            if any(name == "add_user_request" and args[0] < 0 for name, args in operations):
+                raise ValueError("bad user")
+            return [len(self.batches)] * len(operations)
+
+    handler = RecordingHandler()
+    metrics = Metrics()
+    writer = GroupCommitWriter(handler, metrics, window=0.05)
+    positions = [writer.submit("update_taxi_position", 1, x, x) for x in range(5)]
+    heartbeat = writer.submit("record_heartbeat", 1)
+    status = writer.submit("set_taxi_status", 2, "available")
+    writer.commit([writer.queue.get_nowait() for _ in range(7)])
+    assert handler.batches == [[
+        ("update_taxi_position", (1, 4, 4)), ("record_heartbeat", (1,)), ("set_taxi_status", (2, "available")),
+    ]]
+    assert [future.result(0) for future in positions + [heartbeat, status]] == [1] * 7
+    assert metrics.snapshot()["counters"]["storage.group_commit.coalesced"] == 4
+
+    good = writer.submit("add_user_request", 7, 1, 1, 30)
+    bad = writer.submit("add_user_request", -1, 1, 1, 30)
+    writer.commit([writer.queue.get_nowait() for _ in range(2)])
+    assert good.result(0) == 3 and isinstance(bad.exception(0), ValueError)
+    assert len(handler.batches) == 4
@@ -0,0 +1,28 @@
+from src.utils.clock import ManualClock
+from src.utils.heartbeat_history import HeartbeatHistory
+
+
+def test_heartbeat_history_rolls_up_windows_with_gaps():
+    class RecordingWriter:
+        def __init__(self):
+            self.submitted = []
+
+        def submit(self, name, *args):
+            self.submitted.append((name, args))
+
+    clock = ManualClock(1000.0)
+    writer = RecordingWriter()
+    history = HeartbeatHistory(writer, clock, interval=60, gap=10)
+    for now in (1001, 1006, 1011, 1030):  # One silence longer than the gap
+        history.seen(1, now)
+    history.seen(2, 1040)
+    assert history.flush(1060) == 2
+    name, (rows,) = writer.submitted[0]
+    assert name == "record_heartbeat_rollups"
+    assert sorted(rows) == [(1, 960.0, 60, 4, 1001, 1030, 1, 19), (2, 960.0, 60, 1, 1040, 1040, 0, 0.0)]
+
+    clock.advance(90)
+    history.seen(1, 1090)  # The gap ending in this window is counted here
+    assert history.status(["1"]).startswith("taxi 1 last seen 0.0 s ago, 1 beats since 1090, 1 gaps")
+    assert history.drain(1120) == [(1, 1020.0, 60, 1, 1090, 1090, 1, 60)]
+    assert history.flush(1180) == 0 and len(writer.submitted) == 1
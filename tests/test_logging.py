@@ -0,0 +1,20 @@
+import json
+from src.utils.rich_utils import LogWriter, RichConsoleUtils
+
+
+def test_logging_filters_rate_limits_and_writes_json(tmp_path):
+    path = tmp_path / "log.jsonl"
+    writer = LogWriter(level="WARNING", rate=0, burst=3, report_interval=60, json_path=str(path))
+    console_utils = RichConsoleUtils(writer)
+    for i in range(10):
+        console_utils.print(f"Heartbeat {i}", 2)
+        console_utils.print("Below the level", 1)
+    assert writer.flush()
+    writer.report_suppressed()
+    writer.flush()
+    records = [json.loads(line) for line in path.read_text().splitlines()]
+    assert [record["message"] for record in records[:3]] == ["Heartbeat 0", "Heartbeat 1", "Heartbeat 2"]
+    assert records[3]["message"].startswith("Suppressed 7 messages from test_logging.py")
+    assert len(records) == 4 and writer.stats()["suppressed"] == 7
+    assert "Below the level" not in path.read_text()
+    assert writer.handle_log(["level", "info"]) == "ok log level INFO"
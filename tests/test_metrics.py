@@ -0,0 +1,24 @@
+import json
+from threading import Lock
+from src.utils.metrics import Metrics, InstrumentedCalls
+from src.services.control_service import ControlService
+
+
+def test_metrics_record_stages_locks_and_calls():
+    metrics = Metrics()
+    watch = metrics.stopwatch("user_request")
+    watch.lap("parse")
+    watch.lap("match")
+    watch.finish()
+    with metrics.acquire(Lock(), "assignment"):
+        pass
+    storage = InstrumentedCalls({"taxi": 1}, metrics, "storage")
+    assert storage.get("taxi") == 1
+    latency = metrics.snapshot()["latency"]
+    for name in ("user_request.parse", "user_request.match", "user_request.total", "lock.assignment.wait", "storage.get"):
+        assert latency[name]["count"] == 1
+
+    control = ControlService(0)
+    control.register("stats", lambda args: json.dumps(metrics.snapshot()))
+    assert json.loads(control.dispatch("stats"))["latency"]["storage.get"]["count"] == 1
+    assert control.dispatch("nope") == "unknown_command"
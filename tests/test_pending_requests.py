@@ -0,0 +1,21 @@
+from src.utils.metrics import Metrics
+from src.utils.admission import AdmissionControl
+from src.utils.pending_requests import PendingRequests
+
+
+def test_pending_requests_are_served_earliest_deadline_first():
+    pending = PendingRequests(limit=4, timeout=30)
+    pending.push("relaxed", {"deadline": "150.0"}, 100.0)
+    pending.push("untagged", {}, 100.0)  # Gets the default timeout: 130
+    pending.push("urgent", {"deadline": "105.0"}, 101.0)
+    pending.push("retried", {"deadline": "130.0"}, 102.0)  # Same deadline: arrival order
+    assert pending.full()
+    assert [pending.pop() for _ in range(4)] == ["urgent", "untagged", "retried", "relaxed"]
+    assert pending.pop() is None
+
+    metrics = Metrics()
+    admission = AdmissionControl(metrics)
+    assert admission.admit({"deadline": "105.0"}, 106.0) == "request_expired"
+    admission.served({"deadline": "130.0"}, 131.0)
+    assert admission.tolerance({"sent": "100.0", "deadline": "125.0"}) == 25 and admission.tolerance({}) == 30
+    assert metrics.snapshot()["counters"]["user_requests.deadline_missed"] == 2
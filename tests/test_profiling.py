@@ -0,0 +1,16 @@
+import time
+from src.services.control_service import ControlService
+from src.utils.profiling import Profiler
+
+
+def test_profiler_is_driven_through_the_control_channel(tmp_path):
+    control = ControlService(0)
+    Profiler("dispatcher", str(tmp_path)).register(control)
+    assert control.dispatch("profile start sampling 1").startswith("ok")
+    assert control.dispatch("profile start sampling").startswith("error")
+    time.sleep(0.05)
+    assert "samples" in control.dispatch("profile stop")
+    assert control.dispatch("memory start").startswith("ok")
+    assert control.dispatch("memory snapshot").startswith("snapshot written")
+    assert control.dispatch("memory stop").startswith("ok")
+    assert len(list(tmp_path.iterdir())) == 2
@@ -0,0 +1,15 @@
+from src.utils.metrics import Metrics
+from src.utils.request_outcomes import RequestOutcomes
+
+
+def test_request_outcomes_answer_repeats_until_they_expire():
+    metrics = Metrics()
+    outcomes = RequestOutcomes(metrics, capacity=2, ttl=60)
+    # Rebuilt from the other dispatcher's assignments, then this dispatcher's own replies
+    assert outcomes.restore([("a", 7, 90.0), ("b", 8, 100.0)], 110.0) == 2
+    assert outcomes.get("a", 120.0) == "assign_taxi 7"
+    outcomes.record("c", "no_taxi_available", 130.0)  # Over capacity: the oldest goes
+    assert outcomes.get("a", 130.0) is None and outcomes.get("c", 131.0) == "no_taxi_available"
+    assert outcomes.get("b", 161.0) is None  # Past the TTL
+    assert outcomes.get(None, 131.0) is None  # Untagged requests are never repeats
+    assert metrics.snapshot()["counters"]["user_requests.repeated"] == 2
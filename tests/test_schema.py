@@ -0,0 +1,83 @@
+from src.utils.schema import check_query_plans, migrate, QUERY_PLANS, INDEXES
+
+
+def test_migration_removes_duplicates_before_unique_indexes():
+    class BaselineDatabase:
+        # Every table exists without keys; heartbeat and assignments hold several rows per taxi or user
+        def __init__(self):
+            self.duplicates = {"heartbeat": 40, "assignments": 3}
+            self.indexes = set()
+            self.rowcount = 0
+
+        def execute(self, query, parameters=None):
+            self.query = " ".join(query.split())
+            self.rowcount = 0
+            if self.query.startswith("DELETE FROM"):
+                self.rowcount = self.duplicates.pop(self.query.split()[2], 0)
+            elif self.query.startswith("ALTER TABLE") and " ADD " in self.query and "COLUMN" not in self.query:
+                words = self.query.split()
+                table, index = words[2], words[words.index("INDEX") + 1]
+                if index == "heartbeat_rollup_age":
+                    raise RuntimeError("Lock wait timeout exceeded")
+                if "UNIQUE" in self.query and table in self.duplicates:
+                    raise RuntimeError(f"Duplicate entry for key '{index}'")
+                self.indexes.add(index)
+
+        def fetchone(self):
+            return ("tinyint",) if "COLUMN_NAME" in self.query else None
+
+        def fetchall(self):
+            if self.query == "SHOW TABLES":
+                return [("taxis",), ("users",), ("assignments",), ("heartbeat",), ("heartbeat_rollup",)]
+            return []
+
+    class Handler:
+        def __init__(self):
+            self.cursor = BaselineDatabase()
+
+        def get_cursor(self):
+            return self.cursor
+
+        def get_connection(self):
+            return self
+
+        def commit(self):
+            pass
+
+        def rollback(self):
+            pass
+
+    handler = Handler()
+    steps, failures = migrate(handler)
+    assert "removed 3 duplicate rows from assignments" in steps and "removed 40 duplicate rows from heartbeat" in steps
+    # One index failing does not stop the others
+    assert failures == ["could not add heartbeat_rollup_age on heartbeat_rollup: Lock wait timeout exceeded"]
+    assert handler.cursor.indexes == {index for _, index, _, _ in INDEXES} - {"heartbeat_rollup_age"}
+
+
+def test_query_plan_check_expects_the_hot_query_indexes():
+    class ExplainingCursor:
+        # Plans as MySQL reports them; get_available_taxis uses its index but not as a covering one
+        description = [("table",), ("type",), ("key",), ("rows",), ("Extra",)]
+
+        def execute(self, query, parameters):
+            self.query = query
+
+        def fetchall(self):
+            if "status = %s AND connected = %s" in self.query and self.query.lstrip().startswith("EXPLAIN SELECT taxi_id"):
+                return [("taxis", "ref", "taxis_available", 12, "Using where")]
+            if "heartbeat_rollup WHERE bucket_seconds" in self.query:
+                return [("heartbeat_rollup", "ALL", None, 5000, "Using where")]
+            if "FROM assignments" in self.query:
+                return [("assignments", "range", "assignments_recent", 3, "Using index condition")]
+            return [("t", "const", "PRIMARY", 1, None)]
+
+    class Handler:
+        def get_cursor(self):
+            return ExplainingCursor()
+
+    results = {name: (ok, detail) for name, ok, detail in check_query_plans(Handler())}
+    assert len(results) == len(QUERY_PLANS)
+    failed = sorted(name for name, (ok, _) in results.items() if not ok)
+    assert failed == ["compacted_heartbeat_rollups", "expired_heartbeat_rollups", "get_available_taxis"]
+    assert results["taxi_exists"][0] and "covering" in results["get_available_taxis"][1]
@@ -0,0 +1,37 @@
+from src.models.shard_model import ShardMap
+from src.services.shard_router_service import ShardRouterService
+
+
+def test_shard_map_partitions_grid():
+    shard_map = ShardMap(10, 10, 2, 2)
+    assert [shard.shard_id for shard in shard_map.shards] == [0, 1, 2, 3]
+    assert shard_map.owner(0, 0).shard_id == 0
+    assert shard_map.owner(10, 0).shard_id == 1
+    assert shard_map.owner(3, 8).shard_id == 2
+    assert shard_map.shards[3].distance_to(4, 4) == 4
+    assert len({shard.port_offset for shard in shard_map.shards}) == 4
+
+
+def test_router_prefers_closer_taxi_across_border():
+    router = ShardRouterService(ShardMap(10, 10, 2, 1))
+    candidates = {0: "shard_candidate 1 5", 1: "shard_candidate 2 1"}
+    forwarded = []
+
+    def ask(shard, message):
+        if message.startswith("shard_query"):
+            return candidates[shard.shard_id]
+        forwarded.append(shard.shard_id)
+        return "assign_taxi 2"
+
+    router.ask = ask
+    try:
+        assert router.route("user_request 9 5 5") == "assign_taxi 2"
+        assert forwarded == [1]
+
+        # A local taxi closer than the border never triggers a cross-shard lookup
+        candidates[1] = None
+        candidates[0] = "shard_candidate 1 0"
+        assert router.route("user_request 9 5 5") == "assign_taxi 2"
+        assert forwarded == [1, 0]
+    finally:
+        router.context.term()
@@ -0,0 +1,19 @@
+import pytest
+from src.services.simulation_service import SimulationService
+from src.services.sweep_service import SweepService, expand_sweep
+from src.config import MAX_N
+
+
+def test_simulation_is_reproducible():
+    first = SimulationService.generated(20, 20, 5, 300, 3600, seed=3).run().summary()
+    second = SimulationService.generated(20, 20, 5, 300, 3600, seed=3).run().summary()
+    assert first == second
+    assert first["requests"] > 0 and 0 < first["fill_rate"] <= 1
+
+
+def test_sweep_runs_every_combination_in_order():
+    spec = {"hours": 0.5, "grid": [[10, 10]], "fleet_size": [2, 4], "requests_per_hour": [60, 240]}
+    rows = SweepService(spec, workers=2).run()
+    assert [(row["fleet_size"], row["requests_per_hour"]) for row in rows] == [(2, 60), (2, 240), (4, 60), (4, 240)]
+    with pytest.raises(ValueError):
+        expand_sweep({"grid": [[MAX_N + 1, 10]]})
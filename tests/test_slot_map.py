@@ -0,0 +1,11 @@
+from src.utils.slot_map import SlotMap
+
+
+def test_slot_map_reuses_released_slots():
+    slots = SlotMap()
+    assert slots.slot_for(9001) == 0
+    assert slots.slot_for(42) == 1
+    assert slots.slot_for(9001) == 0
+    assert slots.release(9001) == 0
+    assert slots.slot_for(7) == 0
+    assert slots.taxi_id_at(0) == 7 and len(slots) == 2 and slots.high_water == 2
@@ -0,0 +1,55 @@
+from src.utils.state_store import StateStore
+from src.utils.clock import ManualClock
+
+
+def test_state_store_restores_snapshot_and_journal(tmp_path):
+    clock = ManualClock(100.0)
+    store = StateStore(str(tmp_path), clock)
+    assert store.restore() == 0
+    for taxi_id in range(1, 2001):
+        store.taxi_connected(taxi_id, taxi_id % 10, taxi_id % 7, 2, "available")
+    store.request_received(7, 3, 3)
+    store.ride_assigned(7, 5)
+    store.snapshot()
+    clock.advance(10)
+    store.taxi_moved(1, 9, 9)
+    store.taxi_connection(2, False)
+    store.request_received(8, 1, 1)
+    store.ride_assigned(9, 6)
+    store.ride_finished(9, 6, 6, 6)
+    store.journal.write(b"\x01\x00torn")  # Crash in the middle of an entry, no final snapshot
+
+    restored = StateStore(str(tmp_path), clock)
+    assert restored.restore() == 5
+    taxis = {taxi[0]: taxi for taxi in restored.taxis()}
+    assert len(taxis) == 2000
+    assert taxis[1] == (1, 9, 9, 2, "available", True)
+    assert taxis[2][5] is False and taxis[5][4] == "unavailable" and taxis[6][4] == "available"
+    assert restored.active_rides() == {7: (5, 100.0)}
+    assert restored.pending_requests() == {8: (1, 1, 110.0)}
+    restored.close()
+    assert len(restored.journal_generations()) == 1
+
+
+def test_restored_rides_are_reconciled_with_storage(tmp_path):
+    clock = ManualClock(100.0)
+    store = StateStore(str(tmp_path), clock)
+    store.restore()
+    for taxi_id in (5, 6, 7):
+        store.taxi_connected(taxi_id, 0, 0, 2, "available")
+    store.ride_assigned(1, 5)
+    store.ride_assigned(2, 6)
+    store.ride_assigned(3, 7)
+    store.close()
+
+    restored = StateStore(str(tmp_path), clock)
+    restored.restore()
+    assert restored.written_at is not None
+    # While we were down the backup finished ride 2 and gave taxi 7 to user 9
+    changed = [(6, 4, 4, 2, "available", True), (7, 8, 8, 2, "unavailable", True)]
+    owners = {5: (1, "unavailable"), 6: (2, "available"), 7: (9, "unavailable")}
+    assert restored.reconcile(changed, owners) == 2
+    assert restored.active_rides() == {1: (5, 100.0)}
+    taxis = {taxi[0]: taxi for taxi in restored.taxis()}
+    assert taxis[6] == (6, 4, 4, 2, "available", True) and taxis[7][4] == "unavailable"
+    restored.close()
@@ -0,0 +1,46 @@
+import pytest
+from threading import Event
+from src.utils.metrics import Metrics
+from src.utils.group_commit import GroupCommitWriter
+from src.utils.storage_executor import StorageExecutor, StorageBusy, StorageTimeout
+
+
+def test_storage_backpressure_degrades_instead_of_blocking():
+    class SlowHandler:
+        def __init__(self):
+            self.release = Event()
+            self.batches = []
+
+        def get_available_taxis(self):
+            self.release.wait(5)
+            return []
+
+        def execute_batch(self, operations):
+            self.batches.append(operations)
+            return [1] * len(operations)
+
+    handler = SlowHandler()
+    metrics = Metrics()
+    executor = StorageExecutor(handler, metrics, workers=1, queue_size=0)
+    with pytest.raises(StorageTimeout) as timeout:
+        executor.call("get_available_taxis", timeout=0.05)
+    with pytest.raises(StorageBusy):
+        executor.call("get_available_taxis")  # The timed-out call still holds the only slot
+    handler.release.set()
+    assert timeout.value.future.result(1) == [] and executor.call("get_available_taxis") == []
+    executor.shutdown()
+
+    writer = GroupCommitWriter(handler, metrics, queue_size=2)
+    writer.submit("set_taxi_status", 1, "available")
+    writer.submit("update_taxi_position", 2, 0, 0)
+    older = writer.submit("update_taxi_position", 1, 1, 1)  # Queue full: waits outside it, latest only
+    newer = writer.submit("update_taxi_position", 1, 2, 2)
+    assert writer.offer("update_taxi_connected_status", 1, True) is None
+    with pytest.raises(StorageBusy):
+        writer.submit("add_user_request", 7, 0, 0, 30, timeout=0.01)
+    writer.commit([writer.queue.get_nowait() for _ in range(2)] + writer.take_overflow())
+    assert handler.batches[-1][-1] == ("update_taxi_position", (1, 2, 2))
+    assert older.result(0) == newer.result(0) == 1
+    counters = metrics.snapshot()["counters"]
+    assert counters["storage.degraded.coalesced"] == 2 and counters["storage.busy.add_user_request"] == 1
+    assert counters["storage.timeouts.get_available_taxis"] == 1 and counters["storage.busy.get_available_taxis"] == 1
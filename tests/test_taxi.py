@@ -0,0 +1,124 @@
+import zmq
+from threading import Condition, Event, Lock, Thread
+from src.config import TAXI_CONNECT_RETRY_AFTER
+from src.utils.clock import ManualClock
+from src.utils.rich_utils import RichConsoleUtils
+from src.services.taxi_service import TaxiService
+from src.models.taxi_model import Taxi
+from src.utils.dead_reckoning import PositionReporter, DeadReckoningTracker, predict_position
+
+
+def test_predict_position_clamps_to_grid():
+    assert predict_position(8, 5, "EAST", 4, 10, 10, 10) == (10, 5)
+    assert predict_position(3, 1, "SOUTH", 2, 20, 10, 10) == (3, 0)
+    assert predict_position(3, 3, "NONE", 4, 50, 10, 10) == (3, 3)
+
+
+def test_reporter_suppresses_straight_line_moves():
+    taxi = Taxi(1, 20, 20, 5, 5, 2, "available")
+    reporter = PositionReporter(20, 20)
+    taxi.move("EAST", 1)
+    assert reporter.should_report(taxi)
+    reporter.mark_reported(taxi)
+
+    for _ in range(3):
+        reporter.tick()
+        taxi.move("EAST", 1)
+        assert not reporter.should_report(taxi)
+
+    reporter.tick()
+    taxi.move("NORTH", 1)
+    assert reporter.should_report(taxi)
+
+
+def test_tracker_estimates_between_reports():
+    tracker = DeadReckoningTracker(20, 20)
+    tracker.record(7, 2, 2, "NORTH", 4, received_at=100)
+    assert tracker.estimate(7, now=110) == (2, 6)
+    assert tracker.estimate(8, now=110) is None
+
+
+def test_taxi_is_compact_and_shares_grid():
+    first = Taxi(1, 10, 10, 0, 0, 2, "Available")
+    second = Taxi(2, 10, 10, 5, 5, 4, "unavailable")
+    assert not hasattr(first, "__dict__")
+    assert first.grid is second.grid
+    assert first.status == "available" and second.status == "unavailable"
+    second.status = "available"
+    assert second.status_code == first.status_code
+
+
+def test_tracker_follows_injected_clock():
+    clock = ManualClock(start=100.0)
+    tracker = DeadReckoningTracker(10, 10, clock)
+    tracker.record(1, 0, 0, "EAST", 4)
+    clock.advance(10)  # Speed 4 covers 2 cells every 5 seconds
+    assert tracker.estimate(1) == (4, 0)
+
+
+def test_taxi_backs_off_on_connect_retry_without_failing_over():
+    class RecordingClock:
+        def __init__(self):
+            self.sleeps = []
+
+        def sleep(self, seconds):
+            self.sleeps.append(seconds)
+
+    class InprocSockets:
+        def __init__(self, context):
+            self.context = context
+            self.dispatcher_ip = None
+
+        def connect_push(self):
+            pass
+
+        def connect_sub(self, topic=""):
+            pass
+
+        def connect_req(self):
+            requester = self.context.socket(zmq.REQ)
+            requester.connect("inproc://dispatcher")
+            return requester
+
+    context = zmq.Context()
+    responder = context.socket(zmq.REP)
+    responder.bind("inproc://dispatcher")
+    # A dispatcher whose storage is behind: two connect_retry replies, then the ack, then a probe answered busy
+    replies = ["connect_retry 4", "connect_retry 4", "connect_ack 4", "connect_retry 4"]
+    received = []
+
+    def serve():
+        for reply in replies:
+            received.append(responder.recv_string())
+            responder.send_string(reply)
+
+    server = Thread(target=serve)
+    server.start()
+    taxi = TaxiService.__new__(TaxiService)
+    taxi.taxi = Taxi(4, 10, 10, 1, 1, 2, "available")
+    taxi.msg = "4 1 1 2 available"
+    taxi.clock = RecordingClock()
+    taxi.console_utils = RichConsoleUtils()
+    taxi.zmq_utils = InprocSockets(context)
+    taxi.dispatcher_ip = "main"
+    taxi.stop_event = Event()
+    taxi.socket_lock = Lock()
+    taxi.socket_ready = Condition()
+    taxi.socket_initialized = False
+    taxi.connected = False
+    taxi.main_dispatcher_offline = False
+    try:
+        taxi.connect_to_dispatcher()
+        assert taxi.connected and not taxi.main_dispatcher_offline
+        assert taxi.zmq_utils.dispatcher_ip == "main"
+        assert taxi.clock.sleeps == [TAXI_CONNECT_RETRY_AFTER] * 2
+        # The liveness probe treats a busy dispatcher as alive, so the taxi does not tear down its sockets
+        assert taxi.dispatcher_active()
+        assert taxi.clock.sleeps == [TAXI_CONNECT_RETRY_AFTER] * 3
+        server.join(1)
+        assert received == ["connect_request 4 1 1 2 available"] * 4
+    finally:
+        taxi.stop_event.set()
+        server.join(1)
+        responder.close()
+        context.term()
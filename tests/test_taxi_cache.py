@@ -0,0 +1,41 @@
+from src.utils.metrics import Metrics
+from src.utils.taxi_cache import CachedTaxiReads
+
+
+def test_taxi_cache_serves_lookups_and_follows_writes():
+    class CountingHandler:
+        def __init__(self):
+            self.reads = 0
+            self.taxis = {taxi_id: {"taxi_id": taxi_id, "pos_x": 0, "pos_y": 0, "status": "available", "connected": 1} for taxi_id in (1, 2, 3)}
+
+        def taxi_exists(self, taxi_id):
+            self.reads += 1
+            return taxi_id in self.taxis
+
+        def get_taxi_by_id(self, taxi_id):
+            self.reads += 1
+            return dict(self.taxis[taxi_id])
+
+        def execute_batch(self, operations):
+            return [1] * len(operations)
+
+        def reserve_and_assign(self, user_id, pos_x, pos_y, taxi_id):
+            self.taxis[taxi_id]["status"] = "unavailable"
+            return True
+
+    handler = CountingHandler()
+    metrics = Metrics()
+    cache = CachedTaxiReads(handler, metrics, capacity=2)
+    assert [cache.taxi_exists(1) for _ in range(100)] == [True] * 100 and not cache.taxi_exists(9)
+    assert handler.reads == 2
+
+    assert cache.get_taxi_by_id(1)["pos_x"] == 0
+    cache.execute_batch([("update_taxi_position", (1, 5, 6)), ("set_taxi_status", (1, "unavailable"))])
+    assert cache.get_taxi_by_id(1) == {"taxi_id": 1, "pos_x": 5, "pos_y": 6, "status": "unavailable", "connected": 1}
+    assert cache.reserve_and_assign(7, 0, 0, 2) and cache.get_taxi_by_id(2)["status"] == "unavailable"
+    cache.get_taxi_by_id(3)  # Evicts taxi 1, the least recently used
+    assert cache.get_taxi_by_id(1)["pos_x"] == 0 and handler.reads == 6
+
+    counters = metrics.snapshot()["counters"]
+    assert counters["cache.taxi_exists.hits"] == 99 and counters["cache.taxi_rows.evictions"] == 2
+    assert "hits 99 misses 2 hit rate 98.0%" in cache.stats()
@@ -0,0 +1,19 @@
+from src.utils.metrics import Metrics
+from src.utils.tracing import Tracer, split_tags, trace_tags, load_spans, stage_breakdown, slowest_traces
+
+
+def test_traced_request_spans_are_analyzed(tmp_path):
+    tracer = Tracer("dispatcher", str(tmp_path))
+    parts, tags = split_tags(f"user_request 7 2 3{trace_tags('abc', 100.0)}".split())
+    assert parts == ["user_request", "7", "2", "3"] and tags == {"trace": "abc", "sent": "100.000000"}
+
+    watch = Metrics().stopwatch("user_request")
+    watch.trace(tags["trace"], tracer)
+    watch.lap("parse")
+    watch.finish()
+    tracer.span_since("abc", "user_request.queue", tags["sent"], until=100.5)
+    tracer.close()
+
+    spans = load_spans(str(tmp_path))
+    assert {row["span"] for row in stage_breakdown(spans)} == {"user_request.parse", "user_request.queue"}
+    assert slowest_traces(spans)[0][1] == "abc"